@@ -0,0 +1,169 @@
+import asyncio
+import glob
+import itertools
+import json
+import os
+import time
+import argparse
+
+from dotenv import load_dotenv
+
+# Before the client/server modules read their settings
+load_dotenv()
+
+from client.state_machine import build_graph, serialize_message
+from client.mcp_pool import IN_PROCESS, MCPConnectionManager, get_default_manager, set_default_manager
+from client.modes import AGENTIC, MODES
+from client.tracing import server_spans
+from common.documents import document_id
+from common.tracing import export_jsonl, format_summary, new_run_id, run_context, summarize, tracer
+
+
+# (coi, None) for text holding a COI object, else (None, error)
+def parse_coi(text: str) -> tuple:
+    try:
+        coi = json.loads(text)
+    except ValueError as e:
+        return None, f"invalid JSON: {e}"
+    return (coi, None) if isinstance(coi, dict) else (None, "not a JSON object")
+
+
+# Yield (source, coi, error) from a directory, a glob pattern or a JSONL
+# file; a line or file that can't be read comes with coi None and the error,
+# so it is recorded as a failed result instead of aborting the batch
+def iter_documents(source: str):
+    if os.path.isdir(source):
+        paths = sorted(glob.glob(os.path.join(source, "*.json")))
+    elif source.endswith(".jsonl"):
+        with open(source, "r") as f:
+            for line_no, line in enumerate(f, start=1):
+                if line.strip():
+                    yield f"{source}:{line_no}", *parse_coi(line)
+        return
+    else:
+        paths = sorted(glob.glob(source))
+
+    for path in paths:
+        try:
+            with open(path, "r") as f:
+                text = f.read()
+        except OSError as e:
+            yield path, None, f"could not read document: {e}"
+            continue
+        yield path, *parse_coi(text)
+
+
+# Run one document through the graph and return a compact result line
+async def validate_document(graph, source: str, coi: dict, error: str | None = None):
+    started = time.perf_counter()
+    result = {"source": source, "document_id": coi.get("document_id") if isinstance(coi, dict) else None, "run_id": new_run_id()}
+    if error is not None:
+        return {**result, "ok": False, "error": error, "elapsed_s": 0.0}
+    try:
+        with run_context(run_id=result["run_id"], document_id=document_id(coi)):
+            response = await graph.ainvoke({"messages": f"{coi}"})
+        result["ok"] = not response.get("error")
+        result["step"] = response.get("step")
+        result["error"] = response.get("error")
+        result["current_answer"] = serialize_message(response.get("current_answer", ""))
+    except Exception as e:
+        result["ok"] = False
+        result["error"] = str(e)
+    result["elapsed_s"] = round(time.perf_counter() - started, 3)
+    return result
+
+
+# Packed extract_summary / analyze_summary requests for a group of documents
+# (see packed_completion in server/server.py). The answers land in the
+# server's tool result cache, so the graph's own calls for these documents
+# are cache hits.
+async def prefetch(group: list, run_ids: list, analyze: bool = True):
+    run_id = new_run_id()
+    run_ids.append(run_id)
+    manager = get_default_manager()
+    try:
+        with run_context(run_id=run_id):
+            extract = await manager.get_tool("extract_summary_batch")
+            summaries = json.loads(await extract.ainvoke({"documents": [f"{coi}" for _, coi in group]}))
+            if analyze:
+                tool = await manager.get_tool("analyze_summary_batch")
+                await tool.ainvoke({"summaries": [json.dumps(summary) for summary in summaries]})
+    except Exception as e:
+        print(f"packed prefetch of {len(group)} documents failed, validating them one by one:", e)
+
+
+# Validate many documents on one event loop with at most `concurrency` graphs
+# in flight; each result is appended to `output` as soon as it finishes.
+# Span summary of the whole batch is printed at the end (see common/tracing.py).
+# pack=True prefetches each group of `concurrency` documents with packed
+# requests first and prints the prompt token report (see server/prompts.py).
+async def run_batch(source: str, output: str, concurrency: int = 8, mode: str = AGENTIC, fan_out: bool = False, trace: str | None = None, incremental: bool = False, pack: bool = False):
+    graph = await build_graph(mode=mode, fan_out=fan_out, incremental=incremental)
+    queue = asyncio.Queue(maxsize=concurrency * 2)
+    counts = {"ok": 0, "failed": 0}
+    run_ids = []
+
+    with open(output, "w") as out:
+        async def worker():
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                result = await validate_document(graph, *item)
+                run_ids.append(result["run_id"])
+                counts["ok" if result["ok"] else "failed"] += 1
+                out.write(json.dumps(result, separators=(",", ":")) + "\n")
+                out.flush()
+
+        started = time.perf_counter()
+        workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+        try:
+            documents = iter_documents(source)
+            while group := list(itertools.islice(documents, concurrency if pack else 1)):
+                readable = [(source, coi) for source, coi, error in group if error is None]
+                if pack and readable:
+                    await prefetch(readable, run_ids, analyze=not (fan_out or incremental))
+                for item in group:
+                    await queue.put(item)
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+            elapsed = time.perf_counter() - started
+            run_set = set(run_ids)
+            spans = [span for span in tracer.spans if span.get("run_id") in run_set]
+            spans += await server_spans(get_default_manager(), run_ids)
+            prompt_report = json.loads((await get_default_manager().read_resource("prompts://stats"))[0]) if pack else None
+        finally:
+            for task in workers:
+                task.cancel()
+            await get_default_manager().aclose()
+
+    print(format_summary(summarize(spans)))
+    if prompt_report:
+        # Packing needs the server's prompt registry anyway
+        from server.prompts import format_prompt_stats
+
+        print(format_prompt_stats(prompt_report))
+    if trace:
+        export_jsonl(spans, trace)
+    total = counts["ok"] + counts["failed"]
+    return {**counts, "total": total, "elapsed_s": round(elapsed, 3), "docs_per_s": round(total / elapsed, 3) if elapsed else 0.0}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Validate a batch of COI documents.")
+    parser.add_argument("source", help="Directory of *.json files, a glob pattern (quoted) or a .jsonl file with one COI per line")
+    parser.add_argument("-o", "--output", default="results.jsonl", help="JSONL file to stream one result per document to")
+    parser.add_argument("-c", "--concurrency", type=int, default=8, help="Maximum number of documents in flight")
+    parser.add_argument("--mode", choices=MODES, default=AGENTIC, help="agentic: LLM picks each tool call; deterministic: tool calls built from state")
+    parser.add_argument("--fan-out", action="store_true", help="Analyze each coverage in parallel instead of one analyze_summary call")
+    parser.add_argument("--incremental", action="store_true", help="Re-run only the coverages that changed since this certificate's last validation (implies --fan-out)")
+    parser.add_argument("--trace", metavar="PATH", help="Write every run's spans (nodes, tools, OpenAI calls) to a JSONL file")
+    parser.add_argument("--pack", action="store_true", help="Extract and analyze small documents several per LLM request before running the graph")
+    parser.add_argument("--in-process", action="store_true", help="Run the MCP server inside this process instead of connecting to MCP_SERVER_URL")
+    args = parser.parse_args()
+    if args.in_process:
+        set_default_manager(MCPConnectionManager(transport=IN_PROCESS))
+
+    summary = asyncio.run(run_batch(args.source, args.output, concurrency=max(1, args.concurrency), mode=args.mode, fan_out=args.fan_out, trace=args.trace, incremental=args.incremental, pack=args.pack))
+    print('------------')
+    print(json.dumps(summary))
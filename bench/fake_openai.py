@@ -0,0 +1,214 @@
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+import uuid
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+# Local stand-in for the OpenAI chat completions API, so the pipeline can be
+# benchmarked without network or spend. It replays what a real run recorded
+# (response.json) with configurable latency:
+# - forced tool calls from the reasoning nodes are answered with the call
+#   the prompt asks for, and the recorded completion token count
+# - structured outputs (response_format) get a schema-valid object, with as
+#   many coverages as the document or summary in the prompt
+# - plain completions (format_email) replay the recorded email
+# Latency = time to first token (drawn from --latency) + completion tokens
+# at --tokens-per-s.
+
+DEFAULT_EMAIL = "Subject: Certificate of Insurance Review\n\nDear Certificate Holder,\n\nWe have reviewed your certificate.\n\nBest regards,\nInsurance Team"
+
+
+# "fixed:MS", "uniform:LO,HI" or "lognormal:MEDIAN_MS,SIGMA" -> sampler in seconds
+def parse_latency(spec: str):
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",")] if args else []
+    if kind == "fixed":
+        return lambda: values[0] / 1000
+    if kind == "uniform":
+        return lambda: random.uniform(values[0], values[1]) / 1000
+    if kind == "lognormal":
+        median, sigma = values
+        return lambda: random.lognormvariate(0, sigma) * median / 1000
+    if kind in ("zero", "none"):
+        return lambda: 0.0
+    raise ValueError(f"Unknown latency distribution '{spec}'")
+
+
+# Per-tool completion token counts and the final email of a recorded run
+# (response.json; older recordings keep the token usage in response_metadata)
+def load_recording(path: str) -> dict:
+    recording = {"completion_tokens": {}, "email": DEFAULT_EMAIL}
+    try:
+        with open(path, "r") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return recording
+    if not isinstance(state, dict):
+        return recording
+    messages = state.get("messages", [])
+    payloads = state.get("payloads") or {}
+    for message in messages if isinstance(messages, list) else []:
+        if not isinstance(message, dict):
+            continue
+        usage = (message.get("response_metadata") or {}).get("token_usage") or {}
+        completion_tokens = usage.get("completion_tokens") or (message.get("usage_metadata") or {}).get("output_tokens")
+        for call in message.get("tool_calls") or []:
+            if completion_tokens:
+                recording["completion_tokens"][call["name"]] = completion_tokens
+        content = message.get("content")
+        if isinstance(content, str) and content.startswith("payload:"):
+            content = payloads.get(content[len("payload:"):], content)
+        if message.get("type") == "tool" and message.get("name") == "format_email" and content:
+            recording["email"] = content
+    if state.get("email"):
+        recording["email"] = state["email"]
+    return recording
+
+
+def _deref(schema: dict, root: dict) -> dict:
+    while "$ref" in schema:
+        schema = root["$defs"][schema["$ref"].split("/")[-1]]
+    return schema
+
+
+# Minimal valid instance of a JSON schema (as sent in response_format).
+# Arrays get 2 items, or lengths[name] for a property called name.
+def fill(schema: dict, root: dict, lengths: dict | None = None, length: int = 2):
+    schema = _deref(schema, root)
+    if "anyOf" in schema:
+        return fill(schema["anyOf"][0], root, lengths, length)
+    kind = schema.get("type")
+    if kind == "object":
+        return {key: fill(value, root, lengths, (lengths or {}).get(key, 2)) for key, value in schema.get("properties", {}).items()}
+    if kind == "array":
+        return [fill(schema["items"], root, lengths) for _ in range(length)]
+    if kind == "string":
+        return schema.get("enum", ["n/a"])[0]
+    if kind == "boolean":
+        return True
+    if kind in ("integer", "number"):
+        return 1000000
+    return None
+
+
+# First JSON object in a prompt (the document, summary or packed documents
+# after their heading), None when there is none
+def prompt_json(text: str):
+    start = text.find("{")
+    try:
+        return json.JSONDecoder().raw_decode(text[start:])[0] if start >= 0 else None
+    except ValueError:
+        return None
+
+
+# Array lengths that make an answer match its input: as many coverages as
+# the document or summary has, so the cascade's checks can pass
+def input_lengths(value) -> dict:
+    if isinstance(value, dict) and isinstance(value.get("coverages"), list):
+        return {"coverages": len(value["coverages"])}
+    return {}
+
+
+class FakeOpenAI:
+    def __init__(self, recording: dict, latency, tokens_per_s: float):
+        self.recording = recording
+        self.latency = latency
+        self.tokens_per_s = tokens_per_s
+        self.requests = 0
+        self.completion_tokens = 0
+
+    def reply(self, body: dict) -> tuple[dict, int]:
+        messages = body["messages"]
+        text = " ".join(str(m.get("content") or "") for m in messages)
+        if body.get("tools"):
+            match = re.search(r"Only use the (\w+) tool", text)
+            name = match.group(1) if match else body["tools"][0]["function"]["name"]
+            tool = next(t for t in body["tools"] if t["function"]["name"] == name)
+            params = tool["function"]["parameters"].get("properties", {})
+            user = str(messages[-1].get("content") or "")
+            if user.startswith("document_id: ") and "document_id" in params:
+                args = {"document_id": user.split(": ", 1)[1]}
+            else:
+                args = {key: user for key in params if key in ("document", "summary", "analysis")}
+            message = {"role": "assistant", "content": None, "tool_calls": [{
+                "id": "call_" + uuid.uuid4().hex[:24],
+                "type": "function",
+                "function": {"name": name, "arguments": json.dumps(args)},
+            }]}
+            tokens = self.recording["completion_tokens"].get(name, len(message["tool_calls"][0]["function"]["arguments"]) // 4)
+        elif body.get("response_format"):
+            schema = body["response_format"]["json_schema"]["schema"]
+            payload = prompt_json(str(messages[-1].get("content") or ""))
+            results = _deref(schema.get("properties", {}).get("results", {}).get("items", {}), schema)
+            if "key" in results.get("properties", {}) and isinstance(payload, dict):
+                # Packed request: one result per document id in the prompt
+                instance = {"results": [
+                    {"key": key, "result": fill(results["properties"]["result"], schema, input_lengths(value))}
+                    for key, value in payload.items()
+                ]}
+            else:
+                instance = fill(schema, schema, input_lengths(payload))
+            content = json.dumps(instance)
+            message = {"role": "assistant", "content": content, "refusal": None}
+            tokens = len(content) // 4
+        else:
+            message = {"role": "assistant", "content": self.recording["email"]}
+            tokens = len(message["content"]) // 4
+        return message, max(1, tokens)
+
+    async def completions(self, request: Request):
+        body = await request.json()
+        message, completion_tokens = self.reply(body)
+        prompt_tokens = sum(len(str(m.get("content") or "")) for m in body["messages"]) // 4
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens}
+        self.requests += 1
+        self.completion_tokens += completion_tokens
+        decode = completion_tokens / self.tokens_per_s if self.tokens_per_s > 0 else 0.0
+        await asyncio.sleep(self.latency())
+        base = {"id": "chatcmpl-" + uuid.uuid4().hex[:24], "created": int(time.time()), "model": body["model"]}
+
+        if body.get("stream"):
+            async def stream():
+                content = message.get("content") or ""
+                pieces = [content[i:i + 16] for i in range(0, len(content), 16)] or [""]
+                for piece in pieces:
+                    await asyncio.sleep(decode / len(pieces))
+                    chunk = {**base, "object": "chat.completion.chunk", "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]}
+                    yield f"data: {json.dumps(chunk)}\n\n"
+                chunk = {**base, "object": "chat.completion.chunk", "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}], "usage": usage}
+                yield f"data: {json.dumps(chunk)}\n\n"
+                yield "data: [DONE]\n\n"
+            return StreamingResponse(stream(), media_type="text/event-stream")
+
+        await asyncio.sleep(decode)
+        finish = "tool_calls" if message.get("tool_calls") else "stop"
+        return JSONResponse({**base, "object": "chat.completion", "choices": [{"index": 0, "message": message, "finish_reason": finish}], "usage": usage})
+
+    async def stats(self, request: Request):
+        return JSONResponse({"requests": self.requests, "completion_tokens": self.completion_tokens})
+
+
+def create_app(recording: str = "response.json", latency: str = "lognormal:300,0.3", tokens_per_s: float = 500.0) -> Starlette:
+    fake = FakeOpenAI(load_recording(recording), parse_latency(latency), tokens_per_s)
+    return Starlette(routes=[
+        Route("/v1/chat/completions", fake.completions, methods=["POST"]),
+        Route("/stats", fake.stats),
+    ])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="OpenAI-compatible stand-in that replays recorded completions.")
+    parser.add_argument("--port", type=int, default=9999)
+    parser.add_argument("--recording", default="response.json", help="response.json of a real run to replay")
+    parser.add_argument("--latency", default="lognormal:300,0.3", help="Time to first token: fixed:MS, uniform:LO,HI or lognormal:MEDIAN_MS,SIGMA")
+    parser.add_argument("--tokens-per-s", type=float, default=500.0, help="Completion token rate (0 = instant)")
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.recording, args.latency, args.tokens_per_s), host="127.0.0.1", port=args.port, log_level="warning")
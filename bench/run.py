@@ -0,0 +1,213 @@
+import argparse
+import asyncio
+import json
+import os
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+# Offline end-to-end benchmark: starts the fake OpenAI endpoint
+# (bench/fake_openai.py) and the MCP server, then drives the compiled graph
+# over the example documents plus synthetic certificates at several
+# concurrency levels. Reports docs/s, per-document and per-node/tool/LLM
+# latency percentiles and peak RSS of both processes.
+#
+#   python -m bench.run -c 1,4,16 -n 24 --mode deterministic | tee bench_output.txt
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EXAMPLE_DOCS = [os.path.join(ROOT, "example_docs", name) for name in ("compliant.json", "non_compliant.json")]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(port: int, process: subprocess.Popen, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{' '.join(process.args)} exited with {process.returncode}")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise TimeoutError(f"Nothing listening on port {port} after {timeout}s")
+
+
+# Peak RSS (MB) since the last reset; Linux only, None elsewhere
+def peak_rss_mb(pid: int | str = "self") -> float | None:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    if pid == "self":
+        return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    return None
+
+
+def reset_peak_rss(pid: int | str = "self"):
+    try:
+        with open(f"/proc/{pid}/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def fake_stats(port: int) -> dict:
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}/stats") as response:
+        return json.load(response)
+
+
+def load_documents(synthetic: int, seed: int) -> list:
+    from bench.synthetic import synthetic_certificates
+
+    documents = []
+    for path in EXAMPLE_DOCS:
+        with open(path, "r") as f:
+            documents.append((os.path.basename(path), json.load(f)))
+    bases = [coi for _, coi in documents]
+    documents += [(coi["document_id"], coi) for coi in synthetic_certificates(bases, synthetic, seed)]
+    return documents
+
+
+async def run_level(graph, documents: list, concurrency: int, server_pid: int, openai_port: int) -> dict:
+    from batch import validate_document
+    from client.mcp_pool import get_default_manager
+    from client.tracing import server_spans
+    from common.tracing import percentile, summarize, tracer
+
+    reset_peak_rss()
+    reset_peak_rss(server_pid)
+    requests_before = fake_stats(openai_port)["requests"]
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(source, coi):
+        async with semaphore:
+            return await validate_document(graph, source, coi)
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(run(source, coi) for source, coi in documents))
+    elapsed = time.perf_counter() - started
+
+    run_ids = {result["run_id"] for result in results}
+    spans = [span for span in tracer.spans if span.get("run_id") in run_ids]
+    spans += await server_spans(get_default_manager(), list(run_ids))
+    latencies = [result["elapsed_s"] * 1000 for result in results]
+    return {
+        "concurrency": concurrency,
+        "docs": len(results),
+        "ok": sum(1 for result in results if result["ok"]),
+        "elapsed_s": round(elapsed, 3),
+        "docs_per_s": round(len(results) / elapsed, 3),
+        "doc_p50_ms": round(percentile(latencies, 0.5), 1),
+        "doc_p99_ms": round(percentile(latencies, 0.99), 1),
+        "llm_requests": fake_stats(openai_port)["requests"] - requests_before,
+        "client_peak_rss_mb": peak_rss_mb(),
+        "server_peak_rss_mb": peak_rss_mb(server_pid),
+        "spans": summarize(spans),
+        "errors": sorted({result["error"] for result in results if result.get("error")}),
+    }
+
+
+async def bench(args, server_pid: int, openai_port: int) -> list:
+    from batch import validate_document
+    from client.mcp_pool import get_default_manager
+    from client.state_machine import build_graph
+
+    documents = load_documents(args.synthetic, args.seed)
+    graph = await build_graph(mode=args.mode, fan_out=args.fan_out)
+    try:
+        # Warm up: MCP session, tool list and imports are not what's measured
+        await validate_document(graph, "warmup", documents[0][1])
+        return [await run_level(graph, documents, level, server_pid, openai_port) for level in args.concurrency]
+    finally:
+        await get_default_manager().aclose()
+
+
+def print_report(levels: list):
+    from common.tracing import format_summary
+
+    columns = ["concurrency", "docs", "ok", "elapsed_s", "docs_per_s", "doc_p50_ms", "doc_p99_ms", "llm_requests", "client_peak_rss_mb", "server_peak_rss_mb"]
+    table = [columns] + [[str(level[column]) for column in columns] for level in levels]
+    widths = [max(len(row[i]) for row in table) for i in range(len(columns))]
+    print("\n".join("  ".join(cell.ljust(width) for cell, width in zip(row, widths)) for row in table))
+    for level in levels:
+        print(f"\n-- concurrency {level['concurrency']}")
+        print(format_summary(level["spans"]))
+        for error in level["errors"]:
+            print("error:", error)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the COI pipeline offline against a fake OpenAI endpoint.")
+    parser.add_argument("-c", "--concurrency", default="1,4,16", help="Comma-separated concurrency levels")
+    parser.add_argument("-n", "--synthetic", type=int, default=24, help="Synthetic certificates on top of the two example documents")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--mode", choices=("agentic", "deterministic"), default="agentic")
+    parser.add_argument("--fan-out", action="store_true")
+    parser.add_argument("--latency", default="lognormal:300,0.3", help="Fake time to first token: fixed:MS, uniform:LO,HI or lognormal:MEDIAN_MS,SIGMA")
+    parser.add_argument("--tokens-per-s", type=float, default=500.0, help="Fake completion token rate (0 = instant)")
+    parser.add_argument("--recording", default=os.path.join(ROOT, "response.json"), help="Recorded run to replay")
+    parser.add_argument("--cache", action="store_true", help="Keep the tool result cache on (off by default so every document reaches the LLM)")
+    parser.add_argument("--rate-limits", action="store_true", help="Keep the LLM_RPM/LLM_TPM scheduler limits (lifted by default)")
+    parser.add_argument("--json", metavar="PATH", help="Also write the report as JSON")
+    args = parser.parse_args()
+    args.concurrency = [max(1, int(level)) for level in args.concurrency.split(",")]
+
+    workdir = tempfile.mkdtemp(prefix="coi-bench-")
+    openai_port, mcp_port = free_port(), free_port()
+    env = {
+        **os.environ,
+        "OPENAI_API_KEY": "bench",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{openai_port}/v1",
+        "MCP_PORT": str(mcp_port),
+        "MCP_SERVER_URL": f"http://127.0.0.1:{mcp_port}/mcp",
+        "TOOL_CACHE_PATH": os.path.join(workdir, "tool_cache.sqlite3"),
+        "TOOL_CACHE_BYPASS": "0" if args.cache else "1",
+        "DOCUMENT_STORE_DIR": os.path.join(workdir, "documents"),
+        "TRACE_PATH": "",
+        "PYTHONPATH": ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""),
+    }
+    if not args.rate_limits:
+        env.update(LLM_RPM="1000000", LLM_TPM="1000000000", LLM_MAX_CONCURRENCY="1000")
+
+    processes = []
+    try:
+        fake = subprocess.Popen(
+            [sys.executable, "-m", "bench.fake_openai", "--port", str(openai_port), "--recording", args.recording,
+             "--latency", args.latency, "--tokens-per-s", str(args.tokens_per_s)],
+            cwd=ROOT, env=env,
+        )
+        processes.append(fake)
+        server = subprocess.Popen([sys.executable, "-m", "server.server"], cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        processes.append(server)
+        wait_for_port(openai_port, fake)
+        wait_for_port(mcp_port, server)
+
+        # The client modules read these at import time
+        os.environ.update({key: env[key] for key in ("OPENAI_API_KEY", "OPENAI_BASE_URL", "MCP_SERVER_URL", "TRACE_PATH")})
+        levels = asyncio.run(bench(args, server.pid, openai_port))
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=10)
+
+    print_report(levels)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": {**vars(args)}, "levels": levels}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+import copy
+import random
+
+# Synthetic ACORD 25 certificates derived from the example documents, so the
+# benchmark covers more than two (cacheable) inputs. Every certificate gets its
+# own id, insured and policy numbers; limits, coverages and the holder are
+# varied so roughly half of them fail compliance.
+
+INSUREDS = ["ABC Subcontractors LLC", "Delta Drywall Inc.", "Summit Electric Co.", "Riverbend Plumbing LLC", "Keystone Framing Corp.", "Bluewater Concrete Inc."]
+HOLDERS = ["Simile Construction Service, Inc., 4725 Enterprise Way #1, Modesto, CA 95356.", "Simile Construction"]
+LIMIT_FACTORS = [0.25, 0.5, 1, 1, 2]
+
+
+def synthetic_certificate(base: dict, index: int, rng: random.Random) -> dict:
+    coi = copy.deepcopy(base)
+    coi["document_id"] = f"syn{index:05d}"
+    coi["named_insured"] = rng.choice(INSUREDS)
+    coi["certificate_holder"] = rng.choice(HOLDERS)
+    coi["project_id"] = f"PRJ-2025-{rng.randrange(1000, 9999)}"
+
+    coverages = coi.get("coverages", [])
+    if len(coverages) > 2 and rng.random() < 0.3:
+        coverages.pop(rng.randrange(len(coverages)))
+    for coverage in coverages:
+        prefix = coverage.get("policy_number", "POL").split("-")[0]
+        coverage["policy_number"] = f"{prefix}-{rng.randrange(100000, 999999)}"
+        factor = rng.choice(LIMIT_FACTORS)
+        for key, value in coverage.items():
+            if "limit" in key and isinstance(value, (int, float)) and not isinstance(value, bool):
+                coverage[key] = int(value * factor)
+    return coi
+
+
+def synthetic_certificates(bases: list, count: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    return [synthetic_certificate(bases[i % len(bases)], i, rng) for i in range(count)]
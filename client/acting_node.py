@@ -1,26 +1,45 @@
-from langchain_mcp_adapters.client import MultiServerMCPClient 
+from langchain_core.runnables import RunnableConfig
 from langgraph.prebuilt import ToolNode
 
 from client.agent_state import AgentState
+from client.mcp_pool import get_mcp_manager
+from client.payloads import resolve_message
+from pydantic import ValidationError
+from common.schemas import SCHEMAS
+
+# State key for each structured tool's typed output
+TYPED_OUTPUTS = {"extract_summary": "summary", "analyze_summary": "analysis"}
+# State key for tools whose output is plain text
+TEXT_OUTPUTS = {"format_email": "email"}
+
+# Parse structured tool results into their schema once, so later nodes get
+# typed objects instead of re-cleaning and re-parsing strings
+def parse_typed_outputs(tool_messages: list) -> dict:
+    outputs = {}
+    for msg in tool_messages:
+        name = getattr(msg, "name", None)
+        if getattr(msg, "status", None) == "error":
+            continue
+        if name in TEXT_OUTPUTS and isinstance(msg.content, str):
+            outputs[TEXT_OUTPUTS[name]] = msg.content
+        if name not in TYPED_OUTPUTS:
+            continue
+        try:
+            outputs[TYPED_OUTPUTS[name]] = SCHEMAS[name].model_validate_json(msg.content)
+        except (ValidationError, TypeError) as e:
+            print(f"{name} result is not a valid {SCHEMAS[name].__name__}:", e)
+    return outputs
 
 # Node to safely execute the divide tool
-async def acting_node(state: AgentState):
-    print("acting_node\n\n")
+async def acting_node(state: AgentState, config: RunnableConfig):
     try:
-        client = MultiServerMCPClient({
-            "insurance_compliance": {
-                "url": "http://127.0.0.1:8001/mcp",
-                "transport": "streamable_http"
-            }
-        })
-        tools = await client.get_tools()
+        tools = await get_mcp_manager(config).get_tools()
         tool_node = ToolNode(tools)
 
         messages = state.get("messages", [])
 
-        # print("state in acting_node", state)
-        result = await tool_node.ainvoke(state)
-        print("result in acting_node", result)
+        # Execute the last tool-calling message with its payload references resolved
+        result = await tool_node.ainvoke({"messages": [resolve_message(messages[-1], state.get("payloads", {}))]})
 
         # Get previous messages and new tool messages
         step = state.get("step", 1)
@@ -39,7 +58,7 @@ async def acting_node(state: AgentState):
             status = getattr(last_msg, "status", None)
             if status == "error":
                 return {
-                    "messages": messages + [f"Error: {last_msg.content}"], 
+                    "messages": [f"Error: {last_msg.content}"],
                     "error": last_msg.content, 
                     "step": step, 
                     "query": query, 
@@ -47,14 +66,14 @@ async def acting_node(state: AgentState):
                 }
         # print("acting_node result", result)
         return {
-            "messages": messages + new_messages, 
+            "messages": new_messages,
             "step": step, 
             "query": query, 
-            "current_answer": current_answer
+            "current_answer": current_answer,
+            **parse_typed_outputs(new_messages)
         }
     except Exception as e:
         return {
-            "messages": messages,
             "step": step,
             "query": query,
             "current_answer": current_answer,
@@ -1,10 +1,34 @@
-from typing import TypedDict, Union, List
-from langchain_core.messages import BaseMessage
+import operator
+from typing import Annotated, TypedDict, List
+from langchain_core.messages import AnyMessage
+
+from client.payloads import bounded_messages, merge_payloads
+from common.schemas import CoiSummary, ComplianceAnalysis, CoverageAnalysis, Check
+
+# One coverage analysis produced by the fan-out, tagged with the coverage's
+# position in summary.coverages so the merge is deterministic
+class IndexedCoverageAnalysis(TypedDict):
+    index: int
+    analysis: CoverageAnalysis
 
 # Define the state schema
 class AgentState(TypedDict, total=False):
-    messages: Union[str, BaseMessage, List[BaseMessage]]
+    # Appended by nodes, bounded; large contents are references into payloads
+    # (see client/payloads.py)
+    messages: Annotated[List[AnyMessage], bounded_messages]
+    payloads: Annotated[dict, merge_payloads]
     query: str
     step: int
     error: str
-    current_answer: str
\ No newline at end of file
+    current_answer: str
+    document_id: str
+    # Typed tool outputs, parsed once in acting_node
+    summary: CoiSummary
+    analysis: ComplianceAnalysis
+    email: str
+    # Per-coverage fan-out results, appended by parallel branches
+    coverage_analyses: Annotated[List[IndexedCoverageAnalysis], operator.add]
+    general_checks: List[Check]
+    fanout_errors: Annotated[List[str], operator.add]
+    # What an incremental run reused / re-ran (see client/revisions.py)
+    revision: dict
\ No newline at end of file
@@ -0,0 +1,58 @@
+import os
+from contextlib import asynccontextmanager
+
+from common.documents import document_id
+
+DEFAULT_CHECKPOINT_PATH = ".cache/checkpoints.sqlite3"
+
+
+# Durable, local checkpoints for build_graph(checkpointer=...)
+@asynccontextmanager
+async def open_checkpointer(path: str = DEFAULT_CHECKPOINT_PATH):
+    # Imported here so runs without --checkpoint don't load sqlite support
+    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    async with AsyncSqliteSaver.from_conn_string(path) as saver:
+        await saver.setup()
+        yield saver
+
+
+# One checkpoint thread per document: the content hash of the COI, so a
+# resubmitted certificate finds the checkpoints of its earlier run
+def thread_config(query: str) -> dict:
+    return {"configurable": {"thread_id": document_id(query)}}
+
+
+# Find where a checkpointed run should continue from.
+# Returns (input, config) for graph.ainvoke, or None when the thread already
+# finished successfully and its stored state can be returned as is.
+async def resume_point(graph, config: dict, query: str):
+    state = await graph.aget_state(config)
+    if not state.values:
+        # Nothing checkpointed yet: fresh run
+        return {"messages": query}, config
+    if not state.values.get("error"):
+        # Interrupted mid-run (or already done): continue from the latest checkpoint
+        return (None, config) if state.next else None
+
+    # The run ended in error_node: go back to the latest checkpoint taken
+    # before the failing step and re-run only what comes after it
+    async for snapshot in graph.aget_state_history(config):
+        if snapshot.next and not snapshot.values.get("error") and "error_node" not in snapshot.next:
+            print("resuming before", ", ".join(snapshot.next))
+            return None, snapshot.config
+    return {"messages": query}, config
+
+
+# Run a document on a checkpointed graph. Without resume the document's
+# thread is cleared first so stale state (e.g. an old error) can't leak in.
+async def run_checkpointed(graph, checkpointer, query: str, resume: bool = False):
+    config = thread_config(query)
+    if not resume:
+        await checkpointer.adelete_thread(config["configurable"]["thread_id"])
+    point = await resume_point(graph, config, query)
+    if point is None:
+        print("already completed, returning the checkpointed result")
+        return (await graph.aget_state(config)).values
+    return await graph.ainvoke(*point)
@@ -0,0 +1,88 @@
+from langchain_core.runnables import RunnableConfig
+from langgraph.types import Send
+
+from client.agent_state import AgentState
+from client.mcp_pool import get_mcp_manager
+from common.schemas import ComplianceAnalysis, CoverageAnalysis, GeneralAnalysis
+
+# Fields of the summary a single coverage needs to be judged on its own
+COVERAGE_CONTEXT = {"certificate_holder", "description_of_operations", "project_identification", "additional_endorsements"}
+
+
+# One coverage_analysis task per coverages[] entry (or only the given indices)
+def coverage_sends(summary, indices=None) -> list:
+    context = summary.model_dump_json(include=COVERAGE_CONTEXT)
+    return [
+        Send("coverage_analysis", {"index": index, "coverage": summary.coverages[index], "context": context})
+        for index in (range(len(summary.coverages)) if indices is None else indices)
+    ]
+
+
+# Split the extracted summary into one analysis task per coverages[] entry,
+# plus one task for the coverage-independent checks; all run in parallel.
+# A router can't update the state, so a missing summary goes to error_node
+# as a Send carrying the error.
+def dispatch_coverage_analysis(state: AgentState):
+    summary = state.get("summary")
+    if summary is None:
+        return [Send("error_node", {**state, "error": "extract_summary returned no summary"})]
+    sends = coverage_sends(summary)
+    sends.append(Send("general_analysis", {"summary": summary}))
+    return sends
+
+
+async def coverage_analysis_node(task: dict, config: RunnableConfig):
+    coverage = task["coverage"]
+    try:
+        tool = await get_mcp_manager(config).get_tool("analyze_coverage")
+        result = await tool.ainvoke({"coverage": coverage.model_dump_json(), "context": task["context"]})
+        analysis = CoverageAnalysis.model_validate_json(result)
+        return {"coverage_analyses": [{"index": task["index"], "analysis": analysis}]}
+    except Exception as e:
+        return {"fanout_errors": [f"{coverage.coverage_type}: {e}"]}
+
+
+async def general_analysis_node(task: dict, config: RunnableConfig):
+    try:
+        tool = await get_mcp_manager(config).get_tool("analyze_general")
+        result = await tool.ainvoke({"summary": task["summary"].model_dump_json(exclude={"coverages"})})
+        return {"general_checks": GeneralAnalysis.model_validate_json(result).checks}
+    except Exception as e:
+        return {"fanout_errors": [f"general: {e}"]}
+
+
+# Merge the parallel results into the same ComplianceAnalysis shape that
+# analyze_summary returns; ordering follows summary.coverages, not completion
+def merge_analysis_node(state: AgentState):
+    errors = state.get("fanout_errors", [])
+    if errors:
+        return {"error": "; ".join(errors), "step": 2}
+
+    by_index = {}
+    for item in state.get("coverage_analyses", []):
+        by_index[item["index"]] = item["analysis"]
+    coverages = [by_index[index] for index in sorted(by_index)]
+    general = state.get("general_checks", [])
+
+    failed = [check for check in general if check.status == "fail"]
+    for coverage in coverages:
+        failed += [check for check in coverage.checks if check.status == "fail"]
+    compliant = not failed and all(coverage.compliant for coverage in coverages)
+
+    summary = state.get("summary")
+    missing_items = [f"{m.field}: {m.reason}" for m in summary.missing_fields] if summary else []
+    if compliant:
+        recommendation = "The certificate meets all checked requirements."
+    else:
+        recommendation = "Request a corrected certificate addressing: " + "; ".join(
+            f"{check.rule} ({check.detail})" if check.detail else check.rule for check in failed
+        )
+
+    analysis = ComplianceAnalysis(
+        compliant=compliant,
+        general=general,
+        coverages=coverages,
+        missing_items=missing_items,
+        recommendation=recommendation,
+    )
+    return {"analysis": analysis, "current_answer": analysis.model_dump_json(), "step": 2}
\ No newline at end of file
@@ -2,7 +2,6 @@ from client.agent_state import AgentState
 
 # Node to handle errors
 def error_node(state: AgentState):
-    print("error_node")
     messages = state.get("messages", [])
     error_text = None
 
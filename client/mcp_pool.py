@@ -0,0 +1,206 @@
+import asyncio
+import os
+import time
+
+from langchain_core.runnables import RunnableConfig
+from langchain_mcp_adapters.client import MultiServerMCPClient
+from langchain_mcp_adapters.tools import load_mcp_tools
+from mcp import types
+
+from client.streaming import token_forwarder
+from client.tracing import trace_meta
+
+SERVER_NAME = "acord_25_insurance_compliance"
+DEFAULT_URL = os.getenv("MCP_SERVER_URL", "http://127.0.0.1:8001/mcp")
+# "in_process" runs the FastMCP server from server/server.py inside the client
+# process and talks to it over in-memory streams instead of HTTP
+IN_PROCESS = "in_process"
+DEFAULT_TRANSPORT = os.getenv("MCP_TRANSPORT", "streamable_http")
+DEFAULT_TOOLS_TTL = float(os.getenv("MCP_TOOLS_TTL", "300"))
+
+
+# ClientSession proxy used for the tools: every tools/call carries the run's
+# trace fields in _meta (see client/tracing.py) and, while streaming, a
+# progress callback that forwards generated text (see client/streaming.py)
+class MCPSession:
+    def __init__(self, session):
+        self._session = session
+
+    def __getattr__(self, name):
+        return getattr(self._session, name)
+
+    async def call_tool(self, name: str, arguments: dict | None = None, read_timeout_seconds=None, progress_callback=None):
+        meta = trace_meta()
+        progress_callback = progress_callback or token_forwarder(name)
+        if not meta:
+            return await self._session.call_tool(name, arguments, read_timeout_seconds, progress_callback)
+        return await self._session.send_request(
+            types.ClientRequest(
+                types.CallToolRequest(
+                    method="tools/call",
+                    params=types.CallToolRequestParams(name=name, arguments=arguments, _meta=meta),
+                )
+            ),
+            types.CallToolResult,
+            request_read_timeout_seconds=read_timeout_seconds,
+            progress_callback=progress_callback,
+        )
+
+
+def default_connections(transport: str = DEFAULT_TRANSPORT) -> dict:
+    if transport == IN_PROCESS:
+        return {SERVER_NAME: {"transport": IN_PROCESS}}
+    return {
+        SERVER_NAME: {
+            "url": DEFAULT_URL,
+            "transport": transport
+        }
+    }
+
+
+# Process-wide MCP connection manager.
+# Opens one long-lived session per server and caches the tool list so graph
+# nodes stop paying a handshake + list_tools round trip on every step.
+# An in-process connection ({"transport": "in_process"}, optionally with
+# "server": a FastMCP instance) mounts the server in this process; the tools
+# are the same, without the HTTP/SSE framing and the second process.
+class MCPConnectionManager:
+    def __init__(self, connections: dict | None = None, tools_ttl: float = DEFAULT_TOOLS_TTL, transport: str = DEFAULT_TRANSPORT):
+        self.connections = connections or default_connections(transport)
+        self.tools_ttl = tools_ttl
+        self._client = MultiServerMCPClient({name: c for name, c in self.connections.items() if c.get("transport") != IN_PROCESS})
+        self._sessions = {}
+        self._session_tasks = []
+        self._stop = None
+        self._loop = None
+        self._lock = None
+        self._tools = None
+        self._tools_loaded_at = 0.0
+
+    # Sessions are bound to the event loop that opened them; a new loop
+    # (e.g. a second asyncio.run in the same process) starts from scratch.
+    def _bind_loop(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._lock = asyncio.Lock()
+            self._stop = asyncio.Event()
+            self._sessions = {}
+            self._session_tasks = []
+            self._tools = None
+
+    # Every server runs in this process: its spans already land in this
+    # process's tracer
+    @property
+    def in_process(self) -> bool:
+        return all(c.get("transport") == IN_PROCESS for c in self.connections.values())
+
+    def _open_session(self, name: str):
+        connection = self.connections[name]
+        if connection.get("transport") != IN_PROCESS:
+            return self._client.session(name)
+        from fastmcp.client.transports import FastMCPTransport
+
+        server = connection.get("server")
+        if server is None:
+            from server.server import mcp as server
+        return FastMCPTransport(server).connect_session()
+
+    # Each session lives in its own background task so that the transport's
+    # task group is entered and exited by the same task.
+    async def _hold_session(self, name: str, ready: asyncio.Future):
+        try:
+            async with self._open_session(name) as session:
+                ready.set_result(MCPSession(session))
+                await self._stop.wait()
+        except BaseException as e:
+            if not ready.done():
+                ready.set_exception(e)
+            else:
+                self._sessions.pop(name, None)
+                self._tools = None
+            if isinstance(e, asyncio.CancelledError):
+                raise
+
+    async def _connect(self):
+        for name in self.connections:
+            if name in self._sessions:
+                continue
+            ready = asyncio.get_running_loop().create_future()
+            task = asyncio.create_task(self._hold_session(name, ready), name=f"mcp-session-{name}")
+            self._session_tasks.append(task)
+            self._sessions[name] = await ready
+
+    async def get_tools(self):
+        self._bind_loop()
+        if self._tools is not None and time.monotonic() - self._tools_loaded_at < self.tools_ttl:
+            return self._tools
+        async with self._lock:
+            if self._tools is not None and time.monotonic() - self._tools_loaded_at < self.tools_ttl:
+                return self._tools
+            await self._connect()
+            tools = []
+            for session in self._sessions.values():
+                tools.extend(await load_mcp_tools(session))
+            self._tools = tools
+            self._tools_loaded_at = time.monotonic()
+            return tools
+
+    async def get_tool(self, name: str):
+        tools = await self.get_tools()
+        return next((tool for tool in tools if tool.name == name), None)
+
+    # Text contents of a resource, from the first server that has it
+    async def read_resource(self, uri: str) -> list:
+        self._bind_loop()
+        async with self._lock:
+            await self._connect()
+        error = None
+        for session in self._sessions.values():
+            try:
+                result = await session.read_resource(uri)
+            except Exception as e:
+                error = e
+                continue
+            return [content.text for content in result.contents if hasattr(content, "text")]
+        raise error or LookupError(f"No MCP server to read {uri} from")
+
+    # Drop the cached tool list; with reconnect=True also close the sessions
+    # so the next call re-handshakes (e.g. after the server was restarted).
+    async def invalidate(self, reconnect: bool = False):
+        self._tools = None
+        if reconnect:
+            await self.aclose()
+
+    async def aclose(self):
+        if self._stop is not None:
+            self._stop.set()
+        if self._session_tasks:
+            await asyncio.gather(*self._session_tasks, return_exceptions=True)
+        self._sessions = {}
+        self._session_tasks = []
+        self._tools = None
+        self._loop = None
+
+
+_default_manager = None
+
+
+def get_default_manager() -> MCPConnectionManager:
+    global _default_manager
+    if _default_manager is None:
+        _default_manager = MCPConnectionManager()
+    return _default_manager
+
+
+# Replace the process-wide manager (e.g. with an in-process one from a CLI flag)
+def set_default_manager(manager: MCPConnectionManager):
+    global _default_manager
+    _default_manager = manager
+
+
+# Resolve the manager injected through build_graph(), falling back to the
+# process-wide default.
+def get_mcp_manager(config: RunnableConfig | None = None) -> MCPConnectionManager:
+    configurable = (config or {}).get("configurable", {})
+    return configurable.get("mcp_manager") or get_default_manager()
@@ -0,0 +1,12 @@
+# Graph modes:
+# - agentic: a gpt-4o call per step picks the (forced) tool call
+# - deterministic: the pipeline order is fixed, so tool calls are built from state
+# Kept free of langchain imports so CLIs can offer the choices without loading the graph.
+AGENTIC = "agentic"
+DETERMINISTIC = "deterministic"
+MODES = (AGENTIC, DETERMINISTIC)
+
+
+def get_mode(config: dict | None = None) -> str:
+    configurable = (config or {}).get("configurable", {})
+    return configurable.get("mode", AGENTIC)
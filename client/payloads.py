@@ -0,0 +1,111 @@
+import hashlib
+import inspect
+import os
+
+from langchain_core.messages import AIMessage, BaseMessage
+from langgraph.graph.message import add_messages
+
+# Keeps AgentState small at any concurrency:
+# - messages go through a bounded reducer: new messages are appended (or
+#   replace the message with the same id) and only the last AGENT_MAX_MESSAGES
+#   are kept
+# - large payloads (the COI, tool results, tool-call arguments) are stored once
+#   in state["payloads"], keyed by content hash; messages carry a short
+#   "payload:<hash>" reference. acting_node resolves the references of the
+#   tool calls it executes; nodes that read the input message as data go
+#   through last_message_text.
+
+MAX_MESSAGES = int(os.getenv("AGENT_MAX_MESSAGES", "16"))
+MIN_CHARS = int(os.getenv("PAYLOAD_MIN_CHARS", "256"))
+PREFIX = "payload:"
+
+
+def bounded_messages(left: list, right) -> list:
+    return add_messages(left, right)[-MAX_MESSAGES:]
+
+
+def merge_payloads(left: dict, right: dict) -> dict:
+    return {**left, **right}
+
+
+def payload_key(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:24]
+
+
+# Large text -> reference (stored in payloads); short text is kept inline
+def stash(value, payloads: dict):
+    if not isinstance(value, str) or len(value) < MIN_CHARS or value.startswith(PREFIX):
+        return value
+    key = payload_key(value)
+    payloads[key] = value
+    return PREFIX + key
+
+
+def resolve(value, payloads: dict):
+    if isinstance(value, str) and value.startswith(PREFIX):
+        return payloads.get(value[len(PREFIX):], value)
+    return value
+
+
+# Text of the state's last message (the input COI for entry nodes) with a
+# payload reference resolved: stash_node may already have replaced it
+def last_message_text(state) -> str:
+    messages = state["messages"]
+    if not isinstance(messages, list):
+        return messages
+    return resolve(messages[-1].content, state.get("payloads", {}))
+
+
+def _map_message(message: BaseMessage, fn) -> BaseMessage:
+    update = {}
+    content = fn(message.content) if isinstance(message.content, str) else message.content
+    if content is not message.content:
+        update["content"] = content
+    if isinstance(message, AIMessage) and message.tool_calls:
+        calls = [{**call, "args": {k: fn(v) for k, v in call["args"].items()}} for call in message.tool_calls]
+        if calls != message.tool_calls:
+            update["tool_calls"] = calls
+            # The raw OpenAI tool calls repeat the arguments
+            update["additional_kwargs"] = {k: v for k, v in message.additional_kwargs.items() if k != "tool_calls"}
+    return message.model_copy(update=update) if update else message
+
+
+def stash_message(message: BaseMessage, payloads: dict) -> BaseMessage:
+    return _map_message(message, lambda value: stash(value, payloads))
+
+
+def resolve_message(message: BaseMessage, payloads: dict) -> BaseMessage:
+    return _map_message(message, lambda value: resolve(value, payloads))
+
+
+# Wrap a graph node so the messages it returns, and any message of the state
+# still carrying a large payload inline (e.g. the input COI), are stored by
+# reference. Messages keep their ids, so the reducer replaces them in place.
+def stash_node(fn):
+    takes_config = len(inspect.signature(fn).parameters) > 1
+
+    async def node(state, config):
+        result = fn(state, config) if takes_config else fn(state)
+        if inspect.isawaitable(result):
+            result = await result
+        if not isinstance(result, dict):
+            return result
+        payloads = {}
+        new = result.get("messages")
+        new = new if isinstance(new, list) else []
+        known = {m.id for m in new if isinstance(m, BaseMessage)}
+        old = state.get("messages") if isinstance(state, dict) else None
+        # Replacements first, so the node's own messages stay last
+        stashed = []
+        for message in old if isinstance(old, list) else []:
+            if isinstance(message, BaseMessage) and message.id and message.id not in known:
+                compacted = stash_message(message, payloads)
+                if compacted is not message:
+                    stashed.append(compacted)
+        stashed += [stash_message(m, payloads) if isinstance(m, BaseMessage) else m for m in new]
+        if not payloads:
+            return result
+        return {**result, "messages": stashed, "payloads": {**result.get("payloads", {}), **payloads}}
+
+    return node
+
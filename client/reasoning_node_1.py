@@ -1,49 +1,50 @@
-from langchain_openai import ChatOpenAI
-from langchain_mcp_adapters.client import MultiServerMCPClient 
+from langchain_core.runnables import RunnableConfig
 
 from client.agent_state import AgentState
+from client.mcp_pool import get_mcp_manager
+from client.payloads import last_message_text
+from client.tool_calls import DETERMINISTIC, direct_tool_call, forced_tool_call, get_mode, upload_document
+from common.documents import compact_document_json
 
 # Node where the model decides to use the divide tool
-async def reasoning_node(state: AgentState):
-    print("reasoning_node\n\n")
+async def reasoning_node(state: AgentState, config: RunnableConfig):
     try:
-        client = MultiServerMCPClient({
-            "acord_25_insurance_compliance": {
-                "url": "http://127.0.0.1:8001/mcp",
-                "transport": "streamable_http"
-            }
-        })
-        tools = await client.get_tools()
+        # Extract user message(s)
+        user_msg = last_message_text(state)
 
-        # Initialize the model
-        model = ChatOpenAI(model="gpt-4o", temperature=0)
-        model_with_tools = model.bind_tools(tools)
-        
-        # Your custom prompt
-        system_prompt = (
-            """
-            **Only use the extract_summary tool.**
-            Return a summary as JSON.
-            """
-        )
+        # Pass the document by reference so the model doesn't have to echo it
+        document_id = await upload_document(config, user_msg)
+        tool_args = {"document_id": document_id} if document_id else {"document": compact_document_json(user_msg)}
 
-        # Extract user message(s)
-        user_msg = state["messages"][-1].content if isinstance(state["messages"], list) else state["messages"]
+        if get_mode(config) == DETERMINISTIC:
+            # The system prompt forces extract_summary anyway, skip the LLM round trip
+            response = direct_tool_call("extract_summary", tool_args)
+        else:
+            tools = await get_mcp_manager(config).get_tools()
+
+            # Your custom prompt
+            system_prompt = (
+                """
+                **Only use the extract_summary tool.**
+                Return a summary as JSON.
+                """
+            )
+            if document_id:
+                system_prompt += "Call extract_summary with the given document_id only.\n"
 
-        # Compose message list (system prompt + user message)
-        chat_history = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_msg}
-        ]
+            # Compose message list (system prompt + user message)
+            chat_history = [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": f"document_id: {document_id}" if document_id else tool_args["document"]}
+            ]
 
-        response = await model_with_tools.ainvoke(chat_history)
-        # print("query in reasoning_node", user_msg)
-        print("current_answer", response)
+            response = await forced_tool_call(tools, chat_history, "extract_summary")
         return {
             "messages": [response], 
             "step": 1, 
             "query": user_msg, 
             "current_answer": "",
+            "document_id": document_id or "",
         }
     except Exception as e:
         return {
@@ -1,89 +1,84 @@
-from langchain_openai import ChatOpenAI
-from langchain_mcp_adapters.client import MultiServerMCPClient 
+from langchain_core.runnables import RunnableConfig
 from langgraph.prebuilt import ToolNode
 from client.agent_state import AgentState
+from client.mcp_pool import get_mcp_manager
+from client.tool_calls import DETERMINISTIC, direct_tool_call, forced_tool_call, get_mode
 from langchain_core.messages import AIMessage
 import json
 
-async def reasoning_node_2(state: AgentState):
-    print("reasoning_node_2\n\n")
-    try:
-        client = MultiServerMCPClient({
-            "acord_25_insurance_compliance": {
-                "url": "http://127.0.0.1:8001/mcp",
-                "transport": "streamable_http"
-            }
-        })
-        tools = await client.get_tools()
-        # Initialize the model
-        model = ChatOpenAI(model="gpt-4o", temperature=0)
-        model_with_tools = model.bind_tools(tools)
-
-        current_answer = state.get("current_answer", "").replace("```json", "").replace("```", "").strip()
-
-        print("current_answer", current_answer)
+from common.documents import compact_json
 
-        analyze_summary_tool = next((tool for tool in tools if tool.name == "analyze_summary"), None)
+async def reasoning_node_2(state: AgentState, config: RunnableConfig):
+    try:
+        summary = state.get("summary")
+        if summary is not None:
+            current_answer = compact_json(summary.model_dump_json())
+        else:
+            current_answer = state.get("current_answer", "").replace("```json", "").replace("```", "").strip()
 
-        # Create a state with the tool call
-        tool_state = {
-            "messages": [
-                AIMessage(
-                    content="",
-                    additional_kwargs={
-                        "tool_calls": [{
-                            "id": "node_2",
-                            "function": {
-                                "name": "analyze_summary",
-                                "arguments": json.dumps({"summary": current_answer})
-                            },
-                            "type": "function"
-                        }]
-                    }
-                )
-            ]
-        }
+        # Extract user message(s)
+        query = state.get("query", "")  
 
-        tool_node = ToolNode([analyze_summary_tool])
-        analysis_result = await tool_node.ainvoke(tool_state)
+        if get_mode(config) == DETERMINISTIC:
+            # Call analyze_summary straight from state: no routing LLM call and
+            # no duplicate direct invocation whose result gets thrown away
+            response = direct_tool_call("analyze_summary", {"summary": current_answer})
+        else:
+            tools = await get_mcp_manager(config).get_tools()
 
-        print("direct tool invocation result:", analysis_result)
-        
-        # Your custom prompt
-        system_prompt = (
-            f"""
-            Current answer: {current_answer}
+            analyze_summary_tool = next((tool for tool in tools if tool.name == "analyze_summary"), None)
 
-            **Only use the analyze_summary tool.**
+            # Create a state with the tool call
+            tool_state = {
+                "messages": [
+                    AIMessage(
+                        content="",
+                        additional_kwargs={
+                            "tool_calls": [{
+                                "id": "node_2",
+                                "function": {
+                                    "name": "analyze_summary",
+                                    "arguments": json.dumps({"summary": current_answer})
+                                },
+                                "type": "function"
+                            }]
+                        }
+                    )
+                ]
+            }
 
-            Return a summary as JSON.
-            """
-        )
+            tool_node = ToolNode([analyze_summary_tool])
+            analysis_result = await tool_node.ainvoke(tool_state)
 
-        print("system_prompt", system_prompt)
+            
+            # Your custom prompt
+            # The summary goes in the user message only, not a second time here
+            system_prompt = (
+                """
+                The user message is the current answer: an extracted COI summary.
 
-        # Extract user message(s)
-        query = state.get("query", "")  
+                **Only use the analyze_summary tool.**
 
-        # Compose message list (system prompt + user message)
-        chat_history = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": current_answer}
-        ]
+                Return a summary as JSON.
+                """
+            )
 
-        messages = state.get("messages", [])
+            # Compose message list (system prompt + user message)
+            chat_history = [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": current_answer}
+            ]
 
-        response = await model_with_tools.ainvoke(chat_history)
+            response = await forced_tool_call(tools, chat_history, "analyze_summary")
         
         return {
-            "messages": messages + [response], 
+            "messages": [response],
             "step": 2, 
             "query": query, 
             "current_answer": ""
         }
     except Exception as e:
         return {
-            "messages": messages, 
             "step": 2, 
             "query": query, 
             "current_answer": "", 
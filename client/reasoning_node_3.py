@@ -1,61 +1,52 @@
-from langchain_openai import ChatOpenAI
-from langchain_mcp_adapters.client import MultiServerMCPClient 
+from langchain_core.runnables import RunnableConfig
 
 from client.agent_state import AgentState
+from client.mcp_pool import get_mcp_manager
+from client.tool_calls import DETERMINISTIC, direct_tool_call, forced_tool_call, get_mode
+from common.documents import compact_json
 
-async def reasoning_node_3(state: AgentState):
-    print("reasoning_node_3\n\n")
+async def reasoning_node_3(state: AgentState, config: RunnableConfig):
     try:
-        client = MultiServerMCPClient({
-            "acord_25_insurance_compliance": {
-                "url": "http://127.0.0.1:8001/mcp",
-                "transport": "streamable_http"
-            }
-        })
-        tools = await client.get_tools()
-        # Initialize the model
-        model = ChatOpenAI(model="gpt-4o", temperature=0)
-        model_with_tools = model.bind_tools(tools)
-
-        current_answer = state.get("current_answer", "")
-        print("current_answer", current_answer)
-        # Your custom prompt
-        system_prompt = (
-            f"""
-            Format the current answer as an email to joesimile@gmail.com. 
-            
-            **Only use the format_email tool.**
-
-            Current answer: {current_answer}
-
-            Format the output as a professional email with a subject line, greeting, body, and closing, all as a single string.
-            Do not use markdown or code blocks—output only the email as it would be sent.
-            """
-        )
-
-        print("system_prompt", system_prompt)
+        analysis = state.get("analysis")
+        current_answer = compact_json(analysis.model_dump_json()) if analysis is not None else state.get("current_answer", "")
 
         # Extract user message(s)
         query = state.get("query", "")
 
-        # Compose message list (system prompt + user message)
-        chat_history = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": current_answer}
-        ]
+        if get_mode(config) == DETERMINISTIC:
+            # The email step always calls format_email on the analysis
+            response = direct_tool_call("format_email", {"analysis": current_answer})
+        else:
+            tools = await get_mcp_manager(config).get_tools()
 
-        messages = state.get("messages", [])
+            # Your custom prompt
+            # The analysis goes in the user message only, not a second time here
+            system_prompt = (
+                """
+                Format the current answer (the user message) as an email to joesimile@gmail.com.
 
-        response = await model_with_tools.ainvoke(chat_history)
+                **Only use the format_email tool.**
+
+                Format the output as a professional email with a subject line, greeting, body, and closing, all as a single string.
+                Do not use markdown or code blocks—output only the email as it would be sent.
+                """
+            )
+
+            # Compose message list (system prompt + user message)
+            chat_history = [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": current_answer}
+            ]
+
+            response = await forced_tool_call(tools, chat_history, "format_email")
         return {
-            "messages": messages + [response], 
+            "messages": [response],
             "step": 3, 
             "query": query, 
             "current_answer": "",
         }
     except Exception as e:
         return {
-            "messages": messages,
             "step": 3, 
             "query": query, 
             "current_answer": response.content, 
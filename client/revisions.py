@@ -0,0 +1,206 @@
+import asyncio
+import hashlib
+import json
+import os
+
+from langchain_core.runnables import RunnableConfig
+
+from client.agent_state import AgentState
+from client.coverage_fanout import coverage_sends
+from client.mcp_pool import get_mcp_manager
+from client.payloads import last_message_text
+from common.documents import coverage_key, parse_document
+from common.schemas import Check, CoiSummary, CoverageAnalysis, CoverageSummary
+
+# Incremental re-validation of revised certificates.
+# The last validated version of each certificate (keyed by its document_id and
+# named_insured) is kept with its summary and per-coverage analyses. When a
+# revision comes in, the raw JSON is diffed field by field; if only coverages
+# changed, just those coverages are re-extracted and re-analyzed and the rest
+# is reused. Any change outside coverages/carriers reruns the full pipeline.
+
+DEFAULT_DIR = os.getenv("REVISION_STORE_DIR", ".cache/revisions")
+
+# Raw top-level fields that belong to individual coverages
+COVERAGE_FIELDS = ("coverages", "carriers")
+
+
+def revision_key(document: dict) -> str | None:
+    if not document.get("document_id") and not document.get("named_insured"):
+        return None
+    name = f"{document.get('document_id', '')}|{document.get('named_insured', '')}"
+    return hashlib.sha256(name.encode("utf-8")).hexdigest()[:24]
+
+
+# Field-level diff: dotted paths (coverages[1].limit_aggregate) whose value differs
+def diff_documents(old, new, path: str = "") -> list:
+    if isinstance(old, dict) and isinstance(new, dict):
+        changed = []
+        for key in sorted(set(old) | set(new), key=str):
+            changed += diff_documents(old.get(key), new.get(key), f"{path}.{key}" if path else str(key))
+        return changed
+    if isinstance(old, list) and isinstance(new, list) and len(old) == len(new):
+        changed = []
+        for i, (a, b) in enumerate(zip(old, new)):
+            changed += diff_documents(a, b, f"{path}[{i}]")
+        return changed
+    return [] if old == new else [path]
+
+
+# Stable slot per coverage ("general_liability#0"), so coverages are matched by
+# type rather than by position between two versions and the extracted summary
+def coverage_slots(coverage_types: list) -> list:
+    seen = {}
+    slots = []
+    for coverage_type in coverage_types:
+        key = coverage_key(coverage_type or "") or (coverage_type or "").strip().lower()
+        slots.append(f"{key}#{seen.get(key, 0)}")
+        seen[key] = seen.get(key, 0) + 1
+    return slots
+
+
+def raw_coverages(document: dict) -> dict:
+    coverages = document.get("coverages") or []
+    carriers = document.get("carriers") or {}
+    slots = coverage_slots([coverage.get("coverage_type", "") for coverage in coverages])
+    return {
+        slot: {"coverage": coverage, "carrier": carriers.get(slot.split("#")[0], "")}
+        for slot, coverage in zip(slots, coverages)
+    }
+
+
+# One JSON file per certificate; the last validated version wins
+class RevisionStore:
+    def __init__(self, directory: str = DEFAULT_DIR):
+        self.directory = directory
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str) -> dict | None:
+        try:
+            with open(self._path(key), "r") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def put(self, key: str, revision: dict):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp = self._path(key) + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(revision, f, separators=(",", ":"))
+        os.replace(tmp, self._path(key))
+
+
+revisions = RevisionStore()
+
+
+# Decide what of the previous revision can be reused. Returns None when the
+# full pipeline has to run, else the plan for an incremental run.
+def plan_revision(previous: dict, document: dict) -> dict | None:
+    changed = diff_documents(previous["document"], document)
+    if any(not path.startswith(COVERAGE_FIELDS) for path in changed):
+        return None
+    old = raw_coverages(previous["document"])
+    new = raw_coverages(document)
+    reuse, rerun = {}, {}
+    for index, (slot, entry) in enumerate(new.items()):
+        if old.get(slot) == entry and slot in previous["coverages"]:
+            reuse[index] = slot
+        else:
+            rerun[index] = entry
+    return {"changed": changed, "reuse": reuse, "rerun": rerun, "slots": list(new)}
+
+
+# Graph entry point with incremental=True: looks up the previous revision and
+# either hands over to the full pipeline or patches the previous summary with
+# re-extracted coverages and queues only those for analysis
+async def revision_node(state: AgentState, config: RunnableConfig):
+    query = last_message_text(state)
+    try:
+        document = parse_document(query)
+        key = revision_key(document)
+        previous = revisions.get(key) if key else None
+        plan = plan_revision(previous, document) if previous else None
+        if plan is None:
+            return {"query": query, "revision": {"status": "full" if previous else "new"}}
+
+        tool = await get_mcp_manager(config).get_tool("extract_coverage")
+        if tool is None and plan["rerun"]:
+            return {"query": query, "revision": {"status": "full"}}
+        extracted = await asyncio.gather(*(
+            tool.ainvoke({"coverage": json.dumps(entry["coverage"]), "carrier": entry["carrier"]})
+            for entry in plan["rerun"].values()
+        ))
+        rerun = dict(zip(plan["rerun"], (CoverageSummary.model_validate_json(result) for result in extracted)))
+
+        summary = CoiSummary.model_validate(previous["summary"])
+        coverages = []
+        for index in range(len(plan["reuse"]) + len(rerun)):
+            if index in rerun:
+                coverages.append(rerun[index])
+            else:
+                coverages.append(CoverageSummary.model_validate(previous["coverages"][plan["reuse"][index]]["summary"]))
+        # Missing fields reported for coverages that changed may no longer apply
+        changed_types = {coverage.coverage_type.lower() for coverage in rerun.values()}
+        missing_fields = [m for m in summary.missing_fields if not any(t in m.field.lower() for t in changed_types)]
+        summary = summary.model_copy(update={"coverages": coverages, "missing_fields": missing_fields})
+
+        return {
+            "messages": [],
+            "query": query,
+            "step": 1,
+            "summary": summary,
+            "coverage_analyses": [
+                {"index": index, "analysis": CoverageAnalysis.model_validate(previous["coverages"][slot]["analysis"])}
+                for index, slot in plan["reuse"].items()
+            ],
+            "general_checks": [Check.model_validate(check) for check in previous["general_checks"]],
+            "revision": {
+                "status": "incremental",
+                "changed": plan["changed"],
+                "reused": list(plan["reuse"].values()),
+                "rerun": list(rerun),
+                "slots": plan["slots"],
+            },
+        }
+    except Exception as e:
+        return {"query": query, "step": 1, "error": str(e)}
+
+
+def route_revision(state: AgentState):
+    if state.get("error"):
+        return "error_node"
+    revision = state.get("revision", {})
+    if revision.get("status") != "incremental":
+        return "reasoning_node"
+    return coverage_sends(state["summary"], revision["rerun"]) or "merge_analysis"
+
+
+# After the merge: remember this version with its per-coverage results
+def record_revision_node(state: AgentState):
+    try:
+        document = parse_document(state.get("query", ""))
+        key = revision_key(document)
+        summary = state.get("summary")
+        if not key or summary is None:
+            return {}
+        analyses = {item["index"]: item["analysis"] for item in state.get("coverage_analyses", [])}
+        # An incremental run already knows the slot of every coverage; after a
+        # full extraction, match by the extracted coverage types
+        slots = state.get("revision", {}).get("slots") or coverage_slots([coverage.coverage_type for coverage in summary.coverages])
+        # Only reusable if the extraction lines up with the raw coverages
+        if sorted(slots) != sorted(raw_coverages(document)) or len(analyses) != len(slots):
+            slots = []
+        revisions.put(key, {
+            "document": document,
+            "summary": summary.model_dump(mode="json"),
+            "coverages": {
+                slot: {"summary": coverage.model_dump(mode="json"), "analysis": analyses[index].model_dump(mode="json")}
+                for index, (slot, coverage) in enumerate(zip(slots, summary.coverages))
+            },
+            "general_checks": [check.model_dump(mode="json") for check in state.get("general_checks", [])],
+        })
+    except Exception as e:
+        print("could not record revision:", e)
+    return {}
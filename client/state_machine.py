@@ -1,5 +1,8 @@
+import orjson
 from langchain_core.messages import BaseMessage
+from pydantic import BaseModel
 from langchain_core.runnables import RunnableLambda
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from langgraph.graph import StateGraph, END
 
 from client.reasoning_node_1 import reasoning_node
@@ -7,27 +10,80 @@ from client.reasoning_node_2 import reasoning_node_2
 from client.reasoning_node_3 import reasoning_node_3
 from client.acting_node import acting_node
 from client.error_node import error_node
+from client.coverage_fanout import (
+    dispatch_coverage_analysis,
+    coverage_analysis_node,
+    general_analysis_node,
+    merge_analysis_node,
+)
+from client.revisions import revision_node, route_revision, record_revision_node
 
 from client.agent_state import AgentState
+from client.mcp_pool import MCPConnectionManager, get_default_manager
+from client.modes import AGENTIC, MODES
+from client.payloads import stash_node
+from client.tracing import traced_node
 
-# Serializer for JSON output
+# Serializer for JSON output: messages without their empty fields and the
+# raw provider payloads (additional_kwargs / response_metadata repeat the
+# tool calls and usage)
 def serialize_message(obj):
     if isinstance(obj, BaseMessage):
-        return obj.dict()
+        data = obj.model_dump(exclude={"additional_kwargs", "response_metadata"}, exclude_none=True)
+        return {k: v for k, v in data.items() if v not in ("", [], {})}
+    elif isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
     elif isinstance(obj, Exception):
         return str(obj)
     return obj
 
+# Final state as compact JSON bytes
+def dumps_state(state: dict) -> bytes:
+    return orjson.dumps(state, default=serialize_message)
+
 # Build the LangGraph
-async def build_graph():
+# Nodes share one MCP connection manager (sessions + cached tool list),
+# injected through the graph config; defaults to the process-wide one.
+# mode="deterministic" builds the forced tool calls from state instead of
+# asking gpt-4o to emit them (see client/tool_calls.py).
+# fan_out=True replaces the single analyze_summary step with one analysis per
+# coverage run in parallel and merged back (see client/coverage_fanout.py).
+# checkpointer makes runs resumable (see client/checkpointing.py).
+# incremental=True re-validates a revised certificate by re-running only the
+# coverages that changed since its last version (see client/revisions.py);
+# it needs the per-coverage results, so it implies fan_out.
+async def build_graph(mcp_manager: MCPConnectionManager | None = None, mode: str = AGENTIC, fan_out: bool = False, checkpointer: BaseCheckpointSaver | None = None, incremental: bool = False):
+    if mode not in MODES:
+        raise ValueError(f"Unknown graph mode '{mode}', expected one of {MODES}")
+    fan_out = fan_out or incremental
+    configurable = {"mcp_manager": mcp_manager or get_default_manager(), "mode": mode}
+
+    # Bound per node rather than on the compiled graph: a caller-supplied
+    # configurable (e.g. a checkpoint thread_id) replaces the graph-level one.
+    # Every node is traced (see client/tracing.py) and stores large message
+    # payloads by reference (see client/payloads.py).
     graph_builder = StateGraph(AgentState)
-    graph_builder.add_node("reasoning_node", RunnableLambda(reasoning_node))
-    graph_builder.add_node("reasoning_node_2", RunnableLambda(reasoning_node_2))
-    graph_builder.add_node("reasoning_node_3", RunnableLambda(reasoning_node_3))
-    graph_builder.add_node("safe_tools", RunnableLambda(acting_node))
-    graph_builder.add_node("error_node", RunnableLambda(error_node))
 
-    graph_builder.set_entry_point("reasoning_node")
+    def add_node(name, fn):
+        graph_builder.add_node(name, RunnableLambda(traced_node(name, stash_node(fn)), name=name).with_config(configurable=configurable))
+
+    add_node("reasoning_node", reasoning_node)
+    add_node("reasoning_node_2", reasoning_node_2)
+    add_node("reasoning_node_3", reasoning_node_3)
+    add_node("safe_tools", acting_node)
+    add_node("error_node", error_node)
+    if fan_out:
+        add_node("coverage_analysis", coverage_analysis_node)
+        add_node("general_analysis", general_analysis_node)
+        add_node("merge_analysis", merge_analysis_node)
+    if incremental:
+        add_node("revision_node", revision_node)
+        add_node("record_revision", record_revision_node)
+        graph_builder.set_entry_point("revision_node")
+        graph_builder.add_conditional_edges("revision_node", route_revision)
+        graph_builder.add_edge("record_revision", "reasoning_node_3")
+    else:
+        graph_builder.set_entry_point("reasoning_node")
 
     # Routing logic based on the presence of errors or tool calls
     def route(state: AgentState):
@@ -54,6 +110,8 @@ async def build_graph():
         # Default to step 2 if not set
         step = state.get("step", 1)
         if step == 1:
+            if fan_out:
+                return dispatch_coverage_analysis(state)
             return "reasoning_node_2"
         elif step == 2:
             return "reasoning_node_3"
@@ -62,7 +120,15 @@ async def build_graph():
         
     graph_builder.add_conditional_edges("safe_tools", route_from_safe_tools)
 
+    if fan_out:
+        graph_builder.add_edge("coverage_analysis", "merge_analysis")
+        graph_builder.add_edge("general_analysis", "merge_analysis")
+        graph_builder.add_conditional_edges(
+            "merge_analysis",
+            lambda state: "error_node" if state.get("error") else ("record_revision" if incremental else "reasoning_node_3")
+        )
+
     # After error_node, always end
     graph_builder.add_edge("error_node", END)
 
-    return graph_builder.compile()
\ No newline at end of file
+    return graph_builder.compile(checkpointer=checkpointer)
\ No newline at end of file
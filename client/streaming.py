@@ -0,0 +1,63 @@
+import contextvars
+import time
+
+from langgraph.config import get_stream_writer
+
+# Streaming mode: node start/finish events as they happen, plus the tokens
+# the server streams back from format_email as MCP progress notifications.
+# Token forwarding is only switched on inside stream_run(), so regular
+# ainvoke() runs don't make the server stream.
+
+streaming = contextvars.ContextVar("streaming", default=False)
+
+
+# Progress callback for a tool call made from inside a graph node: forwards
+# each progress message (a chunk of generated text) to the graph's custom
+# stream. The writer is looked up now, in the node's context, because the
+# callback itself runs in the MCP session's receive task.
+def token_forwarder(tool: str):
+    if not streaming.get():
+        return None
+    try:
+        writer = get_stream_writer()
+    except RuntimeError:
+        return None
+
+    async def forward(progress: float, total: float | None, message: str | None):
+        if message:
+            writer({"tool": tool, "token": message})
+
+    return forward
+
+
+# Run the graph and yield events as they happen:
+#   {"event": "start", "node": ...}
+#   {"event": "end", "node": ..., "ms": ..., "error": ...}
+#   {"event": "token", "tool": ..., "text": ...}
+#   {"event": "done", "state": {...}}  (last)
+async def stream_run(graph, input, config: dict | None = None):
+    token = streaming.set(True)
+    started = {}
+    state = None
+    try:
+        async for mode, chunk in graph.astream(input, config, stream_mode=["debug", "custom", "values"]):
+            if mode == "values":
+                state = chunk
+            elif mode == "custom":
+                yield {"event": "token", "tool": chunk.get("tool"), "text": chunk.get("token", "")}
+            elif chunk["type"] == "task":
+                name = chunk["payload"]["name"]
+                started[chunk["payload"]["id"]] = time.perf_counter()
+                yield {"event": "start", "node": name}
+            elif chunk["type"] == "task_result":
+                payload = chunk["payload"]
+                began = started.pop(payload["id"], None)
+                yield {
+                    "event": "end",
+                    "node": payload["name"],
+                    "ms": round((time.perf_counter() - began) * 1000, 1) if began else None,
+                    "error": payload.get("error"),
+                }
+    finally:
+        streaming.reset(token)
+    yield {"event": "done", "state": state}
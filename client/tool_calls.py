@@ -0,0 +1,58 @@
+import os
+import time
+from uuid import uuid4
+
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableConfig
+
+from client.mcp_pool import get_mcp_manager
+from client.modes import AGENTIC, DETERMINISTIC, MODES, get_mode
+from common.tracing import tracer
+
+# Models tried in order for the agentic tool-call decision; a smaller model's
+# answer is used unless it doesn't call the expected tool with arguments
+AGENT_MODELS = [m.strip() for m in os.getenv("AGENT_MODELS", "gpt-4o-mini,gpt-4o").split(",") if m.strip()]
+
+
+# Build the AIMessage the model would have produced for a forced tool call
+def direct_tool_call(name: str, args: dict) -> AIMessage:
+    return AIMessage(
+        content="",
+        tool_calls=[{
+            "name": name,
+            "args": args,
+            "id": f"{name}_{uuid4().hex[:12]}",
+            "type": "tool_call"
+        }]
+    )
+
+
+# Upload the COI to the server's document store so tool calls can carry its
+# short id instead of the whole document. Returns None if the server has no
+# store (the caller then falls back to passing the document inline).
+async def upload_document(config: RunnableConfig | None, document: str) -> str | None:
+    store_tool = await get_mcp_manager(config).get_tool("store_document")
+    if store_tool is None:
+        return None
+    try:
+        document_id = await store_tool.ainvoke({"document": document})
+    except Exception as e:
+        print("store_document failed, sending the document inline:", e)
+        return None
+    return document_id.strip() if isinstance(document_id, str) else None
+
+
+# Agentic step: ask the model for the (forced) tool call, escalating to the
+# next model in AGENT_MODELS when the answer has no usable call to tool_name
+async def forced_tool_call(tools: list, chat_history: list, tool_name: str, models: list = AGENT_MODELS) -> AIMessage:
+    # Deterministic runs never get here, so they don't pay for importing langchain_openai
+    from langchain_openai import ChatOpenAI
+
+    for tier, model in enumerate(models):
+        last = tier == len(models) - 1
+        start, started = time.time(), time.perf_counter()
+        response = await ChatOpenAI(model=model, temperature=0).bind_tools(tools).ainvoke(chat_history)
+        if last or any(call["name"] == tool_name and call["args"] for call in response.tool_calls):
+            return response
+        tracer.record("cascade", tool_name, start, time.perf_counter() - started, model=model, tier=tier,
+                      error=f"escalated: no {tool_name} call")
@@ -0,0 +1,67 @@
+import asyncio
+import inspect
+import json
+
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableConfig
+
+from common.tracing import trace_context, tracer
+
+# Client side of the tracing layer (see common/tracing.py): a span per graph
+# node, the run's trace fields forwarded to the MCP server with every tool
+# call (see MCPSession in client/mcp_pool.py), and collection of the server's
+# spans once a run is done.
+
+
+# Wrap a graph node so every execution is recorded as a "node" span. Token
+# usage of the node's own gpt-4o call (its last returned AIMessage) is
+# attached to the span.
+def traced_node(name: str, fn):
+    takes_config = len(inspect.signature(fn).parameters) > 1
+
+    async def node(state, config: RunnableConfig):
+        with tracer.span("node", name) as span:
+            result = fn(state, config) if takes_config else fn(state)
+            if inspect.isawaitable(result):
+                result = await result
+            if isinstance(result, dict):
+                messages = result.get("messages")
+                last = messages[-1] if isinstance(messages, list) and messages else None
+                usage = getattr(last, "usage_metadata", None) if isinstance(last, AIMessage) else None
+                if usage:
+                    span.update(
+                        model=last.response_metadata.get("model_name"),
+                        prompt_tokens=usage.get("input_tokens", 0),
+                        completion_tokens=usage.get("output_tokens", 0),
+                        cached_tokens=usage.get("input_token_details", {}).get("cache_read", 0),
+                    )
+                if result.get("error"):
+                    span["error"] = result["error"]
+            return result
+
+    return node
+
+
+# Trace fields sent to the MCP server in each tools/call _meta
+def trace_meta() -> dict:
+    return {k: v for k, v in trace_context.get().items() if k in ("run_id", "document_id")}
+
+
+# Fetch the server-side spans (tool calls, OpenAI requests) of finished runs
+async def server_spans(manager, run_ids: list, concurrency: int = 8) -> list:
+    # An in-process server records into this process's tracer already
+    if getattr(manager, "in_process", False):
+        return []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch(run_id):
+        async with semaphore:
+            try:
+                contents = await manager.read_resource(f"trace://runs/{run_id}")
+            except Exception as e:
+                print(f"could not fetch server spans for run {run_id}:", e)
+                return []
+        return [span for content in contents for span in json.loads(content)]
+
+    results = await asyncio.gather(*(fetch(run_id) for run_id in run_ids))
+    return [span for spans in results for span in spans]
@@ -0,0 +1,158 @@
+import ast
+import fnmatch
+import hashlib
+import json
+import os
+import re
+
+# COI helpers shared by the client and the server: parsing, content ids,
+# coverage keys and the compaction of prompt inputs. Standard library only,
+# so a client deployed without the server package can still use them.
+
+ID_PREFIX = "coi-"
+
+
+def parse_document(document) -> dict:
+    if isinstance(document, dict):
+        return document
+    text = str(document).strip()
+    try:
+        return json.loads(text)
+    except ValueError:
+        # main.py sends the COI as a Python dict repr
+        return ast.literal_eval(text)
+
+
+# Minified, key-sorted JSON: the form documents are hashed and stored in
+def canonical_json(document) -> str:
+    return json.dumps(parse_document(document), sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+
+# Prompt compaction (see server/compaction.py): the fields of a COI that the
+# extract_summary prompt and server/rules.py actually read. Top-level fields
+# not listed are dropped; NESTED_FIELDS lists what is kept inside a top-level
+# object, inside each entry of a list ("coverages") or inside each value of a
+# keyed mapping ("specialty_coverages.*"), with * wildcards. The document
+# store and check_compliance keep working on the full document.
+DOCUMENT_FIELDS = (
+    "certificate_type", "named_insured", "insured_address", "producer",
+    "certificate_holder", "project_id", "project_name", "project_address", "job_name", "job_address",
+    "carriers", "coverages", "description_of_operations", "additional_endorsements_notes", "specialty_coverages",
+)
+NESTED_FIELDS = {
+    "producer": ("agency_name", "name", "address"),
+    "coverages": (
+        "coverage_type", "carrier", "policy_number", "effective_date", "expiry_date", "limit_*", "*_limit",
+        "project_box_checked", "project_specific", "endorsements", "additional_insureds",
+        "waiver_of_subrogation", "waiver_parties", "primary_and_noncontributory",
+    ),
+    "specialty_coverages.*": ("required",),
+}
+
+
+# COMPACT_KEEP_FIELDS (comma-separated) keeps more fields for documents that
+# carry them, e.g. "notes,coverages.insurer_letter,producer.agent_name"
+def _keep_fields(extra: str) -> tuple:
+    top, nested = set(DOCUMENT_FIELDS), {path: set(fields) for path, fields in NESTED_FIELDS.items()}
+    for field in filter(None, (f.strip() for f in extra.split(","))):
+        path, _, name = field.rpartition(".")
+        if path:
+            nested.setdefault(path, set()).add(name)
+        top.add(field.split(".", 1)[0])
+    return top, nested
+
+
+KEEP_FIELDS, KEEP_NESTED_FIELDS = _keep_fields(os.getenv("COMPACT_KEEP_FIELDS", ""))
+
+
+def _select(value, fields: set):
+    if isinstance(value, list):
+        return [_select(v, fields) for v in value]
+    if isinstance(value, dict):
+        return {k: v for k, v in value.items() if any(fnmatch.fnmatchcase(k, pattern) for pattern in fields)}
+    return value
+
+
+def drop_empty(value):
+    if isinstance(value, dict):
+        items = ((k, drop_empty(v)) for k, v in value.items())
+        return {k: v for k, v in items if v not in (None, "", [], {})}
+    if isinstance(value, list):
+        return [v for v in (drop_empty(v) for v in value) if v not in (None, "", [], {})]
+    if isinstance(value, str):
+        return value.strip()
+    return value
+
+
+def minify(value) -> str:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+
+def compact_document(document) -> dict:
+    coi = parse_document(document)
+    compacted = {}
+    for name, value in coi.items():
+        if name not in KEEP_FIELDS:
+            continue
+        if name in KEEP_NESTED_FIELDS:
+            value = _select(value, KEEP_NESTED_FIELDS[name])
+        elif f"{name}.*" in KEEP_NESTED_FIELDS and isinstance(value, dict):
+            value = {k: _select(v, KEEP_NESTED_FIELDS[f"{name}.*"]) for k, v in value.items()}
+        compacted[name] = value
+    return drop_empty(compacted)
+
+
+# Raw COI (JSON or dict repr) -> minified JSON of the fields prompts need;
+# anything that doesn't parse as a document is passed through unchanged
+def compact_document_json(document) -> str:
+    try:
+        return minify(compact_document(document))
+    except (AttributeError, SyntaxError, ValueError):
+        return document if isinstance(document, str) else json.dumps(document)
+
+
+# Any JSON payload (summary, coverage, analysis) -> minified JSON without
+# empty values; text that isn't JSON is passed through unchanged
+def compact_json(text: str) -> str:
+    try:
+        value = json.loads(text)
+    except (TypeError, ValueError):
+        return text
+    if not isinstance(value, (dict, list)):
+        return text
+    return minify(drop_empty(value))
+
+
+def _id_for(text: str) -> str:
+    return ID_PREFIX + hashlib.sha256(text.encode("utf-8")).hexdigest()[:24]
+
+
+def document_id(document) -> str:
+    return _id_for(canonical_json(document))
+
+
+# Coverage keys and the coverage_type spellings that map to them
+COVERAGE_ALIASES = {
+    "general_liability": ("general liability", "commercial general liability", "gl"),
+    "auto_liability": ("automobile liability", "auto liability", "auto", "business auto"),
+    "umbrella_liability": ("umbrella liability", "excess liability", "umbrella", "umbrella/excess liability"),
+    "workers_compensation": ("workers' compensation", "workers compensation", "workers's compensation", "wc"),
+    "professional_liability": ("professional liability", "professional", "errors and omissions"),
+    "pollution_liability": ("pollution liability", "pollution", "contractors pollution liability"),
+    "inland_marine": ("inland marine", "installation floater", "builders risk"),
+}
+
+
+def normalize(text) -> str:
+    return re.sub(r"[^a-z0-9#]+", " ", str(text or "").lower()).strip()
+
+
+def coverage_key(coverage_type: str):
+    name = normalize(coverage_type)
+    for key, aliases in COVERAGE_ALIASES.items():
+        if name in (normalize(alias) for alias in aliases):
+            return key
+    for key, aliases in COVERAGE_ALIASES.items():
+        if any(normalize(alias) in name for alias in aliases if len(alias) > 3):
+            return key
+    return None
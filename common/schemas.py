@@ -0,0 +1,107 @@
+from typing import Literal
+
+from pydantic import BaseModel, Field
+
+# Structured-output schemas for extract_summary and analyze_summary.
+# The server asks the model for exactly these shapes and validates them once;
+# the client parses the tool result straight into the same models.
+
+Status = Literal["pass", "fail", "review", "n/a"]
+
+
+class Party(BaseModel):
+    name: str = Field(description="Legal or agency name")
+    address: str = Field(description="Business address, empty if not given")
+
+
+class Limit(BaseModel):
+    name: str = Field(description="Limit name, e.g. per_occurrence, aggregate, combined_single, per_claim")
+    amount: float = Field(description="Limit amount in USD")
+
+
+class CoverageSummary(BaseModel):
+    coverage_type: str = Field(description="e.g. General Liability, Automobile Liability, Workers' Compensation")
+    carrier: str
+    policy_number: str
+    effective_date: str
+    expiry_date: str
+    limits: list[Limit]
+    project_box_checked: bool | None
+    project_specific: bool | None
+    endorsements: list[str]
+    additional_insureds: list[str]
+    waiver_of_subrogation: bool | None
+    primary_and_noncontributory: bool | None
+
+
+class MissingField(BaseModel):
+    field: str
+    reason: str
+
+
+# No document_id: the prompt input doesn't carry it (see compact_document),
+# so the model could only make one up
+class CoiSummary(BaseModel):
+    certificate_type: str = Field(description="Certificate type, e.g. ACORD 25, or 'Not specified'")
+    certificate_holder: str = Field(description="Certificate holder exactly as written")
+    producer: Party = Field(description="Subcontractor's insurance agent")
+    insured: Party = Field(description="Subcontractor's legal name and business address")
+    coverages: list[CoverageSummary] = Field(description="One entry per policy on the certificate")
+    project_identification: str = Field(description="Project name, number or address")
+    description_of_operations: str
+    additional_endorsements: list[str]
+    missing_fields: list[MissingField]
+
+
+class Check(BaseModel):
+    section: str = Field(description="Checklist section, e.g. Basics, Minimum Coverage Limits, Certificate Holder")
+    rule: str
+    status: Status
+    detail: str
+
+
+class CoverageAnalysis(BaseModel):
+    coverage_type: str
+    compliant: bool
+    checks: list[Check]
+
+
+class GeneralAnalysis(BaseModel):
+    checks: list[Check]
+
+
+class ComplianceAnalysis(BaseModel):
+    compliant: bool
+    general: list[Check] = Field(description="Checks that are not tied to one coverage")
+    coverages: list[CoverageAnalysis]
+    missing_items: list[str]
+    recommendation: str
+
+
+# Packed requests (several documents in one call, see packed_completion in
+# server/server.py): one result per document id
+class KeyedCoiSummary(BaseModel):
+    key: str = Field(description="Id of the document this summary is for")
+    result: CoiSummary
+
+
+class PackedCoiSummaries(BaseModel):
+    results: list[KeyedCoiSummary]
+
+
+class KeyedComplianceAnalysis(BaseModel):
+    key: str = Field(description="Id of the summary this analysis is for")
+    result: ComplianceAnalysis
+
+
+class PackedComplianceAnalyses(BaseModel):
+    results: list[KeyedComplianceAnalysis]
+
+
+SCHEMAS = {
+    "extract_summary": CoiSummary,
+    "analyze_summary": ComplianceAnalysis,
+    "extract_coverage": CoverageSummary,
+    "analyze_coverage": CoverageAnalysis,
+    "analyze_general": GeneralAnalysis,
+}
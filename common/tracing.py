@@ -0,0 +1,144 @@
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+
+# Lightweight spans for graph nodes, MCP tools and OpenAI calls.
+# Spans are plain dicts kept in a bounded in-memory ring (cheap enough to
+# leave on) and optionally appended to a JSONL file as they finish.
+
+TRACE_PATH = os.getenv("TRACE_PATH", "")
+MAX_SPANS = int(os.getenv("TRACE_MAX_SPANS", "10000"))
+
+# USD per 1M tokens: (prompt, cached prompt, completion), matched by model prefix
+MODEL_PRICES = {
+    "gpt-4.1": (2.00, 0.50, 8.00),
+    "gpt-4.1-mini": (0.40, 0.10, 1.60),
+    "gpt-4.1-nano": (0.10, 0.025, 0.40),
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+}
+MODEL_PRICES.update({k: tuple(v) for k, v in json.loads(os.getenv("MODEL_PRICES", "{}")).items()})
+
+# run_id / document_id / tool of the work in progress; asyncio tasks (graph
+# nodes, fan-out branches) inherit it from the run that started them
+trace_context = contextvars.ContextVar("trace_context", default={})
+
+
+def new_run_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+@contextmanager
+def run_context(**fields):
+    token = trace_context.set({**trace_context.get(), **{k: v for k, v in fields.items() if v}})
+    try:
+        yield trace_context.get()
+    finally:
+        trace_context.reset(token)
+
+
+def cost(model: str, prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0) -> float | None:
+    matches = [name for name in MODEL_PRICES if model.startswith(name)]
+    if not matches:
+        return None
+    prompt, cached, completion = MODEL_PRICES[max(matches, key=len)]
+    return ((prompt_tokens - cached_tokens) * prompt + cached_tokens * cached + completion_tokens * completion) / 1e6
+
+
+class Tracer:
+    def __init__(self, path: str = TRACE_PATH, max_spans: int = MAX_SPANS):
+        self.path = path
+        self.spans = deque(maxlen=max_spans)
+        self._lock = threading.Lock()
+        self._file = None
+        # Called with every finished span (e.g. server/metrics.py)
+        self.listeners = []
+
+    def record(self, kind: str, name: str, start: float, wall_s: float, **fields) -> dict:
+        span = {**trace_context.get(), "kind": kind, "name": name, "start": round(start, 6), "wall_ms": round(wall_s * 1000, 3)}
+        span.update({k: v for k, v in fields.items() if v is not None})
+        if span.get("model") and "prompt_tokens" in span:
+            span["cost_usd"] = cost(span["model"], span["prompt_tokens"], span.get("completion_tokens", 0), span.get("cached_tokens", 0))
+        with self._lock:
+            self.spans.append(span)
+            if self.path:
+                if self._file is None:
+                    os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                    self._file = open(self.path, "a", buffering=1)
+                self._file.write(json.dumps(span, separators=(",", ":"), default=str) + "\n")
+        for listener in self.listeners:
+            listener(span)
+        return span
+
+    # Time a block; the yielded dict collects extra fields (tokens, model, ...)
+    @contextmanager
+    def span(self, kind: str, name: str, **fields):
+        start = time.time()
+        started = time.perf_counter()
+        try:
+            yield fields
+        except BaseException as e:
+            fields["error"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            self.record(kind, name, start, time.perf_counter() - started, **fields)
+
+    def for_run(self, run_id: str) -> list:
+        with self._lock:
+            return [span for span in self.spans if span.get("run_id") == run_id]
+
+
+tracer = Tracer()
+
+
+def export_jsonl(spans: list, path: str):
+    with open(path, "w") as f:
+        for span in sorted(spans, key=lambda s: s["start"]):
+            f.write(json.dumps(span, separators=(",", ":"), default=str) + "\n")
+
+
+def percentile(values: list, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, round(q * len(values) + 0.5) - 1))]
+
+
+# Aggregate spans per (kind, name, model): latency percentiles, tokens and spend
+def summarize(spans: list) -> list:
+    groups = {}
+    for span in spans:
+        key = (span["kind"], span["name"], span.get("model", ""))
+        groups.setdefault(key, []).append(span)
+
+    rows = []
+    for (kind, name, model), group in groups.items():
+        wall = [s["wall_ms"] for s in group]
+        rows.append({
+            "kind": kind,
+            "name": name,
+            "model": model,
+            "count": len(group),
+            "errors": sum(1 for s in group if s.get("error")),
+            "p50_ms": round(percentile(wall, 0.5), 1),
+            "p99_ms": round(percentile(wall, 0.99), 1),
+            "total_ms": round(sum(wall), 1),
+            "queue_ms": round(sum(s.get("queue_ms", 0) for s in group), 1),
+            "prompt_tokens": sum(s.get("prompt_tokens", 0) for s in group),
+            "completion_tokens": sum(s.get("completion_tokens", 0) for s in group),
+            "cached_tokens": sum(s.get("cached_tokens", 0) for s in group),
+            "cost_usd": round(sum(s.get("cost_usd") or 0 for s in group), 6),
+        })
+    return sorted(rows, key=lambda row: (row["kind"], -row["total_ms"]))
+
+
+SUMMARY_COLUMNS = ["kind", "name", "model", "count", "errors", "p50_ms", "p99_ms", "total_ms", "queue_ms", "prompt_tokens", "completion_tokens", "cached_tokens", "cost_usd"]
+
+
+def format_summary(rows: list) -> str:
+    table = [SUMMARY_COLUMNS] + [[str(row[column]) for column in SUMMARY_COLUMNS] for row in rows]
+    widths = [max(len(line[i]) for line in table) for i in range(len(SUMMARY_COLUMNS))]
+    return "\n".join("  ".join(cell.ljust(width) for cell, width in zip(line, widths)) for line in table)
@@ -0,0 +1,220 @@
+import argparse
+import asyncio
+import json
+import os
+import signal
+import socket
+import sys
+import time
+
+from dotenv import load_dotenv
+
+# Before any setting below or in client/server modules is read
+load_dotenv()
+
+from client.modes import AGENTIC, MODES
+
+# Warm client worker. `python daemon.py serve` imports langchain/langgraph once,
+# keeps the compiled graphs and the pooled MCP sessions in memory and validates
+# documents sent to a local Unix socket. `python daemon.py submit file.json`
+# is the thin side: no langchain imports, it sends the document and waits for the result.
+#
+# Protocol: one JSON object per line each way.
+#   request:  {"document": {...}, "mode": "agentic", "fan_out": false, "incremental": false}
+#             or {"op": "stats"}
+#   response: {"ok": true, "run_id": ..., "elapsed_s": ..., "error": null, "response": {...final state}}
+
+DEFAULT_SOCKET = os.getenv("CLIENT_SOCKET", ".cache/client.sock")
+
+# Documents are sent inline, so allow lines far beyond asyncio's 64 KiB default
+MAX_LINE = 16 * 1024 * 1024
+
+
+class Worker:
+    def __init__(self, concurrency: int):
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.graphs = {}
+        self.started = time.time()
+        self.jobs = 0
+        self.failed = 0
+        self.active = 0
+
+    # One compiled graph per option combination, built on first use
+    async def graph(self, mode: str, fan_out: bool, incremental: bool):
+        from client.state_machine import build_graph
+
+        key = (mode, fan_out, incremental)
+        if key not in self.graphs:
+            self.graphs[key] = await build_graph(mode=mode, fan_out=fan_out, incremental=incremental)
+        return self.graphs[key]
+
+    async def run(self, job: dict) -> dict:
+        import orjson
+        from client.state_machine import dumps_state
+        from common.documents import document_id
+        from common.tracing import new_run_id, run_context
+
+        mode = job.get("mode", AGENTIC)
+        if mode not in MODES:
+            return {"ok": False, "error": f"unknown mode {mode!r}"}
+        coi = job.get("document")
+        if coi is None:
+            return {"ok": False, "error": "document is required"}
+
+        started = time.perf_counter()
+        result = {"run_id": new_run_id()}
+        async with self.semaphore:
+            self.active += 1
+            try:
+                graph = await self.graph(mode, bool(job.get("fan_out")), bool(job.get("incremental")))
+                with run_context(run_id=result["run_id"], document_id=document_id(coi)):
+                    response = await graph.ainvoke({"messages": f"{coi}"})
+                result["ok"] = not response.get("error")
+                result["error"] = response.get("error")
+                result["response"] = orjson.loads(dumps_state(response))
+            except Exception as e:
+                result["ok"] = False
+                result["error"] = str(e)
+            finally:
+                self.active -= 1
+        self.jobs += 1
+        self.failed += not result["ok"]
+        result["elapsed_s"] = round(time.perf_counter() - started, 3)
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "uptime_s": round(time.time() - self.started, 1),
+            "jobs": self.jobs,
+            "failed": self.failed,
+            "active": self.active,
+            "graphs": len(self.graphs),
+        }
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    # Longer than MAX_LINE; the rest of the line can't be told
+                    # apart from the next request, so answer and hang up
+                    writer.write(json.dumps({"ok": False, "error": "request too large"}).encode("utf-8") + b"\n")
+                    await writer.drain()
+                    return
+                if not line:
+                    return
+                try:
+                    job = json.loads(line)
+                    if not isinstance(job, dict):
+                        result = {"ok": False, "error": "bad request"}
+                    else:
+                        result = self.stats() if job.get("op") == "stats" else await self.run(job)
+                except ValueError as e:
+                    result = {"ok": False, "error": f"bad request: {e}"}
+                writer.write(json.dumps(result).encode("utf-8") + b"\n")
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(path: str, concurrency: int = 8, modes: list | None = None, in_process: bool = False):
+    from client.mcp_pool import IN_PROCESS, MCPConnectionManager, get_default_manager, set_default_manager
+
+    if in_process:
+        set_default_manager(MCPConnectionManager(transport=IN_PROCESS))
+    worker = Worker(concurrency)
+    # Pay for the imports, graph compilation and MCP handshake before accepting jobs
+    for mode in modes or []:
+        await worker.graph(mode, False, False)
+    await get_default_manager().get_tools()
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    if os.path.exists(path):
+        os.unlink(path)
+    server = await asyncio.start_unix_server(worker.handle, path=path, limit=MAX_LINE)
+    stop = asyncio.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        asyncio.get_running_loop().add_signal_handler(signum, stop.set)
+    print(f"client daemon listening on {path}", flush=True)
+    try:
+        async with server:
+            await stop.wait()
+    finally:
+        await get_default_manager().aclose()
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+# --warm value -> list of modes, rejecting unknown ones before startup
+def mode_list(value: str) -> list:
+    modes = [m for m in value.split(",") if m]
+    unknown = [m for m in modes if m not in MODES]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown mode {', '.join(unknown)}, expected one of {', '.join(MODES)}")
+    return modes
+
+
+# Blocking client, stdlib only so submitting doesn't import the graph
+def request(path: str, payload: dict, timeout: float | None = None) -> dict:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(path)
+        sock.sendall(json.dumps(payload).encode("utf-8") + b"\n")
+        with sock.makefile("rb") as f:
+            line = f.readline()
+    if not line:
+        raise ConnectionError("daemon closed the connection without a result")
+    return json.loads(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Warm client daemon for validating COI documents.")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET, help=f"Unix socket path (default {DEFAULT_SOCKET})")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = commands.add_parser("serve", help="Run the daemon")
+    serve_parser.add_argument("-c", "--concurrency", type=int, default=8, help="Documents validated at the same time")
+    serve_parser.add_argument("--warm", type=mode_list, default=AGENTIC, help="Comma-separated modes whose graph is compiled at startup")
+    serve_parser.add_argument("--in-process", action="store_true", help="Run the MCP server inside this process instead of connecting to MCP_SERVER_URL")
+
+    submit_parser = commands.add_parser("submit", help="Validate a COI JSON file on a running daemon")
+    submit_parser.add_argument("json_path", help="Path to the COI JSON file")
+    submit_parser.add_argument("--mode", choices=MODES, default=AGENTIC)
+    submit_parser.add_argument("--fan-out", action="store_true", help="Analyze each coverage in parallel")
+    submit_parser.add_argument("--incremental", action="store_true", help="Re-run only the coverages that changed")
+    submit_parser.add_argument("--timeout", type=float, default=None, help="Seconds to wait for the result")
+
+    commands.add_parser("stats", help="Print the daemon's job counters")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        asyncio.run(serve(args.socket, args.concurrency, args.warm, args.in_process))
+        sys.exit(0)
+
+    if args.command == "submit":
+        with open(args.json_path, "r") as f:
+            coi = json.load(f)
+    try:
+        if args.command == "stats":
+            print(json.dumps(request(args.socket, {"op": "stats"}), indent=2))
+            sys.exit(0)
+        result = request(
+            args.socket,
+            {"document": coi, "mode": args.mode, "fan_out": args.fan_out, "incremental": args.incremental},
+            timeout=args.timeout,
+        )
+    except (FileNotFoundError, ConnectionRefusedError) as e:
+        sys.exit(f"no daemon on {args.socket} ({e}); start one with: python daemon.py serve")
+
+    if result.get("error"):
+        print("error:", result["error"], file=sys.stderr)
+    print('------------')
+    print((result.get("response") or {}).get("current_answer", ""))
+
+    # Same output file as main.py
+    with open("response.json", "w") as f:
+        json.dump(result.get("response"), f, separators=(",", ":"))
+    sys.exit(0 if result.get("ok") else 1)
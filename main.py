@@ -1,31 +1,106 @@
 import asyncio
 import json
 import argparse
+from contextlib import AsyncExitStack
 
 from dotenv import load_dotenv
-from client.state_machine import build_graph, serialize_message
 
+# Before the client/server modules read their settings
 load_dotenv()
 
+from client.modes import AGENTIC, MODES
+from client.checkpointing import DEFAULT_CHECKPOINT_PATH
+from common.documents import document_id
+from common.tracing import export_jsonl, format_summary, new_run_id, run_context, summarize, tracer
+
+# langchain/langgraph/openai are imported inside the functions that need them,
+# so --help and argument errors return immediately; see daemon.py for keeping
+# them (and the compiled graph) loaded across documents
+
+# Print node progress and the streamed email as they arrive; returns the final state
+async def print_stream(graph, input) -> dict:
+    from client.streaming import stream_run
+
+    state = None
+    mid_line = False
+    async for event in stream_run(graph, input):
+        if event["event"] == "token":
+            print(event["text"], end="", flush=True)
+            mid_line = True
+            continue
+        if mid_line:
+            print()
+            mid_line = False
+        if event["event"] == "start":
+            print(f"-> {event['node']}", flush=True)
+        elif event["event"] == "end":
+            print(f"<- {event['node']} {event['ms']} ms" + (f" error: {event['error']}" if event["error"] else ""), flush=True)
+        else:
+            state = event["state"]
+    return state
+
 # Main function to run the graph
-async def main(query: str):
-    graph = await build_graph()
-    response = await graph.ainvoke({"messages": query})
+# Prints the run's span summary (client nodes + server tools and OpenAI
+# calls); trace writes the spans to a JSONL file.
+async def main(query: str, mode: str = AGENTIC, fan_out: bool = False, checkpoint: str | None = None, resume: bool = False, trace: str | None = None, incremental: bool = False, stream: bool = False):
+    from client.checkpointing import open_checkpointer, run_checkpointed
+    from client.mcp_pool import get_default_manager
+    from client.state_machine import build_graph
+    from client.tracing import server_spans
+
+    run_id = new_run_id()
+    async with AsyncExitStack() as stack:
+        checkpointer = await stack.enter_async_context(open_checkpointer(checkpoint)) if checkpoint else None
+        graph = await build_graph(mode=mode, fan_out=fan_out, checkpointer=checkpointer, incremental=incremental)
+        try:
+            with run_context(run_id=run_id, document_id=document_id(query)):
+                if stream:
+                    response = await print_stream(graph, {"messages": query})
+                elif checkpointer is None:
+                    response = await graph.ainvoke({"messages": query})
+                else:
+                    response = await run_checkpointed(graph, checkpointer, query, resume=resume)
+            spans = tracer.for_run(run_id) + await server_spans(get_default_manager(), [run_id])
+        finally:
+            await get_default_manager().aclose()
+
+    print(format_summary(summarize(spans)))
+    if trace:
+        export_jsonl(spans, trace)
     return response
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Process a COI JSON file.")
     parser.add_argument("json_path", help="Path to the COI JSON file")
+    parser.add_argument("--mode", choices=MODES, default=AGENTIC, help="agentic: LLM picks each tool call; deterministic: tool calls built from state")
+    parser.add_argument("--fan-out", action="store_true", help="Analyze each coverage in parallel instead of one analyze_summary call")
+    parser.add_argument("--incremental", action="store_true", help="Re-run only the coverages that changed since this certificate's last validation (implies --fan-out)")
+    parser.add_argument("--checkpoint", nargs="?", const=DEFAULT_CHECKPOINT_PATH, default=None, metavar="PATH", help=f"Checkpoint every step to a SQLite file (default {DEFAULT_CHECKPOINT_PATH})")
+    parser.add_argument("--trace", metavar="PATH", help="Write the run's spans (nodes, tools, OpenAI calls) to a JSONL file")
+    parser.add_argument("--resume", action="store_true", help="Continue this document's checkpointed run from its last successful step")
+    parser.add_argument("--stream", action="store_true", help="Print node events and the email as they are produced")
+    parser.add_argument("--in-process", action="store_true", help="Run the MCP server inside this process instead of connecting to MCP_SERVER_URL")
     args = parser.parse_args()
+    if args.stream and (args.checkpoint or args.resume):
+        parser.error("--stream can't be combined with --checkpoint/--resume")
+    if args.resume and not args.checkpoint:
+        args.checkpoint = DEFAULT_CHECKPOINT_PATH
+
+    if args.in_process:
+        from client.mcp_pool import IN_PROCESS, MCPConnectionManager, set_default_manager
+
+        set_default_manager(MCPConnectionManager(transport=IN_PROCESS))
 
     # Load the COI document from the specified file path
     with open(args.json_path, "r") as f:
         coi = json.load(f)
 
-    response = asyncio.run(main(f"{coi}"))
+    from client.state_machine import dumps_state, serialize_message
+
+    response = asyncio.run(main(f"{coi}", mode=args.mode, fan_out=args.fan_out, checkpoint=args.checkpoint, resume=args.resume, trace=args.trace, incremental=args.incremental, stream=args.stream))
     print('------------')
     print(serialize_message(response.get("current_answer", "")))
 
     # Write to a JSON file
-    with open("response.json", "w") as f:
-        json.dump(response, f, indent=2, default=serialize_message)
\ No newline at end of file
+    with open("response.json", "wb") as f:
+        f.write(dumps_state(response))
\ No newline at end of file
@@ -0,0 +1,150 @@
+import ast
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_PATH = os.getenv("TOOL_CACHE_PATH", ".cache/tool_results.sqlite3")
+DEFAULT_MAX_BYTES = int(os.getenv("TOOL_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+DEFAULT_TTL = float(os.getenv("TOOL_CACHE_TTL", str(7 * 24 * 3600)))
+DEFAULT_BYPASS = os.getenv("TOOL_CACHE_BYPASS", "").lower() not in ("", "0", "false")
+
+
+# Canonical form of a tool argument so that whitespace, key order or
+# Python-repr vs JSON differences don't produce different cache keys
+def normalize(value):
+    if isinstance(value, str):
+        text = value.strip()
+        for parse in (json.loads, ast.literal_eval):
+            try:
+                parsed = parse(text)
+            except (ValueError, SyntaxError, TypeError, MemoryError, RecursionError):
+                continue
+            if isinstance(parsed, (dict, list)):
+                return normalize(parsed)
+        return " ".join(text.split())
+    if isinstance(value, dict):
+        return {str(k): normalize(v) for k, v in sorted(value.items(), key=lambda kv: str(kv[0]))}
+    if isinstance(value, (list, tuple)):
+        return [normalize(v) for v in value]
+    return value
+
+
+# Short, stable version id for a prompt template: editing a rule in the
+# template changes the version and therefore every key that depends on it
+def template_version(template: str) -> str:
+    return hashlib.sha256(template.encode("utf-8")).hexdigest()[:12]
+
+
+# Content-addressed, size-bounded LRU cache for tool results on local disk.
+# Keys hash (tool name, normalized input, prompt template version, model).
+class ToolResultCache:
+    def __init__(
+        self,
+        path: str = DEFAULT_PATH,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        ttl: float = DEFAULT_TTL,
+        bypass: bool = DEFAULT_BYPASS,
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.bypass = bypass
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expired = 0
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS tool_results (
+                key TEXT PRIMARY KEY,
+                tool TEXT NOT NULL,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_tool_results_accessed ON tool_results (accessed_at)")
+
+    @staticmethod
+    def make_key(tool: str, inputs: dict, prompt_version: str, model: str) -> str:
+        payload = json.dumps(
+            [tool, normalize(inputs), prompt_version, model],
+            sort_keys=True,
+            separators=(",", ":"),
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        if self.bypass:
+            return None
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT value, created_at FROM tool_results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            value, created_at = row
+            if self.ttl and now - created_at > self.ttl:
+                self._db.execute("DELETE FROM tool_results WHERE key = ?", (key,))
+                self.expired += 1
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE tool_results SET accessed_at = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return value
+
+    def put(self, key: str, tool: str, value: str):
+        if self.bypass:
+            return
+        now = time.time()
+        size = len(value.encode("utf-8"))
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO tool_results (key, tool, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, tool, value, size, now, now),
+            )
+            self._evict()
+
+    # Drop least recently used entries until the cache fits in max_bytes
+    def _evict(self):
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM tool_results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._db.execute("SELECT key, size FROM tool_results ORDER BY accessed_at").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._db.execute("DELETE FROM tool_results WHERE key = ?", (key,))
+            total -= size
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM tool_results")
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, total = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM tool_results").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expired": self.expired,
+            "entries": entries,
+            "bytes": total,
+            "max_bytes": self.max_bytes,
+            "bypass": self.bypass,
+        }
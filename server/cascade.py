@@ -0,0 +1,169 @@
+import json
+import os
+import threading
+import time
+
+from common.documents import parse_document
+from common.schemas import CoiSummary, ComplianceAnalysis, CoverageAnalysis, CoverageSummary, GeneralAnalysis
+from common.tracing import tracer
+
+# Per-tool model cascade: a cheap (or local) model answers first; its output
+# is checked against the tool's schema plus the confidence checks below, and
+# only answers that fail are escalated to the next model. The last model's
+# answer is always accepted.
+#
+# MODEL_CASCADE overrides the tiers per tool, e.g.
+#   {"extract_summary": ["ollama:llama3.1:8b", "gpt-4.1-mini-2025-04-14", "gpt-4.1-2025-04-14"]}
+# "ollama:<model>" goes to the local Ollama server (see server/llm.py); an
+# empty list or a missing tool means the tool's single default model.
+
+SMALL_MODEL = os.getenv("SMALL_MODEL", "gpt-4.1-mini-2025-04-14")
+# format_email is left out by default: only a cascade's last tier can stream
+# its tokens (an earlier tier's text may still be rejected), so with a
+# cascade the email would reach the client in one piece. MODEL_CASCADE can
+# still give it tiers.
+CASCADE_TOOLS = ("extract_summary", "extract_coverage", "analyze_summary", "analyze_coverage", "analyze_general")
+
+
+def cascade_config(default_model: str) -> dict:
+    config = {tool: [SMALL_MODEL, default_model] for tool in CASCADE_TOOLS}
+    config.update(json.loads(os.getenv("MODEL_CASCADE", "{}")))
+    return config
+
+
+def _compliance_consistent(analysis) -> list:
+    if analysis.compliant and any(check.status == "fail" for check in analysis.checks):
+        return ["marked compliant with failing checks"]
+    return []
+
+
+def check_extract_summary(summary: CoiSummary, inputs: dict) -> list:
+    problems = []
+    try:
+        expected = len(parse_document(inputs["document"]).get("coverages") or [])
+    except Exception:
+        expected = None
+    if expected is not None and len(summary.coverages) != expected:
+        problems.append(f"{len(summary.coverages)} coverages extracted, document has {expected}")
+    if not summary.certificate_holder.strip():
+        problems.append("no certificate holder")
+    for coverage in summary.coverages:
+        problems += [f"{coverage.coverage_type}: {p}" for p in check_extract_coverage(coverage, inputs)]
+    return problems
+
+
+def check_extract_coverage(coverage: CoverageSummary, inputs: dict) -> list:
+    problems = []
+    if not coverage.policy_number.strip():
+        problems.append("no policy number")
+    if not coverage.limits:
+        problems.append("no limits")
+    return problems
+
+
+def check_analyze_summary(analysis: ComplianceAnalysis, inputs: dict) -> list:
+    problems = []
+    try:
+        expected = len(parse_document(inputs["summary"]).get("coverages") or [])
+    except Exception:
+        expected = None
+    if expected is not None and len(analysis.coverages) != expected:
+        problems.append(f"{len(analysis.coverages)} coverages analyzed, summary has {expected}")
+    failed = [check for check in analysis.general if check.status == "fail"]
+    if analysis.compliant and (failed or not all(coverage.compliant for coverage in analysis.coverages)):
+        problems.append("marked compliant with failing checks")
+    for coverage in analysis.coverages:
+        problems += [f"{coverage.coverage_type}: {p}" for p in check_analyze_coverage(coverage, inputs)]
+    return problems
+
+
+def check_analyze_coverage(analysis: CoverageAnalysis, inputs: dict) -> list:
+    return (["no checks"] if not analysis.checks else []) + _compliance_consistent(analysis)
+
+
+def check_analyze_general(analysis: GeneralAnalysis, inputs: dict) -> list:
+    return ["no checks"] if not analysis.checks else []
+
+
+def check_format_email(email: str, inputs: dict) -> list:
+    problems = []
+    if "subject" not in email[:200].lower():
+        problems.append("no subject line")
+    if "insurance team" not in email[-300:].lower():
+        problems.append("not signed off as Insurance Team")
+    if "```" in email:
+        problems.append("contains markdown")
+    return problems
+
+
+CHECKS = {
+    "extract_summary": check_extract_summary,
+    "extract_coverage": check_extract_coverage,
+    "analyze_summary": check_analyze_summary,
+    "analyze_coverage": check_analyze_coverage,
+    "analyze_general": check_analyze_general,
+    "format_email": check_format_email,
+}
+
+
+# Attempts / accepted / escalated per tool and model
+class CascadeStats:
+    def __init__(self):
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def record(self, tool: str, model: str, outcome: str):
+        with self._lock:
+            counts = self._counts.setdefault(tool, {}).setdefault(model, {"attempts": 0, "accepted": 0, "escalated": 0})
+            counts["attempts"] += 1
+            counts[outcome] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            result = {}
+            for tool, models in self._counts.items():
+                attempts = sum(c["attempts"] for c in models.values())
+                first = next(iter(models.values()))
+                result[tool] = {
+                    "models": {model: dict(counts) for model, counts in models.items()},
+                    "requests": first["attempts"],
+                    "escalation_rate": round(first["escalated"] / first["attempts"], 4) if first["attempts"] else 0.0,
+                    "attempts": attempts,
+                }
+            return result
+
+
+class Cascade:
+    def __init__(self, default_model: str):
+        self.default_model = default_model
+        self.config = cascade_config(default_model)
+        self.decisions = CascadeStats()
+
+    def models(self, tool: str) -> list:
+        return self.config.get(tool) or [self.default_model]
+
+    # attempt(model, last) -> (content, parsed) runs one tier; parsed is the
+    # schema object (or text) the tool's checks look at. start skips tiers
+    # that already rejected the input (see packed_completion). Returns the
+    # accepted content and whether it came from the last tier.
+    async def run(self, tool: str, inputs: dict, attempt, start: int = 0):
+        models = self.models(tool)
+        check = CHECKS.get(tool)
+        first = min(start, len(models) - 1)
+        for tier, model in enumerate(models[first:], first):
+            last = tier == len(models) - 1
+            began, started = time.time(), time.perf_counter()
+            try:
+                content, parsed = await attempt(model, last)
+                problems = check(parsed, inputs) if check and not last else []
+            except Exception as e:
+                if last:
+                    raise
+                problems = [f"{type(e).__name__}: {e}"]
+            outcome = "escalated" if problems else "accepted"
+            self.decisions.record(tool, model, outcome)
+            if len(models) > 1:
+                error = "escalated: " + "; ".join(problems) if problems else None
+                tracer.record("cascade", tool, began, time.perf_counter() - started, model=model, tier=tier, error=error)
+            if not problems:
+                return content, last
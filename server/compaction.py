@@ -0,0 +1,104 @@
+import json
+import os
+import sys
+import threading
+from functools import lru_cache
+
+from common.documents import compact_document_json, compact_json
+
+# Input compaction for prompts: every JSON payload that goes into a prompt
+# (the COI, coverages, summaries, analyses) is reduced to minified JSON
+# without null/empty values, and the raw COI to the fields the extraction
+# prompt and the rule engine actually read (DOCUMENT_FIELDS / NESTED_FIELDS
+# in common/documents.py, shared with the client). The document
+# store and check_compliance keep working on the full document.
+#
+# Prompts are counted with tiktoken and rejected when they exceed the token
+# budget (PROMPT_TOKEN_BUDGET, per tool via PROMPT_TOKEN_BUDGETS) instead of
+# being sent and truncated or billed in full.
+
+DEFAULT_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "16000"))
+TOOL_BUDGETS = json.loads(os.getenv("PROMPT_TOKEN_BUDGETS", "{}"))
+
+ENCODING = os.getenv("TIKTOKEN_ENCODING", "o200k_base")
+
+
+class PromptTooLarge(ValueError):
+    pass
+
+
+# None when the encoding can't be loaded (tiktoken downloads it on first use)
+@lru_cache(maxsize=1)
+def _encoding():
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding(ENCODING)
+    except Exception as e:
+        print(f"tiktoken encoding {ENCODING} unavailable, estimating tokens as characters/4:", e)
+        return None
+
+
+def count_tokens(text: str) -> int:
+    encoding = _encoding()
+    if encoding is None:
+        return len(text) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def budget(tool: str) -> int:
+    return int(TOOL_BUDGETS.get(tool, DEFAULT_BUDGET))
+
+
+def check_budget(tool: str, prompt: str) -> int:
+    tokens = count_tokens(prompt)
+    if tokens > budget(tool):
+        raise PromptTooLarge(f"{tool} prompt is {tokens} tokens, over the budget of {budget(tool)}")
+    return tokens
+
+
+# Bytes and tokens before/after compaction, per tool input
+class CompactionStats:
+    def __init__(self):
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def record(self, tool: str, before: str, after: str):
+        sizes = (len(before.encode("utf-8")), len(after.encode("utf-8")), count_tokens(before), count_tokens(after))
+        with self._lock:
+            counts = self._counts.setdefault(tool, {"inputs": 0, "bytes_before": 0, "bytes_after": 0, "tokens_before": 0, "tokens_after": 0})
+            counts["inputs"] += 1
+            for name, size in zip(("bytes_before", "bytes_after", "tokens_before", "tokens_after"), sizes):
+                counts[name] += size
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                tool: {**counts, "bytes_saved": counts["bytes_before"] - counts["bytes_after"], "tokens_saved": counts["tokens_before"] - counts["tokens_after"]}
+                for tool, counts in self._counts.items()
+            }
+
+
+compaction = CompactionStats()
+
+
+# Compact one tool input and count what it saved
+def compact_input(tool: str, text: str, compact=compact_json) -> str:
+    compacted = compact(text)
+    if compacted != text:
+        compaction.record(tool, text, compacted)
+    return compacted
+
+
+# python -m server.compaction example_docs/*.json
+# Report what compaction saves on documents as main.py sends them (dict repr)
+if __name__ == "__main__":
+    rows = []
+    for path in sys.argv[1:]:
+        with open(path, "r") as f:
+            coi = json.load(f)
+        before, after = f"{coi}", compact_document_json(coi)
+        rows.append((path, len(before), len(after), count_tokens(before), count_tokens(after)))
+    print(f"{'document':40} {'bytes':>8} {'compact':>8} {'tokens':>7} {'compact':>8} {'saved':>6}")
+    for path, b0, b1, t0, t1 in rows:
+        print(f"{path[-40:]:40} {b0:8} {b1:8} {t0:7} {t1:8} {1 - t1 / t0:6.0%}")
@@ -0,0 +1,60 @@
+import os
+import threading
+from collections import OrderedDict
+
+from common.documents import ID_PREFIX, _id_for, canonical_json
+
+DEFAULT_DIR = os.getenv("DOCUMENT_STORE_DIR", ".cache/documents")
+DEFAULT_MAX_ENTRIES = int(os.getenv("DOCUMENT_STORE_MAX_ENTRIES", "1024"))
+
+
+# Content-addressed COI store shared by the tools: clients upload a document
+# once and tool calls carry only its short id instead of the whole JSON.
+# Recent documents stay in memory; every document is also written to disk so
+# ids survive a server restart.
+class DocumentStore:
+    def __init__(self, directory: str = DEFAULT_DIR, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.directory = directory
+        self.max_entries = max_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, doc_id: str) -> str:
+        return os.path.join(self.directory, f"{doc_id}.json")
+
+    def put(self, document) -> str:
+        text = canonical_json(document)
+        doc_id = _id_for(text)
+        with self._lock:
+            self._remember(doc_id, text)
+        if self.directory and not os.path.exists(self._path(doc_id)):
+            os.makedirs(self.directory, exist_ok=True)
+            tmp = self._path(doc_id) + ".tmp"
+            with open(tmp, "w") as f:
+                f.write(text)
+            os.replace(tmp, self._path(doc_id))
+        return doc_id
+
+    def get(self, doc_id: str) -> str:
+        with self._lock:
+            if doc_id in self._memory:
+                self._memory.move_to_end(doc_id)
+                return self._memory[doc_id]
+        if not doc_id.startswith(ID_PREFIX) or os.sep in doc_id or not self.directory:
+            raise KeyError(f"Unknown document id '{doc_id}'")
+        try:
+            with open(self._path(doc_id), "r") as f:
+                text = f.read()
+        except FileNotFoundError:
+            raise KeyError(f"Unknown document id '{doc_id}'") from None
+        with self._lock:
+            self._remember(doc_id, text)
+        return text
+
+    def _remember(self, doc_id: str, text: str):
+        self._memory[doc_id] = text
+        self._memory.move_to_end(doc_id)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
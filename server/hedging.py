@@ -0,0 +1,153 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import deque
+
+from common.tracing import percentile
+
+# Deadlines and hedged requests for LLM calls, keyed by the MCP tool making the
+# call. Every tool call gets one deadline (LLM_DEADLINE_S, per tool via
+# LLM_DEADLINES) covering all of its cascade tiers, re-asks and retries; a
+# call that misses it is cancelled and fails with TimeoutError, so the client
+# sees the error instead of a hung tool.
+#
+# Once a tool/model pair has enough latency samples, a request that hasn't
+# answered by the LLM_HEDGE_PERCENTILE of its recent latencies gets a
+# duplicate (see Scheduler.run in server/llm.py). The first successful
+# response wins and the other request is cancelled. Hedges are capped at
+# LLM_HEDGE_MAX_RATE of all requests, so a general slowdown can't double the
+# load, and a duplicate is only sent when the model's concurrency and rate
+# limits have room for it right away.
+
+DEFAULT_DEADLINE = float(os.getenv("LLM_DEADLINE_S", "120"))
+# Per-tool overrides in seconds, e.g. {"format_email": 60, "extract_summary": 90}
+TOOL_DEADLINES = json.loads(os.getenv("LLM_DEADLINES", "{}"))
+HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "0.95"))
+HEDGE_MAX_RATE = float(os.getenv("LLM_HEDGE_MAX_RATE", "0.05"))
+HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY_S", "0.5"))
+LATENCY_WINDOW = int(os.getenv("LLM_LATENCY_WINDOW", "200"))
+
+
+class Hedger:
+    def __init__(self):
+        self._latencies = {}
+        self._counts = {}
+        self._timeouts = {}
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.hedged = 0
+
+    def deadline(self, tool: str) -> float:
+        return float(TOOL_DEADLINES.get(tool, DEFAULT_DEADLINE))
+
+    # Seconds to wait before hedging, None while there are too few samples
+    def delay(self, key: tuple) -> float | None:
+        with self._lock:
+            samples = list(self._latencies.get(key, ()))
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return None
+        return max(HEDGE_MIN_DELAY, percentile(samples, HEDGE_PERCENTILE))
+
+    def _count(self, key: tuple, name: str):
+        with self._lock:
+            counts = self._counts.setdefault(key, {"requests": 0, "hedged": 0, "hedge_wins": 0, "hedges_skipped": 0})
+            counts[name] += 1
+
+    def _observe(self, key: tuple, seconds: float):
+        with self._lock:
+            self._latencies.setdefault(key, deque(maxlen=LATENCY_WINDOW)).append(seconds)
+
+    def _allow_hedge(self) -> bool:
+        with self._lock:
+            return self.hedged + 1 <= HEDGE_MAX_RATE * self.requests
+
+    # Await a whole tool call (cascade tiers, queueing, retries and all) under
+    # the tool's deadline
+    async def within_deadline(self, tool: str, call):
+        deadline = self.deadline(tool)
+        try:
+            return await asyncio.wait_for(call, deadline)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self._timeouts[tool] = self._timeouts.get(tool, 0) + 1
+            raise TimeoutError(f"{tool} missed its {deadline:g}s deadline") from None
+
+    # Run one upstream request, sending a duplicate if it is slow. Only the
+    # request itself is timed, not the scheduler's queueing, so hedges aren't
+    # sent for calls that are merely waiting on rate limits. acquire_hedge()
+    # takes the duplicate's capacity (a concurrency slot, rate budget) and
+    # returns its release(), or None when there is no room, in which case no
+    # duplicate is sent. Returns (response, hedged).
+    async def race(self, tool: str, model: str, fn, acquire_hedge=None) -> tuple:
+        key = (tool, model)
+        with self._lock:
+            self.requests += 1
+        self._count(key, "requests")
+
+        async def timed():
+            started = time.perf_counter()
+            result = await fn()
+            self._observe(key, time.perf_counter() - started)
+            return result
+
+        primary = asyncio.ensure_future(timed())
+        tasks = [primary]
+        try:
+            delay = self.delay(key)
+            if delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                if not done and self._allow_hedge():
+                    release = await acquire_hedge() if acquire_hedge is not None else (lambda: None)
+                    if release is None:
+                        self._count(key, "hedges_skipped")
+                    else:
+                        with self._lock:
+                            self.hedged += 1
+                        self._count(key, "hedged")
+                        duplicate = asyncio.ensure_future(timed())
+                        duplicate.add_done_callback(lambda _: release())
+                        tasks.append(duplicate)
+            # First successful response wins; fail only once every request failed
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self._count(key, "hedge_wins")
+                        return task.result(), len(tasks) > 1
+            return primary.result(), len(tasks) > 1
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def stats(self) -> dict:
+        with self._lock:
+            latencies = {key: list(samples) for key, samples in self._latencies.items()}
+            counts = {key: dict(c) for key, c in self._counts.items()}
+            timeouts = dict(self._timeouts)
+            requests, hedged = self.requests, self.hedged
+        calls = {}
+        for key, c in counts.items():
+            samples = latencies.get(key, [])
+            calls[f"{key[0]}/{key[1]}"] = {
+                **c,
+                "p50_s": round(percentile(samples, 0.5), 3) if samples else None,
+                "p99_s": round(percentile(samples, 0.99), 3) if samples else None,
+                "hedge_after_s": round(max(HEDGE_MIN_DELAY, percentile(samples, HEDGE_PERCENTILE)), 3) if len(samples) >= HEDGE_MIN_SAMPLES else None,
+            }
+        return {
+            "requests": requests,
+            "hedged": hedged,
+            "hedge_rate": round(hedged / requests, 4) if requests else 0.0,
+            "max_hedge_rate": HEDGE_MAX_RATE,
+            "calls": calls,
+            "deadlines": {tool: {"deadline_s": self.deadline(tool), "timeouts": timeouts.get(tool, 0)} for tool in sorted(set(TOOL_DEADLINES) | set(timeouts))},
+        }
+
+
+hedger = Hedger()
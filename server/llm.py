@@ -0,0 +1,302 @@
+import asyncio
+import json
+import os
+import random
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+
+import httpx
+import openai
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+from server.hedging import hedger
+from server.metrics import llm_in_flight, llm_queued
+from common.tracing import trace_context, tracer
+
+# Shared async OpenAI client plus a server-wide scheduler, so one slow
+# completion no longer blocks every other MCP request on the event loop.
+
+DEFAULT_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+DEFAULT_RPM = float(os.getenv("LLM_RPM", "500"))
+DEFAULT_TPM = float(os.getenv("LLM_TPM", "30000"))
+# Per-model overrides, e.g. {"gpt-4.1-2025-04-14": {"concurrency": 16, "rpm": 5000, "tpm": 800000}}
+MODEL_LIMITS = json.loads(os.getenv("LLM_LIMITS", "{}"))
+MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))
+BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "30"))
+# Completion tokens reserved up front, corrected once usage is known
+DEFAULT_COMPLETION_ESTIMATE = 1000
+
+# One pooled HTTP client for every tool call; retries are done by the scheduler
+client = AsyncOpenAI(
+    api_key=os.getenv("OPENAI_API_KEY"),
+    max_retries=0,
+    http_client=DefaultAsyncHttpxClient(
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=20)
+    ),
+)
+
+# Local models behind Ollama's OpenAI-compatible API, addressed as "ollama:<model>"
+OLLAMA_PREFIX = "ollama:"
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434/v1")
+_ollama_client = None
+
+
+# (client, model name) for a model id as used in the cascade config
+def resolve(model: str):
+    global _ollama_client
+    if not model.startswith(OLLAMA_PREFIX):
+        return client, model
+    if _ollama_client is None:
+        _ollama_client = AsyncOpenAI(base_url=OLLAMA_BASE_URL, api_key="ollama", max_retries=0)
+    return _ollama_client, model[len(OLLAMA_PREFIX):]
+
+
+# Token bucket refilled continuously at `rate_per_minute`; acquire() waits
+# until `amount` is available. A single request larger than the capacity is
+# let through once the bucket is full so it cannot wait forever.
+class TokenBucket:
+    def __init__(self, rate_per_minute: float):
+        self.capacity = rate_per_minute
+        self.rate = rate_per_minute / 60.0
+        self.tokens = rate_per_minute
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float = 1.0):
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+    # Take `amount` only if it is available now and nobody is queued for it
+    def try_acquire(self, amount: float = 1.0) -> bool:
+        amount = min(amount, self.capacity)
+        if self._lock.locked():
+            return False
+        self._refill()
+        if self.tokens < amount:
+            return False
+        self.tokens -= amount
+        return True
+
+    # Give back (or charge) the difference between estimated and actual usage
+    def adjust(self, amount: float):
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+def _retry_after(error: Exception):
+    response = getattr(error, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, (openai.RateLimitError, openai.APIConnectionError, openai.APITimeoutError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+
+# MCP tool making the current call (set by cached_completion)
+def _tool() -> str:
+    return trace_context.get().get("tool", "openai")
+
+
+def estimate_tokens(messages: list) -> int:
+    return sum(len(str(m.get("content", ""))) for m in messages) // 4 + DEFAULT_COMPLETION_ESTIMATE
+
+
+# Per-model concurrency limit, requests/tokens-per-minute buckets and
+# jittered exponential backoff on 429/5xx
+class Scheduler:
+    def __init__(self):
+        self._models = {}
+
+    def limits(self, model: str) -> dict:
+        limits = {"concurrency": DEFAULT_CONCURRENCY, "rpm": DEFAULT_RPM, "tpm": DEFAULT_TPM}
+        limits.update(MODEL_LIMITS.get(model, {}))
+        return limits
+
+    def _state(self, model: str):
+        # Semaphores and locks bind to the running loop, so create them lazily
+        loop = asyncio.get_running_loop()
+        state = self._models.get(model)
+        if state is None or state["loop"] is not loop:
+            limits = self.limits(model)
+            state = {
+                "loop": loop,
+                "semaphore": asyncio.Semaphore(limits["concurrency"]),
+                "requests": TokenBucket(limits["rpm"]),
+                "tokens": TokenBucket(limits["tpm"]),
+            }
+            self._models[model] = state
+        return state
+
+    # One attempt's slot: the concurrency limit plus rate budget. Waiting for
+    # it shows as queued in the metrics (see server/metrics.py), holding it as in flight.
+    @asynccontextmanager
+    async def _slot(self, state: dict, model: str, estimated_tokens: int):
+        acquired = False
+        try:
+            with llm_queued.track(model):
+                await state["semaphore"].acquire()
+                acquired = True
+                await state["requests"].acquire(1)
+                await state["tokens"].acquire(estimated_tokens)
+            with llm_in_flight.track(model):
+                yield
+        finally:
+            if acquired:
+                state["semaphore"].release()
+
+    # A hedged duplicate's slot, taken only if it is free right now: a
+    # duplicate that has to queue would arrive too late to help. Returns a
+    # release() for it, or None when the model is at its limits.
+    async def _hedge_slot(self, state: dict, model: str, estimated_tokens: int):
+        if state["semaphore"].locked():
+            return None
+        await state["semaphore"].acquire()
+        if not state["requests"].try_acquire(1):
+            state["semaphore"].release()
+            return None
+        if not state["tokens"].try_acquire(estimated_tokens):
+            state["requests"].adjust(1)
+            state["semaphore"].release()
+            return None
+        llm_in_flight.inc(model)
+
+        def release():
+            llm_in_flight.dec(model)
+            state["semaphore"].release()
+
+        return release
+
+    # Every request is recorded as one "llm" span: queue_ms is the time spent
+    # waiting for the semaphore, rate buckets and backoff, wall_ms includes it
+    async def run(self, model: str, estimated_tokens: int, call, hedge: bool = False):
+        state = self._state(model)
+        start = time.time()
+        started = time.perf_counter()
+        queued = 0.0
+        for attempt in range(MAX_RETRIES + 1):
+            waiting = time.perf_counter()
+            async with self._slot(state, model, estimated_tokens):
+                queued += time.perf_counter() - waiting
+                try:
+                    if hedge:
+                        # A duplicate takes its own concurrency slot and rate budget
+                        response, hedged = await hedger.race(
+                            _tool(), model, call, acquire_hedge=lambda: self._hedge_slot(state, model, estimated_tokens)
+                        )
+                    else:
+                        response, hedged = await call(), False
+                except asyncio.CancelledError:
+                    # Tool deadline passed or a hedged duplicate won
+                    self._record(model, start, started, queued, attempt, error="cancelled")
+                    raise
+                except Exception as e:
+                    state["tokens"].adjust(estimated_tokens)
+                    if attempt == MAX_RETRIES or not _is_retryable(e):
+                        self._record(model, start, started, queued, attempt, error=f"{type(e).__name__}: {e}")
+                        raise
+                    delay = _retry_after(e)
+                else:
+                    usage = getattr(response, "usage", None)
+                    if usage is not None:
+                        state["tokens"].adjust(estimated_tokens - usage.total_tokens)
+                    self._record(model, start, started, queued, attempt, usage=usage, hedged=hedged or None)
+                    return response
+            # Full jitter, outside the semaphore so other requests can proceed
+            if delay is None:
+                delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+            waiting = time.perf_counter()
+            await asyncio.sleep(delay)
+            queued += time.perf_counter() - waiting
+
+    def _record(self, model: str, start: float, started: float, queued: float, attempt: int, usage=None, error: str | None = None, hedged: bool | None = None):
+        fields = {"model": model, "queue_ms": round(queued * 1000, 3), "retries": attempt or None, "hedged": hedged, "error": error}
+        if usage is not None:
+            details = getattr(usage, "prompt_tokens_details", None)
+            fields.update(
+                prompt_tokens=usage.prompt_tokens,
+                completion_tokens=usage.completion_tokens,
+                cached_tokens=getattr(details, "cached_tokens", None) or 0,
+            )
+        # Named after the MCP tool that made the call (see cached_completion)
+        tracer.record("llm", _tool(), start, time.perf_counter() - started, **fields)
+
+
+scheduler = Scheduler()
+
+
+# chat/parse may be hedged (see server/hedging.py); the deadline covers the
+# whole tool call and is applied by the caller (see cached_completion)
+async def chat(model: str, messages: list, **kwargs):
+    api, name = resolve(model)
+    return await scheduler.run(
+        model,
+        estimate_tokens(messages),
+        lambda: api.chat.completions.create(model=name, messages=messages, **kwargs),
+        hedge=True,
+    )
+
+
+async def parse(model: str, messages: list, response_format, **kwargs):
+    api, name = resolve(model)
+    return await scheduler.run(
+        model,
+        estimate_tokens(messages),
+        lambda: api.beta.chat.completions.parse(model=name, messages=messages, response_format=response_format, **kwargs),
+        hedge=True,
+    )
+
+
+# Result of a streamed completion; `usage` lets the scheduler settle tokens
+@dataclass
+class StreamedCompletion:
+    content: str
+    usage: object = None
+
+
+# Stream a completion, awaiting on_token(text) for every content delta.
+# A stream that breaks after text was already forwarded is not retried,
+# since the caller would see that text twice.
+async def stream_chat(model: str, messages: list, on_token, **kwargs) -> StreamedCompletion:
+    api, name = resolve(model)
+
+    async def call():
+        parts = []
+        usage = None
+        try:
+            stream = await api.chat.completions.create(
+                model=name, messages=messages, stream=True, stream_options={"include_usage": True}, **kwargs
+            )
+            async for chunk in stream:
+                if chunk.usage is not None:
+                    usage = chunk.usage
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    parts.append(delta)
+                    await on_token(delta)
+        except Exception as e:
+            if parts:
+                raise RuntimeError(f"Completion stream broke off after {len(parts)} chunks: {e}") from e
+            raise
+        return StreamedCompletion("".join(parts), usage)
+
+    # Never hedged: a duplicate would forward the text a second time
+    return await scheduler.run(model, estimate_tokens(messages), call)
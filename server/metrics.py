@@ -0,0 +1,191 @@
+import time
+from contextlib import contextmanager
+
+from common.tracing import tracer
+
+# Prometheus text-format metrics for the MCP server (served at /metrics, see
+# server/server.py). Two kinds of sources:
+# - metrics updated on the hot path: latency histograms and counters fed from
+#   finished spans (tool calls, OpenAI requests) and in-flight/queued gauges.
+#   They are only touched from the event loop, so updates are plain dict
+#   arithmetic without locks.
+# - collectors called at scrape time that read counters the server already
+#   keeps (tool result cache, single flight, hedging, cascade, compaction).
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def _labels(names: tuple, values: tuple) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values = {}
+
+    def header(self) -> list:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> list:
+        return self.header() + [f"{self.name}{_labels(self.labels, key)} {_number(value)}" for key, value in self.values.items()]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def inc(self, *labels, amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) - amount
+
+    @contextmanager
+    def track(self, *labels):
+        self.inc(*labels)
+        try:
+            yield
+        finally:
+            self.dec(*labels)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = buckets
+
+    # values[labels] = [count per bucket..., +Inf count, sum]
+    def observe(self, value: float, *labels):
+        counts = self.values.get(labels)
+        if counts is None:
+            counts = self.values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+                break
+        else:
+            counts[len(self.buckets)] += 1
+        counts[-1] += value
+
+    def render(self) -> list:
+        lines = self.header()
+        for key, counts in self.values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_labels(self.labels + ('le',), key + (_number(bound),))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, key)} {_number(counts[-1])}")
+            lines.append(f"{self.name}_count{_labels(self.labels, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+        self.started = time.time()
+
+    def add(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    # fn() -> list of metrics built fresh at scrape time
+    def collector(self, fn):
+        self.collectors.append(fn)
+        return fn
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines += metric.render()
+        for collect in self.collectors:
+            try:
+                for metric in collect():
+                    lines += metric.render()
+            except Exception as e:
+                lines.append(f"# collector {getattr(collect, '__name__', collect)} failed: {_escape(e)}")
+        uptime = Gauge("mcp_uptime_seconds", "Seconds since the server started")
+        uptime.values[()] = round(time.time() - self.started, 3)
+        return "\n".join(lines + uptime.render()) + "\n"
+
+
+registry = Registry()
+
+tool_requests = registry.add(Counter("mcp_tool_requests_total", "LLM-backed tool calls", ("tool", "outcome")))
+tool_latency = registry.add(Histogram("mcp_tool_duration_seconds", "LLM-backed tool call latency, cache hits included", ("tool",)))
+tools_in_flight = registry.add(Gauge("mcp_tool_calls_in_flight", "LLM-backed tool calls being served", ("tool",)))
+llm_requests = registry.add(Counter("openai_requests_total", "Upstream completion requests (after retries)", ("tool", "model", "outcome")))
+llm_latency = registry.add(Histogram("openai_request_duration_seconds", "Upstream request latency, queueing and retries included", ("model",)))
+llm_queue = registry.add(Counter("openai_queue_seconds_total", "Time requests waited for the scheduler's concurrency and rate limits", ("model",)))
+llm_tokens = registry.add(Counter("openai_tokens_total", "Tokens used upstream", ("model", "type")))
+llm_cost = registry.add(Counter("openai_cost_usd_total", "Estimated upstream spend", ("model",)))
+llm_retries = registry.add(Counter("openai_retries_total", "Retried upstream requests", ("model",)))
+llm_in_flight = registry.add(Gauge("openai_requests_in_flight", "Requests holding a scheduler slot", ("model",)))
+llm_queued = registry.add(Gauge("openai_requests_queued", "Requests waiting for a scheduler slot or rate budget", ("model",)))
+
+
+def _outcome(span: dict) -> str:
+    error = span.get("error")
+    if not error:
+        return "ok"
+    if error == "cancelled" or error.startswith("CancelledError"):
+        return "cancelled"
+    if error.startswith("TimeoutError"):
+        return "timeout"
+    return "error"
+
+
+# Tracer listener: every finished tool/llm span updates the counters above
+def observe_span(span: dict):
+    seconds = span["wall_ms"] / 1000
+    if span["kind"] == "tool":
+        outcome = "cache_hit" if span.get("cache_hit") else "coalesced" if span.get("coalesced") else _outcome(span)
+        tool_requests.inc(span["name"], outcome)
+        tool_latency.observe(seconds, span["name"])
+    elif span["kind"] == "llm":
+        model = span.get("model", "")
+        llm_requests.inc(span["name"], model, _outcome(span))
+        llm_latency.observe(seconds, model)
+        llm_queue.inc(model, amount=span.get("queue_ms", 0) / 1000)
+        for kind in ("prompt", "completion", "cached"):
+            if span.get(f"{kind}_tokens"):
+                llm_tokens.inc(model, kind, amount=span[f"{kind}_tokens"])
+        if span.get("cost_usd"):
+            llm_cost.inc(model, amount=span["cost_usd"])
+        if span.get("retries"):
+            llm_retries.inc(model, amount=span["retries"])
+
+
+tracer.listeners.append(observe_span)
+
+
+# Build a metric from a {labels tuple: value} mapping (for collectors)
+def snapshot(metric: Metric, values: dict) -> Metric:
+    metric.values = dict(values)
+    return metric
@@ -0,0 +1,429 @@
+import json
+import os
+import threading
+from dataclasses import dataclass, replace
+
+from server.cache import template_version
+from server.compaction import count_tokens
+from common.tracing import tracer
+
+# Versioned prompt templates for the LLM-backed tools. Each template is split
+# into static instructions (checklists, rules) and the per-call input. From
+# v2 on the instructions go first, in their own system message, so every call
+# of a tool starts with the same tokens and the provider's prefix cache could
+# serve them. v1 keeps the original layout, input first, for comparison.
+#
+# OpenAI only caches prefixes of CACHEABLE_PREFIX_TOKENS or more, and every
+# template's instructions are currently shorter than that (see
+# `python -m server.prompts`), so no call gets cached_tokens yet. The layout
+# only pays off once a tool's static part grows past the threshold.
+#
+# PROMPT_VERSIONS pins a tool to a version, e.g. {"analyze_summary": 1};
+# otherwise the latest registered version is used.
+#
+# "<tool>_packed" templates answer several small documents in one request
+# with a keyed response (see packed_completion in server/server.py). Their
+# instructions start with the single-document ones, so both share the same
+# prefix.
+
+PROMPT_VERSIONS = json.loads(os.getenv("PROMPT_VERSIONS", "{}"))
+# Shortest prompt prefix OpenAI caches
+CACHEABLE_PREFIX_TOKENS = 1024
+
+
+@dataclass(frozen=True)
+class PromptTemplate:
+    name: str
+    version: int
+    # Static part; not formatted, so it may contain braces
+    instructions: str
+    # Per-call part with {placeholders}
+    input: str
+    static_first: bool = True
+    # Single-document template this one packs, for the savings report
+    packs: str = ""
+
+    @property
+    def key(self) -> str:
+        return f"{self.name}@v{self.version}"
+
+    # Part of the tool result cache key
+    @property
+    def fingerprint(self) -> str:
+        return f"v{self.version}-" + template_version("\0".join((self.instructions, self.input, str(self.static_first))))
+
+    def messages(self, **inputs) -> list:
+        text = self.input.format(**inputs)
+        if self.static_first:
+            return [{"role": "system", "content": self.instructions}, {"role": "user", "content": text}]
+        return [{"role": "user", "content": text + self.instructions}]
+
+
+def prompt_text(messages: list) -> str:
+    return "\n".join(message["content"] for message in messages)
+
+
+class PromptRegistry:
+    def __init__(self, pins: dict | None = None):
+        self.pins = PROMPT_VERSIONS if pins is None else pins
+        self._templates = {}
+
+    def register(self, template: PromptTemplate) -> PromptTemplate:
+        self._templates[(template.name, template.version)] = template
+        return template
+
+    def get(self, name: str, version: int | None = None) -> PromptTemplate:
+        version = version or self.pins.get(name) or max((v for n, v in self._templates if n == name), default=None)
+        template = self._templates.get((name, int(version or 0)))
+        if template is None:
+            raise KeyError(f"No prompt template {name} v{version}")
+        return template
+
+    def templates(self) -> list:
+        return list(self._templates.values())
+
+
+prompts = PromptRegistry()
+
+
+EXTRACT_INSTRUCTIONS = """
+    You will be given an insurance document in JSON format.
+
+    1. Format the document as a JSON object.
+
+    2. Extract, create a checklist of all the keys and output a JSON object with the following keys:
+	•	certificate_type: Certificate type is specified (e.g., ACORD 25).
+    •	certificate_holder: Certificate holder is correctly named.
+    •	producer: Subcontractor's insurance agent (name and location).
+    •	insured: Subcontractor's legal name and business address.
+    •	carriers: All insurance providers for each policy.
+	•	coverage_types_present: All required coverage types are included.
+	•	coverage_limits: Coverage limits are provided for each applicable policy.
+	•	policy_dates: Effective and expiration dates are listed for all coverages.
+    •	policy_numbers: Policy numbers are listed for all coverages.
+	•	project_identification: Project name or address is included for identification.
+	•	additional_insureds: All required additional insured entities are listed; note any missing.
+	•	waiver_of_subrogation: Waiver of subrogation is present where required.
+	•	primary_and_noncontributory: Primary and noncontributory wording is included where required.
+	•	endorsements: Required endorsements (for each coverage type) are present and wording is correct.
+	•	additional_endorsements: Additional endorsements (e.g., primary and noncontributory, waiver of subrogation for GL) are included.
+	•	missing_fields: Any required fields that could not be found are listed, with the reason.
+
+    Additional Endorsements (as above, with correct wording if possible)
+
+    Do not add any explanation or formatting. Output ONLY the JSON object.
+    """
+
+ANALYSIS_INSTRUCTIONS = """
+    You will be given an extracted insurance summary as a JSON object.
+
+    Analyze for the following and respond with analysis for each key with ONLY the JSON object with the following keys:
+
+    1. Basics:
+        •	producer: Subcontractor's insurance aagent's name and location.
+        •	insured: Subcontractor's legal name and business address.
+        •	carriers: All insurance providers for each policy.
+        •	Policy Details: Policy number and expiration date for:
+            •	General Liability
+            •	Auto Liability
+            •	Umbrella/Excess Liability
+            •	Workers's Compensation
+            •	Professional, Pollution, or Inland Marine (if applicable)
+
+
+    2. Minimum Coverage Limits (Meet or Exceed):
+        •	(General Liability, Auto Liability, Umbrella/Excess Liability, Workers's Compensation): $1M per occurrence
+        •	Professional/Pollution/Inland Marine (if applicable): $2M per occurrence
+
+
+    3. General Liability:
+        •	Project Box: Must be checked
+        •	OR the CG 25 03 05 09 Per Project Aggregate endorsement must be attached.
+
+
+    4. Specialty Coverages:
+        •	Professional, Pollution, and Inland Marine:
+        •	“Other Insurance” section must reference these coverages as applicable.
+        •	Professional Liability: Required for any design or testing services (does not need to be project-specific).
+        •	Pollution/Inland Marine: Must be project-specific.
+
+
+    5. Description of Operations (Must Include All):
+        •	Job Name
+        •	Job Address
+        •	Simile Construction Project #
+        •	“Simile Construction Service, Inc.” is listed
+        •	All required additional insureds per subcontract agreement
+
+
+    6. Certificate Holder (Must Match Exactly):
+
+    Simile Construction Service, Inc.
+    4725 Enterprise Way #1
+    Modesto, CA 95356
+
+    7. Required Endorsements for General Liability (Must Remain Valid Through Project Warranty Period):
+        •	CG 20 10 07 04 - Ongoing operations
+        •	Must state either:
+        •	“As required by written contract/agreement”
+        •	OR: “Simile Construction Service, Inc., its directors, officers, and employees and any other person or organization as required by written contract”
+        •	CG 20 37 07 04 - Completed operations
+        •	Must include same additional insured language as CG 20 10.
+        •	CG 20 01 04 13 - Primary & Non-Contributory
+        •	Must be a separate endorsement OR listed in Description.
+        •	CG 24 04 05 09 - Waiver of Subrogation
+        •	Protects Simile Construction from liability claims by the subcontractor's insurer.
+        •	CG 25 03 05 09 - Per Project Aggregate
+        •	Required if Project box is not checked on the COI.
+
+    8. Auto Insurance Endorsements (All Must Be Included):
+        •	Additional Insured
+        •	Primary Wording
+        •	Waiver of Subrogation
+
+    9. Workers's Compensation Endorsement:
+        •	WC 00 03 13 - Waiver of Subrogation:
+            •	Must list:
+                •	Simile Construction Service, Inc.
+                •	The Project Owner and Client
+                •	Anyone else required by written contract
+    """
+
+EMAIL_INSTRUCTIONS = """
+    You will be given a compliance analysis/recommendation.
+
+    Write a professional, clear email to the policyholder.
+    - Address the certificate holder by name.
+    - Briefly summarize the analysis/recommendation.
+    - Sign off as 'Insurance Team'.
+
+    Format the output as a professional email with a subject line, greeting, body, and closing, all as a single string.
+    Do not use markdown or code blocks—output only the email as it would be sent.
+    """
+
+# Per-coverage fan-out: each call only sees one coverage and the part of the
+# analysis checklist that applies to it (COVERAGE_RULES)
+COVERAGE_ANALYSIS_INSTRUCTIONS = """
+    You will be given one coverage from an ACORD 25 certificate as a JSON object, context from the certificate,
+    and the requirements for its coverage type.
+
+    Check the coverage against these requirements only.
+    Report one check per requirement with status pass, fail, review (wording needs a human) or n/a.
+    Set compliant to false if any check fails.
+    """
+
+# Re-extract one coverage of a revised certificate (see client/revisions.py)
+COVERAGE_EXTRACT_INSTRUCTIONS = """
+    You will be given a coverage entry from an ACORD 25 insurance document as a JSON object and its insurance carrier.
+
+    Extract it as one coverage summary: coverage type, carrier, policy number, effective and expiration dates, every limit,
+    project box / project-specific flags, endorsements, additional insureds, waiver of subrogation and primary and noncontributory wording.
+    Use null for flags the entry does not state.
+    """
+
+GENERAL_ANALYSIS_INSTRUCTIONS = """
+    You will be given an extracted ACORD 25 insurance summary (coverages omitted) as a JSON object.
+
+    Check it against these requirements only:
+
+    1. Basics:
+        •	producer: Subcontractor's insurance agent's name and location.
+        •	insured: Subcontractor's legal name and business address.
+
+    2. Description of Operations (Must Include All):
+        •	Job Name
+        •	Job Address
+        •	Simile Construction Project #
+        •	“Simile Construction Service, Inc.” is listed
+        •	All required additional insureds per subcontract agreement
+
+    3. Certificate Holder (Must Match Exactly):
+
+    Simile Construction Service, Inc.
+    4725 Enterprise Way #1
+    Modesto, CA 95356
+
+    Report one check per requirement with status pass, fail, review (wording needs a human) or n/a.
+    """
+
+PACKED_INSTRUCTIONS = """
+    Several {items} are given at once, as one JSON object keyed by id. Apply the instructions above to each of them
+    separately, as if it were the only one, and return one entry per id in results with key set to that id.
+    """
+
+# Requirements per coverage key (see server/rules.py), taken from ANALYSIS_INSTRUCTIONS
+COVERAGE_RULES = {
+    "general_liability": """
+        •	Policy number and expiration date are listed.
+        •	Minimum $1M per occurrence.
+        •	Project Box must be checked OR the CG 25 03 05 09 Per Project Aggregate endorsement must be attached.
+        •	CG 20 10 07 04 - Ongoing operations, stating “As required by written contract/agreement” OR “Simile Construction Service, Inc., its directors, officers, and employees and any other person or organization as required by written contract”.
+        •	CG 20 37 07 04 - Completed operations, with the same additional insured language as CG 20 10.
+        •	CG 20 01 04 13 - Primary & Non-Contributory: separate endorsement OR listed in the description of operations.
+        •	CG 24 04 05 09 - Waiver of Subrogation.
+    """,
+    "auto_liability": """
+        •	Policy number and expiration date are listed.
+        •	Minimum $1M per occurrence (combined single limit).
+        •	Endorsements: Additional Insured, Primary Wording, Waiver of Subrogation (all must be included).
+    """,
+    "umbrella_liability": """
+        •	Policy number and expiration date are listed.
+        •	Minimum $1M per occurrence.
+    """,
+    "workers_compensation": """
+        •	Policy number and expiration date are listed.
+        •	Minimum $1M (employers liability).
+        •	WC 00 03 13 - Waiver of Subrogation listing Simile Construction Service, Inc., the Project Owner and Client, and anyone else required by written contract.
+    """,
+    "professional_liability": """
+        •	Policy number and expiration date are listed.
+        •	Minimum $2M per occurrence/claim.
+        •	Required for any design or testing services (does not need to be project-specific).
+        •	“Other Insurance” section must reference this coverage.
+    """,
+    "pollution_liability": """
+        •	Policy number and expiration date are listed.
+        •	Minimum $2M per occurrence.
+        •	Must be project-specific.
+        •	“Other Insurance” section must reference this coverage.
+    """,
+    "inland_marine": """
+        •	Policy number and expiration date are listed.
+        •	Minimum $2M per occurrence.
+        •	Must be project-specific.
+        •	“Other Insurance” section must reference this coverage.
+    """,
+}
+
+DEFAULT_COVERAGE_RULES = """
+        •	Policy number and expiration date are listed.
+        •	Coverage limits are provided.
+    """
+
+_LATEST = [
+    PromptTemplate("extract_summary", 2, EXTRACT_INSTRUCTIONS, """
+    Insurance document:
+
+    {document}
+    """),
+    PromptTemplate("analyze_summary", 2, ANALYSIS_INSTRUCTIONS, """
+    Extracted summary:
+
+    {summary}
+    """),
+    PromptTemplate("format_email", 2, EMAIL_INSTRUCTIONS, """
+    Analysis/recommendation:
+
+    {analysis}
+    """),
+    # Rules before the coverage: calls for the same coverage type share them
+    PromptTemplate("analyze_coverage", 2, COVERAGE_ANALYSIS_INSTRUCTIONS, """
+    Requirements for {coverage_type} coverage:
+    {rules}
+    Coverage:
+
+    {coverage}
+
+    Context from the certificate:
+
+    {context}
+    """),
+    PromptTemplate("extract_coverage", 2, COVERAGE_EXTRACT_INSTRUCTIONS, """
+    Insurance carrier for this coverage: {carrier}
+
+    Coverage entry:
+
+    {coverage}
+    """),
+    PromptTemplate("analyze_general", 2, GENERAL_ANALYSIS_INSTRUCTIONS, """
+    Extracted summary:
+
+    {summary}
+    """),
+]
+
+for _template in _LATEST:
+    prompts.register(_template)
+    prompts.register(replace(_template, version=1, static_first=False))
+
+prompts.register(PromptTemplate("extract_summary_packed", 2, EXTRACT_INSTRUCTIONS + PACKED_INSTRUCTIONS.format(items="insurance documents"), """
+    Insurance documents by id:
+
+    {documents}
+    """, packs="extract_summary"))
+prompts.register(PromptTemplate("analyze_summary_packed", 2, ANALYSIS_INSTRUCTIONS + PACKED_INSTRUCTIONS.format(items="extracted summaries"), """
+    Extracted summaries by id:
+
+    {documents}
+    """, packs="analyze_summary"))
+
+
+# Prompt, cached and completion tokens per template version, from the
+# finished LLM spans (cached_completion tags them with the template key and,
+# for packed requests, the number of documents answered)
+class PromptStats:
+    def __init__(self):
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def observe_span(self, span: dict):
+        if span["kind"] != "llm" or not span.get("prompt") or span.get("error"):
+            return
+        with self._lock:
+            counts = self._counts.setdefault(span["prompt"], {"requests": 0, "documents": 0, "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0, "fallbacks": 0})
+            counts["requests"] += 1
+            counts["documents"] += span.get("packed") or 1
+            for name in ("prompt_tokens", "cached_tokens", "completion_tokens"):
+                counts[name] += span.get(name) or 0
+
+    # Packed documents that had to be answered on their own after all
+    def record_fallbacks(self, prompt: str, documents: int):
+        with self._lock:
+            counts = self._counts.setdefault(prompt, {"requests": 0, "documents": 0, "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0, "fallbacks": 0})
+            counts["fallbacks"] += documents
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = {key: dict(c) for key, c in self._counts.items()}
+        templates = {template.key: template for template in prompts.templates()}
+        result = {}
+        for key, c in counts.items():
+            template = templates.get(key)
+            row = {
+                **c,
+                "static_tokens": count_tokens(template.instructions) if template else None,
+                "cached_ratio": round(c["cached_tokens"] / c["prompt_tokens"], 4) if c["prompt_tokens"] else 0.0,
+                "prompt_tokens_per_document": round(c["prompt_tokens"] / c["documents"], 1) if c["documents"] else None,
+            }
+            # A packed request sends the single-document instructions once
+            # for all its documents instead of once per document
+            if template and template.packs and c["documents"]:
+                static = count_tokens(prompts.get(template.packs, template.version).instructions)
+                row["prompt_tokens_saved_per_document"] = round(static * (c["documents"] - c["requests"]) / c["documents"], 1)
+            result[key] = row
+        return result
+
+
+prompt_stats = PromptStats()
+tracer.listeners.append(prompt_stats.observe_span)
+
+STATS_COLUMNS = ["prompt", "requests", "documents", "fallbacks", "static_tokens", "prompt_tokens", "cached_tokens", "cached_ratio", "prompt_tokens_per_document", "prompt_tokens_saved_per_document"]
+
+
+def format_prompt_stats(stats: dict) -> str:
+    rows = [{"prompt": key, **row} for key, row in sorted(stats.items())]
+    table = [STATS_COLUMNS] + [[str(row.get(column, "")) for column in STATS_COLUMNS] for row in rows]
+    widths = [max(len(line[i]) for line in table) for i in range(len(STATS_COLUMNS))]
+    return "\n".join("  ".join(cell.ljust(width) for cell, width in zip(line, widths)) for line in table)
+
+
+# python -m server.prompts
+# Static prefix size of every registered template and whether the provider
+# can cache it
+if __name__ == "__main__":
+    print(f"{'template':32} {'layout':13} {'static_tokens':>13}  cacheable")
+    for template in prompts.templates():
+        tokens = count_tokens(template.instructions)
+        cacheable = template.static_first and tokens >= CACHEABLE_PREFIX_TOKENS
+        print(f"{template.key:32} {'static first' if template.static_first else 'input first':13} {tokens:13}  {'yes' if cacheable else 'no'}")
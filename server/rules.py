@@ -0,0 +1,299 @@
+from dataclasses import dataclass
+from typing import Callable
+
+from common.documents import coverage_key, normalize, parse_document
+
+# Deterministic ACORD 25 compliance rules, evaluated in plain Python against the
+# structured COI fields (see example_docs/*.json). Mirrors ANALYSIS_INSTRUCTIONS in
+# server/prompts.py; only free-text wording is left as "review" for a human/LLM.
+
+PASS = "pass"
+FAIL = "fail"
+REVIEW = "review"
+NOT_APPLICABLE = "n/a"
+
+CERTIFICATE_HOLDER = "Simile Construction Service, Inc., 4725 Enterprise Way #1, Modesto, CA 95356"
+HOLDER_NAME = "Simile Construction Service, Inc."
+
+BASE_COVERAGES = ("general_liability", "auto_liability", "umbrella_liability", "workers_compensation")
+SPECIALTY_COVERAGES = ("professional_liability", "pollution_liability", "inland_marine")
+
+# Minimum limits (meet or exceed) and the fields that carry the limit, in order of preference
+MINIMUM_LIMITS = {
+    "general_liability": (1_000_000, ("limit_per_occurrence", "limit_each_occurrence")),
+    "auto_liability": (1_000_000, ("limit_combined_single", "limit_per_occurrence")),
+    "umbrella_liability": (1_000_000, ("limit_per_occurrence", "limit_each_occurrence")),
+    "workers_compensation": (1_000_000, ("employers_liability_limit", "limit_per_occurrence")),
+    "professional_liability": (2_000_000, ("limit_per_claim", "limit_per_occurrence")),
+    "pollution_liability": (2_000_000, ("limit_per_claim", "limit_per_occurrence")),
+    "inland_marine": (2_000_000, ("limit_per_occurrence", "limit_per_claim")),
+}
+
+# Required endorsements per coverage: (code, description)
+REQUIRED_ENDORSEMENTS = {
+    "general_liability": (
+        ("CG 20 10", "Additional insured - ongoing operations"),
+        ("CG 20 37", "Additional insured - completed operations"),
+        ("CG 20 01", "Primary & non-contributory"),
+        ("CG 24 04", "Waiver of subrogation"),
+    ),
+    "auto_liability": (
+        ("Additional Insured", "Additional insured"),
+        ("Primary Wording", "Primary wording"),
+        ("Waiver of Subrogation", "Waiver of subrogation"),
+    ),
+    "workers_compensation": (
+        ("WC 00 03 13", "Waiver of subrogation"),
+    ),
+}
+
+# Parties the WC waiver of subrogation must name
+WC_WAIVER_PARTIES = ("Simile Construction", "Project Owner", "Client")
+
+
+def coverages_by_key(coi: dict) -> dict:
+    coverages = {}
+    for coverage in coi.get("coverages") or []:
+        key = coverage_key(coverage.get("coverage_type", ""))
+        if key and key not in coverages:
+            coverages[key] = coverage
+    return coverages
+
+
+def has_endorsement(coverage: dict, code: str) -> bool:
+    wanted = normalize(code)
+    return any(normalize(e).startswith(wanted) for e in coverage.get("endorsements") or [])
+
+
+def _result(status: str, detail: str = ""):
+    return status, detail
+
+
+@dataclass(frozen=True)
+class Rule:
+    id: str
+    section: str
+    description: str
+    check: Callable[[dict, dict], tuple]
+    coverage: str | None = None
+    free_text: bool = False
+
+
+# ---- checks -------------------------------------------------------------
+
+def _check_producer(coi, coverages):
+    producer = coi.get("producer") or {}
+    if isinstance(producer, dict):
+        missing = [k for k in ("agency_name", "address") if not producer.get(k)]
+    else:
+        missing = [] if producer else ["producer"]
+    return _result(FAIL, f"missing {', '.join(missing)}") if missing else _result(PASS)
+
+
+def _check_insured(coi, coverages):
+    missing = [k for k in ("named_insured", "insured_address") if not coi.get(k)]
+    return _result(FAIL, f"missing {', '.join(missing)}") if missing else _result(PASS)
+
+
+def _check_carriers(coi, coverages):
+    carriers = coi.get("carriers") or {}
+    missing = [key for key in coverages if not carriers.get(key) and not coverages[key].get("carrier")]
+    return _result(FAIL, f"no carrier for {', '.join(missing)}") if missing else _result(PASS)
+
+
+def _check_policy_details(coverage_key_):
+    def check(coi, coverages):
+        coverage = coverages.get(coverage_key_)
+        if coverage is None:
+            if coverage_key_ in BASE_COVERAGES:
+                return _result(FAIL, "coverage not present")
+            return _result(NOT_APPLICABLE)
+        missing = [k for k in ("policy_number", "expiry_date") if not coverage.get(k)]
+        return _result(FAIL, f"missing {', '.join(missing)}") if missing else _result(PASS)
+    return check
+
+
+def _check_minimum_limit(coverage_key_):
+    minimum, fields = MINIMUM_LIMITS[coverage_key_]
+
+    def check(coi, coverages):
+        coverage = coverages.get(coverage_key_)
+        if coverage is None:
+            return _result(NOT_APPLICABLE)
+        for field in fields:
+            value = coverage.get(field)
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                if value >= minimum:
+                    return _result(PASS, f"{field}={value:,.0f}")
+                return _result(FAIL, f"{field}={value:,.0f} below {minimum:,.0f}")
+        # An aggregate isn't a per-occurrence limit, but it says one exists,
+        # and the per-occurrence limit can't exceed it
+        aggregate = coverage.get("limit_aggregate")
+        if isinstance(aggregate, (int, float)) and not isinstance(aggregate, bool):
+            if aggregate < minimum:
+                return _result(FAIL, f"limit_aggregate={aggregate:,.0f} below {minimum:,.0f}, so is any per occurrence limit")
+            return _result(REVIEW, f"only limit_aggregate={aggregate:,.0f} listed, no per occurrence limit")
+        return _result(FAIL, f"no limit found in {', '.join(fields)}")
+    return check
+
+
+def _check_project_aggregate(coi, coverages):
+    gl = coverages.get("general_liability")
+    if gl is None:
+        return _result(NOT_APPLICABLE)
+    if gl.get("project_box_checked"):
+        return _result(PASS, "project box checked")
+    if has_endorsement(gl, "CG 25 03"):
+        return _result(PASS, "CG 25 03 per project aggregate attached")
+    return _result(FAIL, "project box not checked and CG 25 03 05 09 not attached")
+
+
+def _check_professional_required(coi, coverages):
+    specialty = (coi.get("specialty_coverages") or {}).get("professional_liability") or {}
+    if not specialty.get("required"):
+        return _result(NOT_APPLICABLE)
+    if "professional_liability" in coverages:
+        return _result(PASS)
+    return _result(FAIL, "design/testing services require professional liability")
+
+
+def _check_project_specific(coverage_key_):
+    def check(coi, coverages):
+        coverage = coverages.get(coverage_key_)
+        if coverage is None:
+            return _result(NOT_APPLICABLE)
+        if coverage.get("project_specific"):
+            return _result(PASS)
+        return _result(FAIL, "must be project-specific")
+    return check
+
+
+def _check_description_mentions(label, values):
+    def check(coi, coverages):
+        description = normalize(coi.get("description_of_operations"))
+        wanted = [v for v in values(coi) if v]
+        if not wanted:
+            return _result(REVIEW, f"{label} not available in structured fields")
+        if any(normalize(v) in description for v in wanted):
+            return _result(PASS)
+        return _result(REVIEW, f"{label} not found in description of operations")
+    return check
+
+
+def _check_certificate_holder(coi, coverages):
+    holder = coi.get("certificate_holder")
+    if isinstance(holder, dict):
+        holder = ", ".join(str(v) for v in holder.values() if v)
+    if normalize(holder) == normalize(CERTIFICATE_HOLDER):
+        return _result(PASS)
+    return _result(FAIL, f"'{holder}' does not match '{CERTIFICATE_HOLDER}'")
+
+
+def _check_endorsement(coverage_key_, code):
+    def check(coi, coverages):
+        coverage = coverages.get(coverage_key_)
+        if coverage is None:
+            return _result(NOT_APPLICABLE)
+        if has_endorsement(coverage, code):
+            return _result(PASS)
+        description = normalize(coi.get("description_of_operations"))
+        if code == "CG 20 01" and "primary" in description:
+            return _result(PASS, "primary wording listed in description of operations")
+        if code in ("CG 24 04", "WC 00 03 13") and coverage.get("waiver_of_subrogation"):
+            if has_endorsement(coverage, "Waiver of Subrogation"):
+                return _result(REVIEW, f"waiver of subrogation endorsed without form {code}")
+            return _result(REVIEW, f"waiver of subrogation flagged but {code} not listed")
+        return _result(FAIL, f"{code} missing")
+    return check
+
+
+def _check_additional_insured_wording(coi, coverages):
+    if "general_liability" not in coverages:
+        return _result(NOT_APPLICABLE)
+    text = normalize(f"{coi.get('additional_endorsements_notes', '')} {coi.get('description_of_operations', '')}")
+    if "written contract" in text or "written agreement" in text:
+        return _result(PASS)
+    return _result(REVIEW, "'as required by written contract' wording not found")
+
+
+def _check_wc_waiver_parties(coi, coverages):
+    wc = coverages.get("workers_compensation")
+    if wc is None:
+        return _result(NOT_APPLICABLE)
+    # Additional insureds are a different list; without waiver_parties a human has to check the form
+    if not wc.get("waiver_parties"):
+        return _result(REVIEW, "waiver parties not listed on the certificate")
+    parties = [normalize(p) for p in wc["waiver_parties"]]
+    missing = [p for p in WC_WAIVER_PARTIES if not any(normalize(p) in party for party in parties)]
+    return _result(FAIL, f"waiver does not list {', '.join(missing)}") if missing else _result(PASS)
+
+
+# ---- rule table -----------------------------------------------------------
+
+def _build_rules():
+    rules = [
+        Rule("basics.producer", "Basics", "Producer name and location", _check_producer),
+        Rule("basics.insured", "Basics", "Insured legal name and business address", _check_insured),
+        Rule("basics.carriers", "Basics", "Carrier listed for each policy", _check_carriers),
+    ]
+    for key in BASE_COVERAGES + SPECIALTY_COVERAGES:
+        rules.append(Rule(f"basics.policy_details.{key}", "Basics", "Policy number and expiration date", _check_policy_details(key), key))
+    for key in MINIMUM_LIMITS:
+        minimum = MINIMUM_LIMITS[key][0]
+        rules.append(Rule(f"limits.{key}", "Minimum Coverage Limits", f"At least ${minimum:,.0f} per occurrence", _check_minimum_limit(key), key))
+    rules += [
+        Rule("general_liability.project_aggregate", "General Liability", "Project box checked or CG 25 03 05 09 attached", _check_project_aggregate, "general_liability"),
+        Rule("specialty.professional_required", "Specialty Coverages", "Professional liability for design or testing services", _check_professional_required, "professional_liability"),
+        Rule("specialty.pollution_project_specific", "Specialty Coverages", "Pollution must be project-specific", _check_project_specific("pollution_liability"), "pollution_liability"),
+        Rule("specialty.inland_marine_project_specific", "Specialty Coverages", "Inland marine must be project-specific", _check_project_specific("inland_marine"), "inland_marine"),
+        Rule("description.project_number", "Description of Operations", "Simile Construction project #", _check_description_mentions("project #", lambda coi: [coi.get("project_id")]), free_text=True),
+        Rule("description.job_name", "Description of Operations", "Job name", _check_description_mentions("job name", lambda coi: [coi.get("job_name"), coi.get("project_name")]), free_text=True),
+        Rule("description.job_address", "Description of Operations", "Job address", _check_description_mentions("job address", lambda coi: [coi.get("job_address"), coi.get("project_address")]), free_text=True),
+        Rule("description.holder_listed", "Description of Operations", f"'{HOLDER_NAME}' is listed", _check_description_mentions("holder name", lambda coi: [HOLDER_NAME]), free_text=True),
+        Rule("certificate_holder.exact_match", "Certificate Holder", "Certificate holder matches exactly", _check_certificate_holder),
+    ]
+    for key, endorsements in REQUIRED_ENDORSEMENTS.items():
+        for code, description in endorsements:
+            rules.append(Rule(f"endorsements.{key}.{normalize(code).replace(' ', '_')}", "Endorsements", f"{code} - {description}", _check_endorsement(key, code), key))
+    rules += [
+        Rule("endorsements.general_liability.additional_insured_wording", "Endorsements", "CG 20 10 / CG 20 37 'as required by written contract' wording", _check_additional_insured_wording, "general_liability", free_text=True),
+        Rule("endorsements.workers_compensation.waiver_parties", "Endorsements", "WC 00 03 13 lists Simile Construction, Project Owner and Client", _check_wc_waiver_parties, "workers_compensation"),
+    ]
+    return tuple(rules)
+
+
+RULES = _build_rules()
+
+
+# Evaluate every rule against one COI
+def evaluate(document, rules=RULES) -> dict:
+    coi = parse_document(document)
+    coverages = coverages_by_key(coi)
+    results = []
+    counts = {PASS: 0, FAIL: 0, REVIEW: 0, NOT_APPLICABLE: 0}
+    for rule in rules:
+        try:
+            status, detail = rule.check(coi, coverages)
+        except Exception as e:
+            status, detail = REVIEW, f"rule error: {e}"
+        counts[status] += 1
+        results.append({
+            "rule": rule.id,
+            "section": rule.section,
+            "description": rule.description,
+            "status": status,
+            "detail": detail,
+            "free_text": rule.free_text,
+        })
+    return {
+        "document_id": coi.get("document_id"),
+        "compliant": counts[FAIL] == 0,
+        "needs_review": counts[REVIEW] > 0,
+        "counts": counts,
+        "results": results,
+    }
+
+
+# Evaluate many COIs in one pass
+def evaluate_batch(documents, rules=RULES) -> list:
+    return [evaluate(document, rules) for document in documents]
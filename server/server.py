@@ -1,180 +1,420 @@
-from fastmcp import FastMCP
+from fastmcp import Context, FastMCP
+from fastmcp.server.dependencies import get_context
+import asyncio
+import json
 import os
-from openai import OpenAI
 from dotenv import load_dotenv
+from pydantic import BaseModel, ValidationError
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse
 
-# Load environment variables
+# Load environment variables before the server modules read their settings
+# (and server/llm.py creates the OpenAI client)
 load_dotenv()
 
+from server.cache import ToolResultCache, template_version
+from server.cascade import CHECKS, Cascade
+from server.compaction import check_budget, compact_input, compaction
+from server.singleflight import SingleFlight
+from common.documents import compact_document_json, parse_document
+from server.documents import DocumentStore
+from server.prompts import COVERAGE_RULES, DEFAULT_COVERAGE_RULES, PromptTemplate, prompt_stats, prompt_text, prompts
+from common.schemas import SCHEMAS, CoiSummary, ComplianceAnalysis, CoverageAnalysis, CoverageSummary, GeneralAnalysis, PackedCoiSummaries, PackedComplianceAnalyses
+from server import llm, rules
+from server.hedging import hedger
+from server.metrics import Counter, Gauge, registry, snapshot, tools_in_flight
+from common.tracing import run_context, tracer
+
 # math_server.py
 mcp = FastMCP("acord_25_insurance_compliance")
 
-import openai
+# OpenAI calls go through the shared AsyncOpenAI client and scheduler in server/llm.py
+MODEL = "gpt-4.1-2025-04-14"
+
+# Persistent cache of tool results (see server/cache.py)
+cache = ToolResultCache()
+
+# Small model first per tool, escalating to MODEL when its answer fails validation (see server/cascade.py)
+cascade = Cascade(MODEL)
+
+# Identical tool calls already in flight share one completion (see server/singleflight.py)
+inflight = SingleFlight()
+
+# Uploaded COI documents, referenced by id in tool calls (see server/documents.py)
+documents = DocumentStore()
+
+# Pack up to this many documents into one extract_summary / analyze_summary
+# request in the *_batch tools (see packed_completion)
+PACK_SIZE = int(os.getenv("PROMPT_PACK_SIZE", "4"))
+
+MAX_STRUCTURED_ATTEMPTS = 2
+
+# Ask for a response in the given Pydantic schema. Constrained decoding makes
+# invalid output rare, so the model is only re-asked (with the validation
+# error) when parsing actually fails.
+async def structured_completion(messages: list, schema: type[BaseModel], model: str = MODEL) -> BaseModel:
+    for attempt in range(MAX_STRUCTURED_ATTEMPTS):
+        try:
+            response = await llm.parse(model, messages, schema, temperature=0)
+        except ValidationError as e:
+            if attempt == MAX_STRUCTURED_ATTEMPTS - 1:
+                raise
+            messages = messages + [{
+                "role": "user",
+                "content": f"Your previous answer did not match the {schema.__name__} schema:\n{e}\nReturn the corrected JSON object only."
+            }]
+            continue
+        message = response.choices[0].message
+        if message.refusal:
+            raise ValueError(f"Model refused to produce {schema.__name__}: {message.refusal}")
+        return message.parsed
+
+# Trace fields (run_id, document_id) the client attached to the tool call's
+# _meta, so server spans can be joined with the client's node spans
+TRACE_META_FIELDS = ("run_id", "document_id")
+
+def request_trace_meta() -> dict:
+    try:
+        meta = get_context().request_context.meta
+    except (RuntimeError, LookupError):
+        return {}
+    extra = meta.model_extra if meta is not None else None
+    return {field: extra[field] for field in TRACE_META_FIELDS if extra and extra.get(field)}
+
+# Tool result cache key: (tool, normalized input, template version, model)
+def completion_key(tool: str, template: PromptTemplate, inputs: dict, response_format: type[BaseModel] | None = None) -> str:
+    version = template.fingerprint
+    if response_format is not None:
+        version += "-" + template_version(json.dumps(response_format.model_json_schema(), sort_keys=True))
+    return cache.make_key(tool, inputs, version, "+".join(cascade.models(tool)))
+
+# Run a prompt template (see server/prompts.py) through the LLM, reusing a
+# cached result when the same key was already answered.
+# With a response_format the result is a validated JSON object, not free text.
+# Concurrent misses for the same key wait on the first caller's completion
+# instead of each calling OpenAI.
+# on_token (free-text completions only) receives the text as it is generated;
+# cache hits and coalesced calls get the whole text in one piece.
+# start is the first cascade tier to try (see Cascade.run).
+async def cached_completion(tool: str, template: PromptTemplate, inputs: dict, response_format: type[BaseModel] | None = None, on_token=None, start: int = 0) -> str:
+    with run_context(**request_trace_meta(), tool=tool, prompt=template.key), tools_in_flight.track(tool), tracer.span("tool", tool) as span:
+        key = completion_key(tool, template, inputs, response_format)
+        # SQLite calls run in a worker thread so they don't block the event loop
+        cached = await asyncio.to_thread(cache.get, key)
+        span["cache_hit"] = cached is not None
+        if cached is not None:
+            if on_token is not None:
+                await on_token(cached)
+            return cached
+
+        messages = template.messages(**inputs)
+        check_budget(tool, prompt_text(messages))
+
+        # One cascade tier; only the last one streams, since an earlier tier's
+        # text may still be rejected
+        async def attempt(model: str, last: bool):
+            if response_format is not None:
+                obj = await structured_completion(messages, response_format, model)
+                return obj.model_dump_json(), obj
+            if on_token is not None and last:
+                content = (await llm.stream_chat(model, messages, on_token, temperature=0)).content.strip()
+                return content, content
+            # You can swap out with your LLM of choice, or use LangChain for abstraction
+            response = await llm.chat(model, messages, temperature=0)
+            content = response.choices[0].message.content.strip()
+            return content, content
+
+        async def complete():
+            # One deadline for the whole call, every tier and re-ask included
+            content, from_last = await hedger.within_deadline(tool, cascade.run(tool, inputs, attempt, start))
+            if on_token is not None and response_format is None and not from_last:
+                await on_token(content)
+            await asyncio.to_thread(cache.put, key, tool, content)
+            return content
+
+        content, span["coalesced"] = await inflight.do(key, complete)
+        if span["coalesced"] and on_token is not None:
+            await on_token(content)
+        return content
+
+# JSON text as a value of the packed documents object (not re-quoted)
+def _packed_value(text: str):
+    try:
+        return json.loads(text)
+    except (TypeError, ValueError):
+        return text
+
+# Answer many single-document calls of an extract_summary / analyze_summary
+# style tool with few requests. Cached documents are answered from the cache;
+# the rest go PACK_SIZE at a time into one request of the "<tool>_packed"
+# template, whose keyed response is split back per document. Each answer is
+# checked like a first cascade tier and cached under the single-document key,
+# so the tool's own later calls for these documents are hits. Documents that
+# are missing from the response or fail the checks are answered on their own
+# through cached_completion from the next cascade tier on; those whose pack
+# failed start over at the first tier.
+async def packed_completion(tool: str, field: str, items: list, packed_format: type[BaseModel]) -> list:
+    template, packed = prompts.get(tool), prompts.get(f"{tool}_packed")
+    response_format = SCHEMAS[tool]
+    keys = [completion_key(tool, template, inputs, response_format) for inputs in items]
+    # Identical documents are asked for once
+    first = {}
+    for i, key in enumerate(keys):
+        first.setdefault(key, i)
+    results = [None] * len(items)
+    cached = await asyncio.to_thread(lambda: {key: cache.get(key) for key in first})
+    for key, i in first.items():
+        results[i] = cached[key]
+    missing = [i for i in first.values() if results[i] is None]
+    models = cascade.models(tool)
+    check = CHECKS.get(tool) if len(models) > 1 else None
+
+    # Returns the (document, cascade tier) pairs left to answer one by one
+    async def run_pack(pack: list) -> list:
+        documents = json.dumps({f"doc{i}": _packed_value(items[i][field]) for i in pack}, separators=(",", ":"), ensure_ascii=False)
+        messages = packed.messages(documents=documents)
+        try:
+            with run_context(**request_trace_meta(), tool=packed.name, prompt=packed.key, packed=len(pack)), tracer.span("tool", packed.name, documents=len(pack)) as span:
+                check_budget(packed.name, prompt_text(messages))
+                answer = await hedger.within_deadline(packed.name, structured_completion(messages, packed_format, models[0]))
+        except Exception as e:
+            print(f"{packed.name} request for {len(pack)} documents failed, answering them one by one:", e)
+            return [(i, 0) for i in pack]
+        answers = {entry.key: entry.result for entry in answer.results}
+        left, accepted = [], []
+        for i in pack:
+            result = answers.get(f"doc{i}")
+            rejected = result is None or (check is not None and bool(check(result, items[i])))
+            if len(models) > 1:
+                cascade.decisions.record(tool, models[0], "escalated" if rejected else "accepted")
+            if rejected:
+                left.append((i, 1))
+                continue
+            results[i] = result.model_dump_json()
+            accepted.append(i)
+        await asyncio.to_thread(lambda: [cache.put(keys[i], tool, results[i]) for i in accepted])
+        span["fallbacks"] = len(left)
+        return left
+
+    packs = [missing[i:i + PACK_SIZE] for i in range(0, len(missing), PACK_SIZE)]
+    left = [entry for pack in await asyncio.gather(*(run_pack(pack) for pack in packs)) for entry in pack]
+    if left:
+        prompt_stats.record_fallbacks(packed.key, len(left))
+        answers = await asyncio.gather(*(cached_completion(tool, template, items[i], response_format=response_format, start=start) for i, start in left))
+        for (i, _), answer in zip(left, answers):
+            results[i] = answer
+    return [results[first[key]] for key in keys]
+
+# on_token callback that forwards generated text to the MCP client as progress
+# notifications; None when the client didn't ask for progress
+def progress_forwarder(ctx: Context | None):
+    meta = ctx.request_context.meta if ctx is not None else None
+    if meta is None or meta.progressToken is None:
+        return None
+    sent = 0
+
+    async def forward(text: str):
+        nonlocal sent
+        sent += 1
+        try:
+            await ctx.report_progress(sent, message=text)
+        except Exception as e:
+            print("progress notification failed:", e)
+
+    return forward
+
+# Resolve a tool's document argument: a stored document id wins over inline JSON
+def resolve_document(document: str = "", document_id: str = "") -> str:
+    if document_id:
+        return documents.get(document_id)
+    if not document:
+        raise ValueError("Either document or document_id is required")
+    return document
+
+@mcp.tool()
+def store_document(document: str) -> str:
+    """
+    Store an insurance JSON document and return its document_id. Pass the id to the other tools instead of the full document.
+    """
+    return documents.put(document)
 
-# Instantiate the OpenAI client
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+@mcp.resource("coi://documents/{document_id}")
+def get_document(document_id: str) -> str:
+    return documents.get(document_id)
 
 @mcp.tool()
-def extract_summary(document: str) -> str:
+async def extract_summary(document_id: str = "", document: str = "") -> str:
     """
     You are an ACORD 25 insurance expert. Extract key summary info from the insurance JSON string via LLM.
+    Prefer document_id (from store_document) over passing the full document.
     """
+    return await cached_completion("extract_summary", prompts.get("extract_summary"), {"document": compact_input("extract_summary", resolve_document(document, document_id), compact_document_json)}, response_format=CoiSummary)
 
-    PROMPT_TEMPLATE = """
-    Given the following insurance document in JSON format:
-
-    {document}
-
-    1. Format the document as a JSON object.
-
-    2. Extract, create a checklist of all the keys and output a JSON object with the following keys:
-	•	certificate_type: Certificate type is specified (e.g., ACORD 25).
-    •	certificate_holder: Certificate holder is correctly named.
-    •	producer: Subcontractor's insurance agent (name and location).
-    •	insured: Subcontractor's legal name and business address.
-    •	carriers: All insurance providers for each policy.
-	•	coverage_types_present: All required coverage types are included.
-	•	coverage_limits: Coverage limits are provided for each applicable policy.
-	•	policy_dates: Effective and expiration dates are listed for all coverages.
-    •	policy_numbers: Policy numbers are listed for all coverages.
-	•	project_identification: Project name or address is included for identification.
-	•	additional_insureds: All required additional insured entities are listed; note any missing.
-	•	waiver_of_subrogation: Waiver of subrogation is present where required.
-	•	primary_and_noncontributory: Primary and noncontributory wording is included where required.
-	•	endorsements: Required endorsements (for each coverage type) are present and wording is correct.
-	•	additional_endorsements: Additional endorsements (e.g., primary and noncontributory, waiver of subrogation for GL) are included.
-	•	missing_fields: Any required fields that could not be found are listed, with the reason.
-
-    Additional Endorsements (as above, with correct wording if possible)
-
-    Do not add any explanation or formatting. Output ONLY the JSON object.
-    """
-    prompt = PROMPT_TEMPLATE.format(document=document)
-    # You can swap out with your LLM of choice, or use LangChain for abstraction
-    response = client.chat.completions.create(
-        model="gpt-4.1-2025-04-14",
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0
-    )
-    return response.choices[0].message.content.strip()
+@mcp.tool()
+async def extract_summary_batch(document_ids: list[str] | None = None, documents: list[str] | None = None) -> str:
+    """
+    You are an ACORD 25 insurance expert. Extract key summary info from several insurance JSON documents (ids from store_document, then inline documents), packing them into shared LLM requests. Returns a JSON list of summaries in input order.
+    """
+    sources = [resolve_document(document_id=i) for i in document_ids or []] + [resolve_document(d) for d in documents or []]
+    items = [{"document": compact_input("extract_summary", source, compact_document_json)} for source in sources]
+    results = await packed_completion("extract_summary", "document", items, PackedCoiSummaries)
+    return json.dumps([json.loads(result) for result in results])
+
+@mcp.tool()
+async def extract_coverage(coverage: str, carrier: str = "") -> str:
+    """
+    You are an ACORD 25 insurance expert. Extract a single coverage entry of an insurance JSON document, e.g. the one coverage that changed in a revised certificate.
+    """
+    return await cached_completion("extract_coverage", prompts.get("extract_coverage"), {"coverage": compact_input("extract_coverage", coverage), "carrier": carrier}, response_format=CoverageSummary)
 
 @mcp.tool()
-def analyze_summary(summary: str) -> str:
+async def analyze_summary(summary: str) -> str:
     """
     You are an ACORD 25 insurance expert. Analyze extracted summary for compliance.
     """
-    
-    ANALYSIS_PROMPT = """
-    Given the following extracted insurance summary as a JSON object:
-
-    {summary}
-
-    Analyze for the following and respond with analysis for each key with ONLY the JSON object with the following keys:
-
-    1. Basics:
-        •	producer: Subcontractor's insurance aagent's name and location.
-        •	insured: Subcontractor's legal name and business address.
-        •	carriers: All insurance providers for each policy.
-        •	Policy Details: Policy number and expiration date for:
-            •	General Liability
-            •	Auto Liability
-            •	Umbrella/Excess Liability
-            •	Workers's Compensation
-            •	Professional, Pollution, or Inland Marine (if applicable)
-
-
-    2. Minimum Coverage Limits (Meet or Exceed):
-        •	(General Liability, Auto Liability, Umbrella/Excess Liability, Workers's Compensation): $1M per occurrence
-        •	Professional/Pollution/Inland Marine (if applicable): $2M per occurrence
-
-
-    3. General Liability:
-        •	Project Box: Must be checked
-        •	OR the CG 25 03 05 09 Per Project Aggregate endorsement must be attached.
-
-
-    4. Specialty Coverages:
-        •	Professional, Pollution, and Inland Marine:
-        •	“Other Insurance” section must reference these coverages as applicable.
-        •	Professional Liability: Required for any design or testing services (does not need to be project-specific).
-        •	Pollution/Inland Marine: Must be project-specific.
-
-
-    5. Description of Operations (Must Include All):
-        •	Job Name
-        •	Job Address
-        •	Simile Construction Project #
-        •	“Simile Construction Service, Inc.” is listed
-        •	All required additional insureds per subcontract agreement
-
-
-    6. Certificate Holder (Must Match Exactly):
-
-    Simile Construction Service, Inc.
-    4725 Enterprise Way #1
-    Modesto, CA 95356
-
-    7. Required Endorsements for General Liability (Must Remain Valid Through Project Warranty Period):
-        •	CG 20 10 07 04 - Ongoing operations
-        •	Must state either:
-        •	“As required by written contract/agreement”
-        •	OR: “Simile Construction Service, Inc., its directors, officers, and employees and any other person or organization as required by written contract”
-        •	CG 20 37 07 04 - Completed operations
-        •	Must include same additional insured language as CG 20 10.
-        •	CG 20 01 04 13 - Primary & Non-Contributory
-        •	Must be a separate endorsement OR listed in Description.
-        •	CG 24 04 05 09 - Waiver of Subrogation
-        •	Protects Simile Construction from liability claims by the subcontractor's insurer.
-        •	CG 25 03 05 09 - Per Project Aggregate
-        •	Required if Project box is not checked on the COI.
-
-    8. Auto Insurance Endorsements (All Must Be Included):
-        •	Additional Insured
-        •	Primary Wording
-        •	Waiver of Subrogation
-
-    9. Workers's Compensation Endorsement:
-        •	WC 00 03 13 - Waiver of Subrogation:
-            •	Must list:
-                •	Simile Construction Service, Inc.
-                •	The Project Owner and Client
-                •	Anyone else required by written contract
-    """
-
-    prompt = ANALYSIS_PROMPT.format(summary=summary)
-    response = client.chat.completions.create(
-        model="gpt-4.1-2025-04-14",
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0
+    return await cached_completion("analyze_summary", prompts.get("analyze_summary"), {"summary": compact_input("analyze_summary", summary)}, response_format=ComplianceAnalysis)
+
+@mcp.tool()
+async def analyze_summary_batch(summaries: list[str]) -> str:
+    """
+    You are an ACORD 25 insurance expert. Analyze several extracted summaries for compliance, packing them into shared LLM requests. Returns a JSON list of analyses in input order.
+    """
+    items = [{"summary": compact_input("analyze_summary", summary)} for summary in summaries]
+    results = await packed_completion("analyze_summary", "summary", items, PackedComplianceAnalyses)
+    return json.dumps([json.loads(result) for result in results])
+
+@mcp.tool()
+async def analyze_coverage(coverage: str, context: str = "") -> str:
+    """
+    You are an ACORD 25 insurance expert. Analyze a single coverage entry of an extracted summary for compliance with the rules for its coverage type.
+    """
+    coverage_type = parse_document(coverage).get("coverage_type", "")
+    coverage_rules = COVERAGE_RULES.get(rules.coverage_key(coverage_type), DEFAULT_COVERAGE_RULES)
+    return await cached_completion(
+        "analyze_coverage",
+        prompts.get("analyze_coverage"),
+        {"coverage_type": coverage_type, "coverage": compact_input("analyze_coverage", coverage), "context": compact_input("analyze_coverage", context), "rules": coverage_rules},
+        response_format=CoverageAnalysis
     )
-    
-    return response.choices[0].message.content.strip()
 
 @mcp.tool()
-def format_email(analysis: str) -> str:
+async def analyze_general(summary: str) -> str:
     """
-    You are an ACORD 25 insurance expert. Compose a personalized email to the given certificate holder, using extracted summary and analysis.
+    You are an ACORD 25 insurance expert. Analyze the coverage-independent parts of an extracted summary (producer, insured, description of operations, certificate holder).
     """
-    EMAIL_PROMPT = """
+    return await cached_completion("analyze_general", prompts.get("analyze_general"), {"summary": compact_input("analyze_general", summary)}, response_format=GeneralAnalysis)
 
-    And the following analysis/recommendation:
-    {analysis}
+@mcp.tool()
+async def format_email(analysis: str, ctx: Context) -> str:
+    """
+    You are an ACORD 25 insurance expert. Compose a personalized email to the given certificate holder, using extracted summary and analysis.
+    """
+    # Clients that pass a progress token get the email streamed as it's written
+    return await cached_completion("format_email", prompts.get("format_email"), {"analysis": compact_input("format_email", analysis)}, on_token=progress_forwarder(ctx))
 
-    Write a professional, clear email to the policyholder.
-    - Address the certificate holder by name.
-    - Briefly summarize the analysis/recommendation.
-    - Sign off as 'Insurance Team'.
+@mcp.tool()
+def check_compliance(document_id: str = "", document: str = "") -> str:
+    """
+    Check an ACORD 25 COI JSON document against the deterministic compliance rules (limits, certificate holder, endorsements, waiver parties). No LLM involved; free-text wording is returned with status "review".
+    """
+    return json.dumps(rules.evaluate(resolve_document(document, document_id)))
 
-    Format the output as a professional email with a subject line, greeting, body, and closing, all as a single string.
-    Do not use markdown or code blocks—output only the email as it would be sent.
+@mcp.tool()
+def check_compliance_batch(documents: list[str]) -> str:
     """
-    prompt = EMAIL_PROMPT.format(analysis=analysis)
-    response = client.chat.completions.create(
-        model="gpt-4.1-2025-04-14",
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0
-    )
-    return response.choices[0].message.content.strip()
+    Check many ACORD 25 COI JSON documents against the deterministic compliance rules in one call.
+    """
+    return json.dumps(rules.evaluate_batch(documents))
+
+# Hit/miss counters of the tool result cache, plus in-flight coalescing
+@mcp.resource("cache://tool_results/stats")
+def tool_cache_stats() -> dict:
+    return {**cache.stats(), "singleflight": inflight.stats()}
+
+# Bytes and tokens saved by compacting tool inputs (see server/compaction.py)
+@mcp.resource("compaction://stats")
+def compaction_stats() -> dict:
+    return compaction.stats()
+
+# Prompt, cached and per-document tokens per template version (see server/prompts.py)
+@mcp.resource("prompts://stats")
+def prompts_stats() -> dict:
+    return prompt_stats.stats()
+
+# Per-tool LLM latency, deadlines and hedged requests (see server/hedging.py)
+@mcp.resource("llm://hedging")
+def hedging_stats() -> dict:
+    return hedger.stats()
+
+# Attempts, accepted and escalated answers per tool and model of the cascade
+@mcp.resource("cascade://stats")
+def cascade_stats() -> dict:
+    return cascade.decisions.stats()
+
+# Prometheus metrics next to /mcp (see server/metrics.py); the collectors
+# below read the counters the server keeps anyway, only when scraped
+@mcp.custom_route("/metrics", methods=["GET"])
+async def metrics(request: Request) -> PlainTextResponse:
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@registry.collector
+def cache_metrics() -> list:
+    stats = cache.stats()
+    flights = inflight.stats()
+    return [
+        snapshot(Counter("tool_cache_lookups_total", "Tool result cache lookups", ("result",)), {("hit",): stats["hits"], ("miss",): stats["misses"]}),
+        snapshot(Gauge("tool_cache_hit_ratio", "Tool result cache hits / lookups"), {(): stats["hit_ratio"]}),
+        snapshot(Counter("tool_cache_evictions_total", "Entries evicted or expired", ("reason",)), {("size",): stats["evictions"], ("expired",): stats["expired"]}),
+        snapshot(Gauge("tool_cache_bytes", "Size of the tool result cache"), {(): stats["bytes"]}),
+        snapshot(Gauge("tool_completions_in_flight", "Distinct completions running (after coalescing)"), {(): flights["in_flight"]}),
+        snapshot(Counter("tool_completions_coalesced_total", "Tool calls that joined an identical in-flight completion"), {(): flights["coalesced"]}),
+    ]
+
+@registry.collector
+def llm_metrics() -> list:
+    stats = hedger.stats()
+    calls = {tuple(key.split("/", 1)): c for key, c in stats["calls"].items()}
+    return [
+        snapshot(Counter("tool_deadline_timeouts_total", "Tool calls cancelled at their deadline", ("tool",)), {(tool,): d["timeouts"] for tool, d in stats["deadlines"].items()}),
+        snapshot(Counter("openai_hedged_requests_total", "Duplicate requests sent for slow requests", ("tool", "model")), {k: c["hedged"] for k, c in calls.items()}),
+        snapshot(Counter("openai_hedges_skipped_total", "Hedges not sent because the model was at its limits", ("tool", "model")), {k: c["hedges_skipped"] for k, c in calls.items()}),
+        snapshot(Counter("openai_hedge_wins_total", "Hedged duplicates that answered first", ("tool", "model")), {k: c["hedge_wins"] for k, c in calls.items()}),
+        snapshot(Gauge("openai_hedge_rate", "Hedged / total upstream requests"), {(): stats["hedge_rate"]}),
+    ]
+
+@registry.collector
+def cascade_metrics() -> list:
+    attempts = {}
+    for tool, stats in cascade.decisions.stats().items():
+        for model, counts in stats["models"].items():
+            attempts[(tool, model, "accepted")] = counts["accepted"]
+            attempts[(tool, model, "escalated")] = counts["escalated"]
+    saved = {}
+    for tool, stats in compaction.stats().items():
+        saved[(tool, "bytes")] = stats["bytes_saved"]
+        saved[(tool, "tokens")] = stats["tokens_saved"]
+    return [
+        snapshot(Counter("cascade_answers_total", "Model cascade answers by outcome", ("tool", "model", "outcome")), attempts),
+        snapshot(Counter("compaction_saved_total", "Bytes / tokens removed from tool inputs", ("tool", "unit")), saved),
+    ]
+
+@registry.collector
+def prompt_metrics() -> list:
+    stats = prompt_stats.stats()
+    tokens = {}
+    for prompt, row in stats.items():
+        for kind in ("prompt", "cached", "completion"):
+            tokens[(prompt, kind)] = row[f"{kind}_tokens"]
+    return [
+        snapshot(Counter("prompt_tokens_total", "Tokens per prompt template version", ("prompt", "type")), tokens),
+        snapshot(Counter("prompt_documents_total", "Documents answered per prompt template version", ("prompt",)), {(p,): row["documents"] for p, row in stats.items()}),
+        snapshot(Counter("prompt_pack_fallbacks_total", "Packed documents answered on their own", ("prompt",)), {(p,): row["fallbacks"] for p, row in stats.items()}),
+    ]
+
+# Spans (tool calls, OpenAI requests) recorded for one client run
+@mcp.resource("trace://runs/{run_id}")
+def run_spans(run_id: str) -> list:
+    return tracer.for_run(run_id)
 
 @mcp.tool()
 def divide(a: int, b: int) -> int:
@@ -183,4 +423,4 @@ def divide(a: int, b: int) -> int:
     raise Exception("Unrecoverable error for testing purposes.")
 
 if __name__ == "__main__":
-    mcp.run(transport="streamable-http", host="127.0.0.1", port=8001)
\ No newline at end of file
+    mcp.run(transport="streamable-http", host=os.getenv("MCP_HOST", "127.0.0.1"), port=int(os.getenv("MCP_PORT", "8001")))
\ No newline at end of file
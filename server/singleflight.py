@@ -0,0 +1,38 @@
+import asyncio
+
+# In-flight request coalescing ("single flight"): concurrent calls with the
+# same key share one execution of the underlying coroutine. Every caller gets
+# the same result or the same exception. The shared work runs in its own task,
+# so a caller that goes away (client disconnect, timeout) doesn't cancel it for
+# the others.
+
+
+class SingleFlight:
+    def __init__(self):
+        self._calls = {}
+        self.started = 0
+        self.coalesced = 0
+
+    def _forget(self, key, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Mark the exception as retrieved even if every caller was cancelled
+        if not task.cancelled():
+            task.exception()
+
+    # Returns (result, shared): shared is True when the call joined another
+    # caller's in-flight execution instead of starting its own
+    async def do(self, key, fn) -> tuple:
+        task = self._calls.get(key)
+        shared = task is not None and task.get_loop() is asyncio.get_running_loop()
+        if shared:
+            self.coalesced += 1
+        else:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            self.started += 1
+            task.add_done_callback(lambda done: self._forget(key, done))
+        return await asyncio.shield(task), shared
+
+    def stats(self) -> dict:
+        return {"in_flight": len(self._calls), "started": self.started, "coalesced": self.coalesced}
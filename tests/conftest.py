@@ -0,0 +1,33 @@
+import os
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# server.llm builds its OpenAI client at import
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+
+# Graph runs without network: OpenAI is the bench fake (bench/fake_openai.py)
+# served in-process, the MCP server runs in-process too, and the tool result
+# cache, document store and revision store live in tmp_path. Returns the MCP
+# connection manager to build graphs with; create it inside the test's loop.
+@pytest.fixture
+def offline(tmp_path, monkeypatch):
+    import httpx
+    from openai import AsyncOpenAI
+
+    from bench.fake_openai import create_app
+    from client import revisions
+    from client.mcp_pool import IN_PROCESS, MCPConnectionManager
+    from server import llm, server
+    from server.cache import ToolResultCache
+    from server.documents import DocumentStore
+
+    app = create_app(os.path.join(ROOT, "response.json"), latency="fixed:0", tokens_per_s=0)
+    http_client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app))
+    monkeypatch.setattr(llm, "client", AsyncOpenAI(api_key="test", base_url="http://fake/v1", max_retries=0, http_client=http_client))
+    monkeypatch.setattr(server, "cache", ToolResultCache(str(tmp_path / "tool_results.sqlite3")))
+    monkeypatch.setattr(server, "documents", DocumentStore(str(tmp_path / "documents")))
+    monkeypatch.setattr(revisions, "revisions", revisions.RevisionStore(str(tmp_path / "revisions")))
+    return lambda: MCPConnectionManager(transport=IN_PROCESS)
@@ -0,0 +1,63 @@
+import pytest
+
+from server import cache
+from server.cache import ToolResultCache, normalize
+
+
+# Controllable stand-in for time.time
+class Clock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, "time", clock)
+    return clock
+
+
+def test_normalize_ignores_formatting():
+    assert normalize('{"b": 1,  "a": [1, 2]}') == normalize("{'a': [1, 2], 'b': 1}")
+    assert normalize("  two   words \n") == "two words"
+    key = ToolResultCache.make_key("tool", {"doc": '{"x": 1, "y": 2}'}, "v1", "model")
+    assert key == ToolResultCache.make_key("tool", {"doc": '{ "y": 2, "x": 1 }'}, "v1", "model")
+    assert key != ToolResultCache.make_key("tool", {"doc": '{"x": 1, "y": 2}'}, "v2", "model")
+    assert key != ToolResultCache.make_key("tool", {"doc": '{"x": 1, "y": 2}'}, "v1", "other")
+
+
+def test_entries_expire_after_ttl(clock):
+    store = ToolResultCache(":memory:", ttl=60)
+    store.put("key", "tool", "value")
+    clock.now += 59
+    assert store.get("key") == "value"
+    clock.now += 2
+    assert store.get("key") is None
+    stats = store.stats()
+    assert (stats["hits"], stats["misses"], stats["expired"], stats["entries"]) == (1, 1, 1, 0)
+
+
+def test_evicts_least_recently_used(clock):
+    store = ToolResultCache(":memory:", max_bytes=20)
+    store.put("a", "tool", "x" * 8)
+    clock.now += 1
+    store.put("b", "tool", "y" * 8)
+    clock.now += 1
+    assert store.get("a") == "x" * 8
+    clock.now += 1
+    store.put("c", "tool", "z" * 8)
+    assert store.get("b") is None
+    assert store.get("a") == "x" * 8
+    assert store.get("c") == "z" * 8
+    assert store.stats()["evictions"] == 1
+    assert store.stats()["bytes"] == 16
+
+
+def test_bypass_skips_reads_and_writes():
+    store = ToolResultCache(":memory:", bypass=True)
+    store.put("key", "tool", "value")
+    assert store.get("key") is None
+    assert store.stats()["entries"] == 0
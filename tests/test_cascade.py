@@ -0,0 +1,29 @@
+import asyncio
+
+from server.cascade import Cascade
+
+
+def run(cascade: Cascade, start: int = 0):
+    tried = []
+
+    async def attempt(model: str, last: bool):
+        tried.append(model)
+        return model, model
+
+    content, last = asyncio.run(cascade.run("format_email", {}, attempt, start))
+    return content, last, tried
+
+
+def test_run_escalates_from_first_tier():
+    cascade = Cascade("large")
+    cascade.config["format_email"] = ["small", "large"]
+    # The small model's "email" fails the format_email checks
+    assert run(cascade) == ("large", True, ["small", "large"])
+
+
+def test_run_starts_at_given_tier():
+    cascade = Cascade("large")
+    cascade.config["format_email"] = ["small", "large"]
+    assert run(cascade, start=1) == ("large", True, ["large"])
+    # Past the last tier still answers with the last model
+    assert run(cascade, start=5) == ("large", True, ["large"])
@@ -0,0 +1,29 @@
+import json
+
+from common.documents import compact_document, compact_json
+
+
+def test_compact_document_keeps_what_prompts_and_rules_read():
+    coi = {
+        "document_id": "coi789",
+        "named_insured": "ABC Subcontractors LLC",
+        "internal_ref": "x-1",
+        "producer": {"agency_name": "Reliable Insurance Brokers", "agent_name": "Jane Doe", "address": "Dallas, TX"},
+        "coverages": [
+            {"coverage_type": "Workers' Compensation", "policy_number": "WC-1", "limit_statutory": True, "employers_liability_limit": 1000000, "insurer_letter": "C", "notes": ""},
+        ],
+        "specialty_coverages": {"professional_liability": {"required": True, "description": "Design services"}},
+    }
+    assert compact_document(coi) == {
+        "named_insured": "ABC Subcontractors LLC",
+        "producer": {"agency_name": "Reliable Insurance Brokers", "address": "Dallas, TX"},
+        "coverages": [
+            {"coverage_type": "Workers' Compensation", "policy_number": "WC-1", "limit_statutory": True, "employers_liability_limit": 1000000},
+        ],
+        "specialty_coverages": {"professional_liability": {"required": True}},
+    }
+
+
+def test_compact_json_drops_empty_values():
+    assert compact_json(json.dumps({"a": None, "b": [], "c": {"d": " x "}})) == '{"c":{"d":"x"}}'
+    assert compact_json("not json") == "not json"
@@ -0,0 +1,50 @@
+import asyncio
+import json
+import os
+
+from client.state_machine import build_graph
+
+EXAMPLE_DOCS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "example_docs")
+
+
+def load(name: str) -> dict:
+    with open(os.path.join(EXAMPLE_DOCS, name), "r") as f:
+        return json.load(f)
+
+
+def test_incremental_rerun_reuses_the_previous_revision(offline):
+    coi = load("compliant.json")
+
+    async def main():
+        manager = offline()
+        try:
+            graph = await build_graph(manager, mode="deterministic", incremental=True)
+            return [await graph.ainvoke({"messages": f"{coi}"}) for _ in range(2)]
+        finally:
+            await manager.aclose()
+
+    first, second = asyncio.run(main())
+    assert first.get("error") is None and first["revision"]["status"] == "new"
+    assert second.get("error") is None and second["revision"]["status"] == "incremental"
+    assert second["revision"]["changed"] == []
+
+
+def test_stream_run_streams_the_email_by_default(offline):
+    from client.streaming import stream_run
+
+    coi = load("compliant.json")
+
+    async def main():
+        manager = offline()
+        try:
+            graph = await build_graph(manager, mode="deterministic")
+            return [event async for event in stream_run(graph, {"messages": f"{coi}"})]
+        finally:
+            await manager.aclose()
+
+    events = asyncio.run(main())
+    tokens = [event["text"] for event in events if event["event"] == "token"]
+    state = events[-1]["state"]
+    assert state.get("error") is None
+    assert len(tokens) > 1
+    assert "".join(tokens) == state["email"]
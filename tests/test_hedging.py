@@ -0,0 +1,139 @@
+import asyncio
+
+import pytest
+
+from server import hedging
+from server.hedging import Hedger
+
+
+@pytest.fixture(autouse=True)
+def hedge_settings(monkeypatch):
+    monkeypatch.setattr(hedging, "HEDGE_MIN_SAMPLES", 3)
+    monkeypatch.setattr(hedging, "HEDGE_MIN_DELAY", 0.01)
+    monkeypatch.setattr(hedging, "HEDGE_MAX_RATE", 1.0)
+
+
+# A hedger that has seen `samples` fast calls, so it hedges after HEDGE_MIN_DELAY
+def warmed(samples: int = 3) -> Hedger:
+    hedger = Hedger()
+    for _ in range(samples):
+        hedger._observe(("tool", "model"), 0.001)
+    return hedger
+
+
+# Upstream stand-in answering each call after the next of `delays` seconds
+# (raising when a delay is an exception)
+def upstream(*delays):
+    calls = []
+
+    async def fn():
+        n = len(calls)
+        calls.append(n)
+        delay = delays[n]
+        if isinstance(delay, Exception):
+            raise delay
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            calls[n] = "cancelled"
+            raise
+        return f"answer {n}"
+
+    return fn, calls
+
+
+# acquire_hedge stand-in counting acquired and released slots
+class Slots:
+    def __init__(self, free: int = 1):
+        self.free = free
+        self.released = 0
+
+    async def acquire(self):
+        if self.free == 0:
+            return None
+        self.free -= 1
+        return self.release
+
+    def release(self):
+        self.released += 1
+
+
+def race(hedger: Hedger, fn, slots: Slots | None = None):
+    return asyncio.run(hedger.race("tool", "model", fn, acquire_hedge=slots.acquire if slots else None))
+
+
+def test_no_hedge_without_samples():
+    fn, calls = upstream(0.05, 0)
+    assert race(warmed(samples=2), fn, Slots()) == ("answer 0", False)
+    assert calls == [0]
+
+
+def test_hedge_wins_over_slow_primary():
+    hedger, slots = warmed(), Slots()
+    fn, calls = upstream(1, 0)
+    assert race(hedger, fn, slots) == ("answer 1", True)
+    assert calls == ["cancelled", 1]
+    assert slots.released == 1
+    stats = hedger.stats()
+    assert stats["hedged"] == 1
+    assert stats["calls"]["tool/model"]["hedge_wins"] == 1
+
+
+def test_primary_wins_and_duplicate_is_released():
+    slots = Slots()
+    fn, calls = upstream(0.05, 1)
+    assert race(warmed(), fn, slots) == ("answer 0", True)
+    assert calls == [0, "cancelled"]
+    assert slots.released == 1
+
+
+def test_no_hedge_without_capacity():
+    hedger = warmed()
+    fn, calls = upstream(0.05, 0)
+    assert race(hedger, fn, Slots(free=0)) == ("answer 0", False)
+    assert calls == [0]
+    assert hedger.stats()["hedged"] == 0
+    assert hedger.stats()["calls"]["tool/model"]["hedges_skipped"] == 1
+
+
+def test_hedge_rate_cap(monkeypatch):
+    monkeypatch.setattr(hedging, "HEDGE_MAX_RATE", 0.5)
+    # Keep the unhedged calls' latencies from raising the hedge delay
+    monkeypatch.setattr(hedging, "HEDGE_PERCENTILE", 0.5)
+    hedger, slots = warmed(), Slots(free=4)
+    for _ in range(4):
+        fn, _ = upstream(0.2, 0)
+        race(hedger, fn, slots)
+    assert hedger.stats()["hedged"] == 2
+    assert slots.free == 2
+
+
+def test_duplicate_answers_when_primary_fails():
+    async def failing_late():
+        await asyncio.sleep(0.05)
+        raise RuntimeError("primary")
+
+    async def answer():
+        return "duplicate"
+
+    calls = iter([failing_late, answer])
+    assert race(warmed(), lambda: next(calls)(), Slots()) == ("duplicate", True)
+
+
+def test_raises_when_every_request_fails():
+    async def fail():
+        await asyncio.sleep(0.05)
+        raise RuntimeError("upstream")
+
+    slots = Slots()
+    with pytest.raises(RuntimeError, match="upstream"):
+        race(warmed(), fail, slots)
+    assert slots.released == 1
+
+
+def test_within_deadline_times_out(monkeypatch):
+    monkeypatch.setattr(hedging, "TOOL_DEADLINES", {"tool": 0.01})
+    hedger = Hedger()
+    with pytest.raises(TimeoutError, match="tool missed its"):
+        asyncio.run(hedger.within_deadline("tool", asyncio.sleep(1)))
+    assert hedger.stats()["deadlines"]["tool"]["timeouts"] == 1
@@ -0,0 +1,84 @@
+import asyncio
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from client import payloads
+from client.payloads import (
+    PREFIX,
+    bounded_messages,
+    last_message_text,
+    resolve,
+    resolve_message,
+    stash,
+    stash_message,
+    stash_node,
+)
+
+BIG = "x" * payloads.MIN_CHARS
+
+
+def test_bounded_messages_keeps_the_last_messages(monkeypatch):
+    monkeypatch.setattr(payloads, "MAX_MESSAGES", 3)
+    left = [HumanMessage(f"m{i}", id=str(i)) for i in range(3)]
+    merged = bounded_messages(left, [AIMessage("m3", id="3")])
+    assert [m.content for m in merged] == ["m1", "m2", "m3"]
+
+
+def test_bounded_messages_replaces_by_id():
+    left = [HumanMessage("old", id="a"), AIMessage("answer", id="b")]
+    merged = bounded_messages(left, [HumanMessage("new", id="a")])
+    assert [(m.id, m.content) for m in merged] == [("a", "new"), ("b", "answer")]
+
+
+def test_stash_round_trip():
+    store = {}
+    ref = stash(BIG, store)
+    assert ref.startswith(PREFIX) and len(store) == 1
+    assert resolve(ref, store) == BIG
+    # Short text and existing references stay inline
+    assert stash("short", store) == "short"
+    assert stash(ref, store) == ref
+    assert resolve("short", store) == "short"
+
+
+def test_stash_message_round_trip_with_tool_calls():
+    message = AIMessage(
+        "",
+        id="ai",
+        tool_calls=[{"name": "tool", "args": {"coi": BIG, "flag": "on"}, "id": "call"}],
+        additional_kwargs={"tool_calls": [{"id": "call", "function": {"arguments": BIG}}]},
+    )
+    store = {}
+    stashed = stash_message(message, store)
+    assert stashed.tool_calls[0]["args"]["coi"].startswith(PREFIX)
+    assert stashed.tool_calls[0]["args"]["flag"] == "on"
+    assert "tool_calls" not in stashed.additional_kwargs
+    assert resolve_message(stashed, store).tool_calls == message.tool_calls
+
+
+def test_stash_node_stashes_input_and_new_messages():
+    async def node(state):
+        return {"messages": [AIMessage(BIG + "!", id="reply")]}
+
+    state = {"messages": [HumanMessage(BIG, id="input")], "payloads": {}}
+    update = asyncio.run(stash_node(node)(state, {}))
+    assert [m.id for m in update["messages"]] == ["input", "reply"]
+    assert all(m.content.startswith(PREFIX) for m in update["messages"])
+    assert len(update["payloads"]) == 2
+
+    # The reducer replaces the input in place; readers still get the text
+    after = {
+        "messages": bounded_messages(state["messages"], update["messages"]),
+        "payloads": update["payloads"],
+    }
+    assert after["messages"][0].content.startswith(PREFIX)
+    assert resolve(after["messages"][0].content, after["payloads"]) == BIG
+    assert last_message_text({**after, "messages": after["messages"][:1]}) == BIG
+
+
+def test_stash_node_leaves_small_updates_alone():
+    async def node(state):
+        return {"messages": [AIMessage("ok", id="reply")]}
+
+    result = asyncio.run(stash_node(node)({"messages": [HumanMessage("hi", id="input")]}, {}))
+    assert result == {"messages": [AIMessage("ok", id="reply")]}
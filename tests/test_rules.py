@@ -0,0 +1,63 @@
+import json
+import os
+
+from server import rules
+
+EXAMPLE_DOCS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "example_docs")
+
+
+def load(name: str) -> dict:
+    with open(os.path.join(EXAMPLE_DOCS, name), "r") as f:
+        return json.load(f)
+
+
+def statuses(result: dict) -> dict:
+    return {row["rule"]: row["status"] for row in result["results"]}
+
+
+def test_compliant_example_passes():
+    result = rules.evaluate(load("compliant.json"))
+    assert result["compliant"], [row for row in result["results"] if row["status"] == rules.FAIL]
+
+
+def test_non_compliant_example_fails():
+    result = rules.evaluate(load("non_compliant.json"))
+    assert not result["compliant"]
+    failed = {rule for rule, status in statuses(result).items() if status == rules.FAIL}
+    assert {"limits.general_liability", "limits.auto_liability", "certificate_holder.exact_match"} <= failed
+
+
+def test_wc_waiver_without_parties_needs_review():
+    coi = load("compliant.json")
+    for coverage in coi["coverages"]:
+        coverage.pop("waiver_parties", None)
+    assert statuses(rules.evaluate(coi))["endorsements.workers_compensation.waiver_parties"] == rules.REVIEW
+
+
+def test_wc_waiver_missing_party_fails():
+    coi = load("compliant.json")
+    wc = next(c for c in coi["coverages"] if rules.coverage_key(c["coverage_type"]) == "workers_compensation")
+    wc["waiver_parties"] = ["Project Owner", "Client"]
+    assert statuses(rules.evaluate(coi))["endorsements.workers_compensation.waiver_parties"] == rules.FAIL
+
+
+def test_umbrella_aggregate_is_not_a_per_occurrence_limit():
+    coi = load("compliant.json")
+    umbrella = next(c for c in coi["coverages"] if rules.coverage_key(c["coverage_type"]) == "umbrella_liability")
+    umbrella.pop("limit_per_occurrence", None)
+    umbrella["limit_aggregate"] = 5_000_000
+    assert statuses(rules.evaluate(coi))["limits.umbrella_liability"] == rules.REVIEW
+    umbrella["limit_per_occurrence"] = 500_000
+    assert statuses(rules.evaluate(coi))["limits.umbrella_liability"] == rules.FAIL
+
+
+def test_umbrella_aggregate_below_minimum_fails():
+    coi = load("compliant.json")
+    umbrella = next(c for c in coi["coverages"] if rules.coverage_key(c["coverage_type"]) == "umbrella_liability")
+    umbrella.pop("limit_per_occurrence", None)
+    umbrella["limit_aggregate"] = 500_000
+    assert statuses(rules.evaluate(coi))["limits.umbrella_liability"] == rules.FAIL
+
+
+def test_non_compliant_umbrella_fails():
+    assert statuses(rules.evaluate(load("non_compliant.json")))["limits.umbrella_liability"] == rules.FAIL
@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+from server.singleflight import SingleFlight
+
+
+# Upstream stand-in that blocks until released and counts its executions
+class Upstream:
+    def __init__(self, error: Exception | None = None):
+        self.calls = 0
+        self.error = error
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        await self.release.wait()
+        if self.error:
+            raise self.error
+        return f"answer {self.calls}"
+
+
+def test_concurrent_calls_share_one_execution():
+    async def main():
+        flight, fn = SingleFlight(), Upstream()
+        calls = [asyncio.create_task(flight.do("key", fn)) for _ in range(3)]
+        await asyncio.sleep(0)
+        assert flight.stats() == {"in_flight": 1, "started": 1, "coalesced": 2}
+        fn.release.set()
+        results = await asyncio.gather(*calls)
+        return flight, fn, results
+
+    flight, fn, results = asyncio.run(main())
+    assert fn.calls == 1
+    assert results == [("answer 1", False), ("answer 1", True), ("answer 1", True)]
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_different_keys_run_separately():
+    async def main():
+        flight, fn = SingleFlight(), Upstream()
+        fn.release.set()
+        return await asyncio.gather(flight.do("a", fn), flight.do("b", fn)), fn
+
+    results, fn = asyncio.run(main())
+    assert fn.calls == 2
+    assert [shared for _, shared in results] == [False, False]
+
+
+def test_error_reaches_every_caller():
+    async def main():
+        flight, fn = SingleFlight(), Upstream(RuntimeError("upstream"))
+        calls = [asyncio.create_task(flight.do("key", fn)) for _ in range(3)]
+        await asyncio.sleep(0)
+        fn.release.set()
+        return await asyncio.gather(*calls, return_exceptions=True), flight, fn
+
+    results, flight, fn = asyncio.run(main())
+    assert fn.calls == 1
+    assert all(isinstance(result, RuntimeError) and str(result) == "upstream" for result in results)
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_cancelled_caller_leaves_the_shared_call_running():
+    async def main():
+        flight, fn = SingleFlight(), Upstream()
+        first = asyncio.create_task(flight.do("key", fn))
+        second = asyncio.create_task(flight.do("key", fn))
+        await asyncio.sleep(0)
+        first.cancel()
+        fn.release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second, fn
+
+    result, fn = asyncio.run(main())
+    assert result == ("answer 1", True)
+    assert fn.calls == 1